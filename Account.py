@@ -1,16 +1,76 @@
-from web3 import Web3, AsyncHTTPProvider
-from loguru import logger as logs
-from os import path, mkdir, getcwd
-from eth_account import Account as acc
+from __future__ import annotations
+from os import path, makedirs, getcwd, listdir, rename, replace, cpu_count
+import importlib
+import asyncio
+import atexit
+import sys
+import queue
+from collections import deque, OrderedDict
+from itertools import islice
+from concurrent.futures import (
+    ProcessPoolExecutor, as_completed,
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, wait,
+    TimeoutError as FutureTimeoutError
+)
+import heapq
+import threading
 import time
-from random import choice, uniform, randint
-from web3.exceptions import TransactionNotFound
-from web3.eth import AsyncEth
-import requests
+from random import randint, sample, uniform
+import json
+import sqlite3
+import csv
+import hashlib
+import tempfile
+import weakref
+from contextlib import contextmanager, nullcontext
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+
+class LazyImport:
+    """
+    Module (or its attribute) which is imported on the first use, so
+    `import Account` does not load web3, eth_account and http clients.
+    After the load the module global `name` is the real object, so hot
+    paths don't go through the proxy
+    """
+    def __init__(self, name: str, module: str, attribute: str = None) -> None:
+        self.name      = name
+        self.module    = module
+        self.attribute = attribute
+        self.target    = None
+
+    def load(self):
+        if self.target is None:
+            target = importlib.import_module(self.module)
+            if self.attribute:
+                target = getattr(target, self.attribute)
+
+            self.target = target
+            globals()[self.name] = target
+        return self.target
+
+    def __getattr__(self, name: str):
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"LazyImport({self.module}{'.' + self.attribute if self.attribute else ''})"
+
+
+Web3     = LazyImport("Web3", "web3", "Web3")
+acc      = LazyImport("acc", "eth_account", "Account")
+logs     = LazyImport("logs", "loguru", "logger")
+requests = LazyImport("requests", "requests")
+aiohttp  = LazyImport("aiohttp", "aiohttp")
 
 BASE_INCH_URL = "https://api-defillama.1inch.io"
 BASE_INCH_VER = 5
 
+MAX_UINT256 = 2 ** 256 - 1
+
 BASE_ERC20_ABI = [
     {
         "inputs": [],
@@ -24,6 +84,18 @@ BASE_ERC20_ABI = [
         "stateMutability": "view",
         "type": "function"
     },
+    {
+        "inputs": [],
+        "name": "symbol",
+        "outputs": [
+            {
+                "name": "symbol", "type": "string"
+            }
+        ],
+        "payable": False,
+        "stateMutability": "view",
+        "type": "function"
+    },
     {
         "inputs": [
             {
@@ -80,6 +152,125 @@ BASE_ERC20_ABI = [
     }
 ]
 
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# chains where Multicall3 lives on a non-canonical address
+MULTICALL3_ADDRESSES = {
+    "zksync"        : "0xF9cda624FBC7e059355ce98a31693d299FACd963"
+}
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"}
+                ],
+                "name": "calls", "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"}
+                ],
+                "name": "returnData", "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            {
+                "name": "addr", "type": "address"
+            }
+        ],
+        "name": "getEthBalance",
+        "outputs": [
+            {
+                "name": "balance", "type": "uint256"
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+# limits of one aggregate3 eth_call, most public nodes cap calldata and call gas
+MULTICALL_MAX_CALLDATA = 48_000
+MULTICALL_MAX_GAS      = 25_000_000
+MULTICALL_CALL_GAS     = 30_000
+
+# raw txs in one eth_sendRawTransaction batch request of send_transactions
+SEND_BATCH_SIZE = 100
+
+# tx fields which eth_estimateGas takes
+RPC_TX_FIELDS = ("from", "to", "value", "data", "gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+# tracked addresses in one eth_getLogs topic filter of TransferIndexer
+LOG_FILTER_ADDRESSES = 100
+
+# parts of eth_getLogs errors which mean the block range must be smaller
+LOG_RANGE_ERROR_MARKERS = [
+    "query returned more than", "block range", "range is too", "range too large",
+    "too many results", "response size", "exceed maximum", "max results", "logs matched"
+]
+
+# -32601 and how nodes with other codes word it, any other error can be transient
+METHOD_NOT_FOUND_CODE    = -32601
+METHOD_NOT_FOUND_MARKERS = ["does not exist", "method not found", "not supported", "unsupported method"]
+
+# error codes of a whole batch which mean the node does not take batches
+BATCH_UNSUPPORTED_CODES = (METHOD_NOT_FOUND_CODE, -32600)
+
+# reads which are safe to send to two nodes at once
+HEDGED_METHODS = {
+    "eth_call", "eth_getBalance", "eth_getCode", "eth_getStorageAt",
+    "eth_blockNumber", "eth_gasPrice", "eth_feeHistory", "eth_getLogs",
+    "eth_getBlockByNumber", "eth_getTransactionReceipt", "eth_getTransactionCount"
+}
+
+# parts of node errors which mean the node itself is unhealthy
+NODE_ERROR_MARKERS = [
+    "rate limit", "too many requests", "limit exceeded", "exceeded the quota",
+    "timeout", "timed out", "service unavailable", "header not found", "-32005"
+]
+
+# what `retry` does on each TransactionErrors category, others are retried
+RETRY_POLICY = {
+    "nonce"         : "retry",
+    "replacement"   : "retry",
+    "node"          : "failover",
+    "no_gas"        : "fail",
+    "no_funds"      : "fail"
+}
+
+# (retries per second, burst)
+ACCOUNT_RETRY_BUDGET  = (1, 20)
+ENDPOINT_RETRY_BUDGET = (5, 50)
+# 2 ** attempt of an endless retry would overflow a float, max_timing is reached long before
+MAX_BACKOFF_EXPONENT  = 16
+
+NODE_EXCEPTIONS = None
+
+def node_exceptions() -> tuple:
+    """
+    ::returns exceptions of a failed connection to a node, http clients
+    are imported on the first call
+    """
+    global NODE_EXCEPTIONS
+    if NODE_EXCEPTIONS is None:
+        NODE_EXCEPTIONS = (
+            requests.RequestException, aiohttp.ClientError, ConnectionError,
+            TimeoutError, asyncio.TimeoutError
+        )
+    return NODE_EXCEPTIONS
+
 DEFAULT_NODES = {
     "ethereum"      : ["https://rpc.ankr.com/eth"],
     "bsc"           : ["https://rpc.ankr.com/bsc"],
@@ -94,6 +285,14 @@ DEFAULT_NODES = {
     "zksync"        : ["https://rpc.ankr.com/zksync_era"]
 }
 
+# chains where txs are sent as EIP-1559 (type 2)
+EIP1559_NETS = ["avalanche", "polygon", "arbitrum", "zora", "ethereum"]
+
+# lowest priority fee a chain accepts, gwei
+MIN_PRIORITY_FEE = {
+    "polygon"       : 30
+}
+
 DEFAULT_GWEI = {
     "ethereum"      : 30,
     "bsc"           : 1.5,
@@ -108,56 +307,476 @@ DEFAULT_GWEI = {
     "zksync"        : 0.25
 }
 
+def from_hex(value: str) -> int:
+    return int(value, 16)
+
+def to_rpc_tx(tx: dict) -> dict:
+    """
+    ::returns built tx as JSON-RPC params: ints as hex, without nonce and gas
+    """
+    rpc_tx = {}
+    for field in RPC_TX_FIELDS:
+        value = tx.get(field)
+        if value is not None:
+            rpc_tx[field] = hex(value) if isinstance(value, int) else Web3.to_hex(value) if isinstance(value, bytes) else value
+    return rpc_tx
+
+class ERC20:
+    """
+    Precomputed selectors and calldata encoders of the hot BASE_ERC20_ABI
+    methods. Arguments are static words, so calldata is plain string
+    formatting and skips web3 ABI resolution and validation
+    """
+    # keccak of the signatures, written out so the class needs no web3 at import
+    BALANCE_OF  = "0x70a08231"  # balanceOf(address)
+    ALLOWANCE   = "0xdd62ed3e"  # allowance(address,address)
+    APPROVE     = "0x095ea7b3"  # approve(address,uint256)
+    DECIMALS    = "0x313ce567"  # decimals()
+    ETH_BALANCE = "0x4d2301cc"  # getEthBalance(address)
+    AGGREGATE3  = "0x82ad56cb"  # aggregate3((address,bool,bytes)[])
+    # event topic of Transfer(address,address,uint256), not a selector
+    TRANSFER    = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+    @staticmethod
+    def address_word(address: str) -> str:
+        return address[2:].lower().rjust(64, "0")
+
+    @staticmethod
+    def uint_word(value: int) -> str:
+        return format(value, "064x")
+
+    @classmethod
+    def balance_of(cls, address: str) -> str:
+        return cls.BALANCE_OF + cls.address_word(address)
+
+    @classmethod
+    def allowance(cls, owner: str, spender: str) -> str:
+        return cls.ALLOWANCE + cls.address_word(owner) + cls.address_word(spender)
+
+    @classmethod
+    def approve(cls, spender: str, amount: int) -> str:
+        return cls.APPROVE + cls.address_word(spender) + cls.uint_word(amount)
+
+    @classmethod
+    def eth_balance(cls, address: str) -> str:
+        return cls.ETH_BALANCE + cls.address_word(address)
+
+    @staticmethod
+    def decode_uint(return_data: bytes) -> int:
+        if len(return_data) < 32:
+            raise Exception(f"Contract returned {len(return_data)} bytes instead of uint256")
+        return int.from_bytes(return_data[:32], "big")
+
+
+class ContractCache:
+    """
+    web3 contract objects keyed by (chain, address, ABI fingerprint, provider),
+    so the ABI is parsed once and not on every `get_contract`. Web3 objects
+    are process-wide (see Nodes), so all accounts of a chain share entries
+    """
+    MAX_SIZE = 4096
+
+    def __init__(self, max_size: int = None) -> None:
+        self.max_size     = max_size if max_size else self.MAX_SIZE
+        self.contracts    = OrderedDict()
+        self.fingerprints = {}
+        self.lock         = threading.Lock()
+
+    def fingerprint(self, abi) -> str:
+        # ABI lists are usually module constants, so the hash is memoized by identity
+        cached = self.fingerprints.get(id(abi))
+        if cached is not None and cached[0] is abi:
+            return cached[1]
+
+        value = hashlib.sha1(json.dumps(abi, sort_keys=True).encode()).hexdigest()
+        self.fingerprints[id(abi)] = (abi, value)
+        return value
+
+    def get(self, w3: Web3, net_name: str, address: str, abi) -> object:
+        key = (net_name, address.lower() if address else None, self.fingerprint(abi), id(w3))
+        with self.lock:
+            entry = self.contracts.get(key)
+            if entry is not None:
+                self.contracts.move_to_end(key)
+                return entry[1]
+
+        contract = w3.eth.contract(address, abi=abi) if address else w3.eth.contract(abi=abi)
+        with self.lock:
+            # w3 is kept in the entry, so its id can't be reused while cached
+            self.contracts[key] = (w3, contract)
+            while len(self.contracts) > self.max_size:
+                self.contracts.popitem(last=False)
+        return contract
+
+
+CONTRACTS = ContractCache()
+
+
+class RetryBudget:
+    """
+    Token bucket of retries: `rate` retries per second with bursts up to
+    `burst`, so a failing account or node is not stampeded
+    """
+    _budgets = {}
+    _lock    = threading.Lock()
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate       = rate
+        self.burst      = burst
+        self.tokens     = burst
+        self.updated_at = time.time()
+        self.lock       = threading.Lock()
+
+    @classmethod
+    def get(cls, key: tuple, rate: float, burst: float) -> "RetryBudget":
+        budget = cls._budgets.get(key)
+        if budget is None:
+            with cls._lock:
+                budget = cls._budgets.setdefault(key, cls(rate, burst))
+        return budget
+
+    def spend(self) -> bool:
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
 def retry(
         infinity: bool = False, max_retries: int = 5,
         timing: float = 0.5, handle_error: bool = False,
-        custom_message: str = None
+        custom_message: str = None, max_timing: float = 30,
+        raise_error: bool = True
 ):
-    if infinity: max_retries = 9**100
+    """
+    ::infinity retry until the error is fatal or a retry budget is empty
+    ::timing first backoff, it doubles every attempt up to max_timing (with jitter)
+    ::raise_error raise the last error when retries are over, else return None
+
+    What happens on an error depends on its TransactionErrors category
+    (see RETRY_POLICY): "retry" backs off, "failover" backs off with full
+    jitter and retries on another node (picked by RPCRouter), "fail" raises
+    without retries. Errors of a node, raised or replied, also spend the
+    retry budget of its endpoint
+    """
+    def on_error(self, error: Exception, attempt: int) -> float:
+        account = self if isinstance(self, Web3Account) else getattr(self, "account", None)
+
+        if handle_error:
+            if account is not None:
+                TransactionErrors(error, account, custom_message)
+            else: logs.error(f'[{custom_message}] {error}')
+
+        action = RETRY_POLICY.get(TransactionErrors.classify(error), "retry")
+        if action == "fail" or (not infinity and attempt + 1 >= max_retries):
+            return None
+
+        # objects without an account (Multicall, TransferIndexer) have max_retries and endpoint budgets only
+        budgets = []
+        if account is not None:
+            budgets.append(RetryBudget.get(("account", account.address), *ACCOUNT_RETRY_BUDGET))
+
+        endpoint = error_endpoint(error)
+        if endpoint:
+            budgets.append(RetryBudget.get(("endpoint", endpoint), *ENDPOINT_RETRY_BUDGET))
+
+        if not all(budget.spend() for budget in budgets):
+            logs.error(f'Retry budget is over, giving up: {error}')
+            return None
+
+        delay = min(max_timing, timing * 2 ** min(attempt, MAX_BACKOFF_EXPONENT))
+        if action == "failover":
+            # the next node can be healthy, so the first retry can go at once
+            return uniform(0, delay)
+        return uniform(delay / 2, delay)
+
     def retry_decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            async def _async_wrapper(*args, **kwargs):
+                attempt = 0
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as error:
+                        delay = on_error(args[0], error, attempt)
+                        if delay is None:
+                            if raise_error:
+                                raise
+                            return None
+
+                        await asyncio.sleep(delay)
+                        attempt += 1
+            return _async_wrapper
+
         def _wrapper(*args, **kwargs):
-            for _ in range(max_retries):
+            attempt = 0
+            while True:
                 try:
                     return func(*args, **kwargs)
                 except Exception as error:
-                    self = args[0]
-                    if handle_error:
-                        TransactionErrors(
-                            error, self, custom_message
-                        )
+                    delay = on_error(args[0], error, attempt)
+                    if delay is None:
+                        if raise_error:
+                            raise
+                        return None
 
-                    time.sleep(timing)
+                    time.sleep(delay)
+                    attempt += 1
         return _wrapper
     return retry_decorator
 
-class Logger():
-    def __init__(self, address: str) -> None:
-        self.address = address
-        self.logs_path = getcwd() + "\\logs\\"
-        self.path    = self.logs_path + self.address.lower() + '.txt'
+class LogSink:
+    """
+    Process-wide JSONL log file. Records go to a queue and a background
+    thread writes them in batches, so logging never blocks on disk and
+    thousands of accounts share one file descriptor.
+
+    Every line is a record like
+        {"time": ..., "level": "SUCCESS", "address": ..., "chain": ...,
+         "event": "tx_sent", "tx_hash": ..., "message": ...}
+
+    Only the thread writes while it runs: `flush()` queues a marker and
+    waits until the records before it are written, at exit the thread is
+    stopped the same way and joined. A record or a batch which can't be
+    written is reported to stderr and the thread goes on
+    """
+    FILE_NAME = "events.jsonl"
+    STOP      = object()
+
+    def __init__(
+            self, directory: str = None, max_bytes: int = 50 * 1024 * 1024,
+            rotation_interval: float = 24 * 60 * 60, flush_interval: float = 1,
+            batch_size: int = 1000
+    ) -> None:
+        """
+        ::directory `logs` in the working directory by default, it is
+        created on the first write
+        ::max_bytes, rotation_interval the file is rotated by size or age
+        """
+        self.directory         = directory
+        self.max_bytes         = max_bytes
+        self.rotation_interval = rotation_interval
+        self.flush_interval    = flush_interval
+        self.batch_size        = batch_size
 
-        if path.exists(self.logs_path) is not True:
-            mkdir(self.logs_path)
+        self.queue     = queue.Queue()
+        self.file      = None
+        self.opened_at = None
+        self.thread    = None
+        self.lock      = threading.Lock()
+
+    @property
+    def logs_path(self) -> str:
+        return self.directory if self.directory else path.join(getcwd(), "logs")
+
+    @property
+    def path(self) -> str:
+        return path.join(self.logs_path, self.FILE_NAME)
+
+    def write(self, record: dict) -> None:
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, daemon=True)
+                    self.thread.start()
+                    atexit.register(self.close)
+
+        self.queue.put(record)
+
+    def _open(self) -> None:
+        if not path.exists(self.logs_path):
+            makedirs(self.logs_path, exist_ok=True)
             logs.success(f'Logs path was created!')
 
+        self.file      = open(self.path, "a", encoding="utf-8")
+        self.opened_at = time.time()
+
+    def _rotate(self) -> None:
+        self.file.close()
+        rename(self.path, path.join(
+            self.logs_path, f'events.{time.strftime("%Y%m%d-%H%M%S")}.{int(time.time() * 1000) % 1000:03d}.jsonl'
+        ))
+        self._open()
+
+    @staticmethod
+    def _report(message: str) -> None:
+        # not through loguru, its records come back to this sink
+        sys.stderr.write(f'LogSink: {message}\n')
+
+    def _dump(self, record: dict) -> str:
+        try:
+            return json.dumps(record, default=str) + "\n"
+        except Exception as error:
+            self._report(f'record is skipped: {error!r}')
+            return ""
+
+    def _write_batch(self, records: list) -> None:
+        try:
+            if self.file is None:
+                self._open()
+
+            elif (
+                self.file.tell() >= self.max_bytes
+                or time.time() - self.opened_at >= self.rotation_interval
+            ):
+                try:
+                    self._rotate()
+                except OSError as error:
+                    # the batch goes to the old file, rotation is tried again later
+                    self._report(f'rotation failed: {error!r}')
+                    self._open()
+
+            self.file.write("".join(self._dump(record) for record in records))
+            self.file.flush()
+
+        except Exception as error:
+            self._report(f'{len(records)} records are not written: {error!r}')
+            # the file is opened again for the next batch
+            try:
+                self.file.close()
+            except Exception:
+                pass
+            self.file = None
+
+    def _drain(self, block: bool) -> list:
+        records = []
+        try:
+            records.append(self.queue.get(timeout=self.flush_interval) if block else self.queue.get_nowait())
+            while len(records) < self.batch_size:
+                records.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return records
+
+    def _run(self) -> None:
+        while True:
+            batch = []
+            for record in self._drain(block=True):
+                if isinstance(record, dict):
+                    batch.append(record)
+                    continue
+
+                # a marker of flush() or close(), records queued before it are written first
+                if batch:
+                    with self.lock:
+                        self._write_batch(batch)
+                    batch = []
+
+                if record is self.STOP:
+                    return
+                record.set()
+
+            if batch:
+                with self.lock:
+                    self._write_batch(batch)
+
+    def flush(self, timeout: float = 10) -> None:
+        """
+        returns when records logged before the call are in the file
+        """
+        thread = self.thread
+        if thread is not None and thread.is_alive():
+            written = threading.Event()
+            self.queue.put(written)
+            written.wait(timeout)
+            return
+
+        # no thread: leftovers of a stopped one are written here
+        with self.lock:
+            records = self._drain(block=False)
+            while records:
+                batch = [record for record in records if isinstance(record, dict)]
+                if batch:
+                    self._write_batch(batch)
+                records = self._drain(block=False)
+
+    def close(self, timeout: float = 10) -> None:
+        """
+        stops the thread after it writes the queue, runs at exit
+        """
+        thread = self.thread
+        if thread is not None and thread.is_alive():
+            self.queue.put(self.STOP)
+            thread.join(timeout)
+
+        with self.lock:
+            self.thread = None
+        self.flush()
+
+    def files(self) -> list:
+        if not path.exists(self.logs_path):
+            return []
+
+        rotated = sorted(
+            name for name in listdir(self.logs_path)
+            if name.startswith("events.") and name.endswith(".jsonl") and name != self.FILE_NAME
+        )
+        return [path.join(self.logs_path, name) for name in rotated + [self.FILE_NAME]]
+
+    def records(self, address: str = None):
+        self.flush()
+        for file_path in self.files():
+            if not path.exists(file_path):
+                continue
+
+            with open(file_path, encoding="utf-8") as file:
+                for line in file:
+                    record = json.loads(line)
+                    if address is None or record.get("address", "").lower() == address.lower():
+                        yield record
+
+    def export(self, address: str, file_path: str = None) -> str:
+        """
+        writes old-style `[STATUS] message` text log of one account
+        ::returns path of the text file, `logs/<address>.txt` by default
+        """
+        file_path = file_path if file_path else path.join(self.logs_path, address.lower() + '.txt')
+        with open(file_path, "w", encoding="utf-8") as file:
+            for record in self.records(address):
+                file.write(f'[{record["level"]}] {record["message"]}\n')
+        return file_path
+
+
+LOG_SINK = LogSink()
+
+
+class Logger():
+    def __init__(self, address: str, net_name: str = None, sink: LogSink = None) -> None:
+        self.address  = address
+        self.net_name = net_name
+        self.sink     = sink if sink else LOG_SINK
+
+    @property
+    def path(self) -> str:
+        return path.join(self.sink.logs_path, self.address.lower() + '.txt')
+
     @staticmethod
     def log(status: str):
         def log_decorator(func):
-            def _wrapper(*args, **kwargs):
-                self, message = args
-                try:
-                    with open(self.path, "a") as file:
-                        file.write(f'[{status}] {message}\n')
-                except FileNotFoundError:
-                    with open(self.path, 'w') as file:
-                        logs.info(f'Was created log path to: {self.address}')
-                        return log_decorator
-
-                return func(*args, **kwargs)
+            def _wrapper(self, message: str, event: str = None, tx_hash: str = None):
+                self.sink.write({
+                    "time"    : time.time(),
+                    "level"   : status,
+                    "address" : self.address,
+                    "chain"   : self.net_name,
+                    "event"   : event,
+                    "tx_hash" : tx_hash,
+                    "message" : message
+                })
+
+                return func(self, message)
             return _wrapper
         
         return log_decorator
 
+    def export(self, file_path: str = None) -> str:
+        return self.sink.export(self.address, file_path)
+
     @log(status="INFO")        
     def info(self, message_text: str) -> None:
         logs.info(f'[{self.address}] {message_text}')
@@ -170,26 +789,249 @@ class Logger():
     def success(self, message_text: str) -> None:
         logs.success(f'[{self.address}] {message_text}')
 
+class Histogram:
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts  = [0] * len(buckets)
+        self.count   = 0
+        self.sum     = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum   += value
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self) -> list:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms:
+        rpc_requests_total, rpc_errors_total, rpc_request_seconds   {endpoint, method}
+        inch_requests_total, inch_errors_total, inch_request_seconds {endpoint}
+        tx_phase_seconds {chain, phase}, txs_total {chain, status}
+
+    Hooks get every observation as hook(kind, name, labels, value), kind
+    is "counter" or "histogram". `prometheus()` renders the text exposition
+    format, `serve(port)` exposes it on /metrics, `snapshot()` is a plain dict.
+    RPC endpoints are labeled without credentials, query and api keys in the path
+    """
+    PREFIX          = "web3_account_"
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, float("inf"))
+    # path segments this long are api keys, like infura /v3/<key> or alchemy /v2/<key>
+    SECRET_SEGMENT  = 16
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled    = enabled
+        self.counters   = {}
+        self.histograms = {}
+        self.hooks      = []
+        self.endpoints  = {}
+        self.server     = None
+        self.lock       = threading.Lock()
+
+    def add_hook(self, hook) -> None:
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook) -> None:
+        self.hooks.remove(hook)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+        for hook in self.hooks:
+            hook("counter", name, labels, value)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.LATENCY_BUCKETS)
+            histogram.observe(value)
+
+        for hook in self.hooks:
+            hook("histogram", name, labels, value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def phase(self, net_name: str, phase: str):
+        return self.timer("tx_phase_seconds", chain=net_name, phase=phase)
+
+    def endpoint_label(self, url: str) -> str:
+        """
+        ::returns `url` without credentials, query and key-like path segments
+        """
+        label = self.endpoints.get(url)
+        if label is None:
+            parts = urlsplit(url)
+            host  = f'{parts.hostname}:{parts.port}' if parts.port else parts.hostname
+            path  = "/".join(
+                "***" if len(segment) >= self.SECRET_SEGMENT else segment
+                for segment in parts.path.split("/")
+            )
+            label = self.endpoints[url] = f'{parts.scheme}://{host}{path.rstrip("/")}'
+        return label
+
+    def record_rpc(self, endpoint: str, methods: list, start: float, responses: list = None) -> None:
+        """
+        ::endpoint node url, labeled by `endpoint_label`
+        ::responses decoded responses in the order of methods, None if the request failed
+        """
+        if not self.enabled:
+            return
+
+        duration = time.perf_counter() - start
+        endpoint = self.endpoint_label(endpoint)
+        for index, method in enumerate(methods):
+            self.inc("rpc_requests_total", endpoint=endpoint, method=method)
+            if responses is None or "error" in responses[index]:
+                self.inc("rpc_errors_total", endpoint=endpoint, method=method)
+
+        method = methods[0] if len(methods) == 1 else "batch"
+        self.observe("rpc_request_seconds", duration, endpoint=endpoint, method=method)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters   = {}
+            self.histograms = {}
+
+    def snapshot(self) -> dict:
+        """
+        ::returns {"counters": {name: {labels: value}}, "histograms": {name: {labels: {count, sum, buckets}}}},
+        labels are tuples of (label, value) pairs
+        """
+        result = {"counters": {}, "histograms": {}}
+        with self.lock:
+            for (name, labels), value in self.counters.items():
+                result["counters"].setdefault(name, {})[labels] = value
+
+            for (name, labels), histogram in self.histograms.items():
+                result["histograms"].setdefault(name, {})[labels] = {
+                    "count"   : histogram.count,
+                    "sum"     : histogram.sum,
+                    "buckets" : dict(zip(histogram.buckets, histogram.cumulative()))
+                }
+        return result
+
+    @staticmethod
+    def format_labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+
+        escaped = [
+            (label, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for label, value in labels
+        ]
+        return "{" + ",".join(f'{label}="{value}"' for label, value in escaped) + "}"
+
+    def prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+
+        for name, series in sorted(snapshot["counters"].items()):
+            lines.append(f'# TYPE {self.PREFIX}{name} counter')
+            for labels, value in series.items():
+                lines.append(f'{self.PREFIX}{name}{self.format_labels(labels)} {value}')
+
+        for name, series in sorted(snapshot["histograms"].items()):
+            lines.append(f'# TYPE {self.PREFIX}{name} histogram')
+            for labels, histogram in series.items():
+                for bucket, count in histogram["buckets"].items():
+                    bucket = "+Inf" if bucket == float("inf") else bucket
+                    lines.append(
+                        f'{self.PREFIX}{name}_bucket{self.format_labels(labels + (("le", bucket),))} {count}'
+                    )
+                lines.append(f'{self.PREFIX}{name}_sum{self.format_labels(labels)} {histogram["sum"]}')
+                lines.append(f'{self.PREFIX}{name}_count{self.format_labels(labels)} {histogram["count"]}')
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9100, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        starts a background http server with `prometheus()` text on /metrics
+        ::host local only by default, "0.0.0.0" exposes the metrics to the network
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                data = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+
+METRICS = Metrics()
+
+
 class Web3Account:
     def __init__(
             self, secret_key: str, net_name: str, 
             nodes: dict = DEFAULT_NODES, sleeping_timings: list = [30, 60],
             max_gwei: float = None,
             proxies: str = None,
-            after_tx_sleeping: bool = True
+            after_tx_sleeping: bool = True,
+            metadata_cache: "MetadataCache" = None,
+            hedged_reads: bool = False,
+            gas_estimates: "GasEstimateCache" = None
     ) -> None:
         """
         ::nodes must be like {
             "bsc"    : [list of Web3 objects],
             "polygon : [list of Web3 objects]
         }
+        ::metadata_cache chain_id and token decimals/symbol storage,
+        the process-wide METADATA_CACHE by default
+        ::hedged_reads slow reads are repeated on a second node, first answer wins
+        ::gas_estimates cache of gas estimates, the process-wide GAS_ESTIMATES by default
         """
         self.eth_account = acc.from_key(secret_key)
         self.net_name    = net_name
-        self.nodes       = Nodes(nodes, proxies=proxies).nodes
-        self.logger      = Logger(self.eth_account.address)
+        self.nodes       = Nodes(nodes, proxies=proxies)
+        self.logger      = Logger(self.eth_account.address, net_name)
         self.timings     = sleeping_timings
         self.address     = self.eth_account.address
+        self.metadata    = metadata_cache if metadata_cache else METADATA_CACHE
+        self.gas_estimates = gas_estimates if gas_estimates else GAS_ESTIMATES
+
+        self.hedged_reads = hedged_reads
 
         self.after_tx_sleeping = after_tx_sleeping
 
@@ -197,46 +1039,67 @@ class Web3Account:
             self.max_gwei    = max_gwei
         else: self.max_gwei = DEFAULT_GWEI[self.net_name]
 
-        self.inch_helper = Inch(self)
+        self._inch_helper = None
     
+    @property
+    def inch_helper(self) -> "Inch":
+        # created on the first swap or quote
+        if self._inch_helper is None:
+            self._inch_helper = Inch(self)
+        return self._inch_helper
+
     def sleeping(self, error_message: str = "") -> None:
         time_sleep = randint(self.timings[0], self.timings[1])
         self.logger.info(f'Sleeping {time_sleep} seconds.. {error_message}')
-        time.sleep(time_sleep)
+        with METRICS.phase(self.net_name, "sleeping"):
+            time.sleep(time_sleep)
 
     def get_provider(self, custom_net: str = False) -> Web3:
-        if custom_net:
-            provider = choice(self.nodes.get(custom_net))
+        net_name = custom_net if custom_net else self.net_name
 
-        else: provider = choice(self.nodes.get(self.net_name))
+        if self.hedged_reads:
+            provider = self.nodes.routed(net_name)
+        else: provider = self.nodes.pick(net_name)
 
         if provider is None:
             raise Exception(
-                f"Cant find any provider for net name: {self.net_name}"
+                f"Cant find any provider for net name: {net_name}"
             )
         else: return provider
     
-    def wait_until_tx_finished(self, transaction_hash: str, max_waiting_time: int = 600) -> bool:
-        start_time = time.time()
-        w3 = self.get_provider()
+    @property
+    def receipt_watcher(self) -> "ReceiptWatcher":
+        return ReceiptWatcher.get(self.nodes, self.net_name)
 
-        while time.time() - start_time < max_waiting_time:
-            try:
-                receipts = w3.eth.get_transaction_receipt(transaction_hash)
-                status = receipts.get("status")
-
-                if status == 1:
-                    self.logger.success(f"{transaction_hash} is completed")
-                    return True
-                elif status is None:
-                    time.sleep(2)
-
-                elif status != 1:
-                    self.logger.error(f'[{transaction_hash}] transaction is failed')
-                    return False
-                
-            except TransactionNotFound:
-                time.sleep(3)
+    def watch_transaction(
+            self, transaction_hash: str, max_waiting_time: int = 600,
+            callback=None
+    ) -> Future:
+        """
+        ::returns future resolved with TxResult, callback(TxResult) is called
+        from the watcher thread when the tx is mined or timed out
+        """
+        return self.receipt_watcher.watch(transaction_hash, max_waiting_time, callback)
+
+    def log_tx_result(self, result: "TxResult") -> "TxResult":
+        tx_hash = result.transaction_hash
+        if result.status == TxResult.SUCCESS:
+            self.logger.success(f"{tx_hash} is completed", event="tx_success", tx_hash=tx_hash)
+        elif result.status == TxResult.FAILED:
+            self.logger.error(f'[{tx_hash}] transaction is failed', event="tx_failed", tx_hash=tx_hash)
+        elif result.status == TxResult.CANCELLED:
+            self.logger.info(f'[{tx_hash}] transaction is cancelled', event="tx_cancelled", tx_hash=tx_hash)
+        else:
+            self.logger.error(f'[{tx_hash}] transaction is not mined in time', event="tx_timeout", tx_hash=tx_hash)
+        return result
+
+    def wait_until_tx_finished(self, transaction_hash: str, max_waiting_time: int = 600) -> "TxResult":
+        """
+        ::returns TxResult, it is True only for a successful tx
+        """
+        with METRICS.phase(self.net_name, "wait_receipt"):
+            result = self.watch_transaction(transaction_hash, max_waiting_time).result()
+        return self.log_tx_result(result)
     
     def get_contract(self, contract_address: str, abi=False):
         w3 = self.get_provider()
@@ -244,80 +1107,320 @@ class Web3Account:
             abi = abi
         else: abi = BASE_ERC20_ABI
 
-        contract = w3.eth.contract(contract_address, abi=abi)
-        return contract
+        return CONTRACTS.get(w3, self.net_name, contract_address, abi)
+
+    def erc20_call(self, token_address: str, data: str, w3: Web3 = None) -> int:
+        """
+        ::data calldata of ERC20 encoders, returns decoded uint256
+        """
+        w3 = w3 if w3 else self.get_provider()
+        return ERC20.decode_uint(w3.eth.call({"to": Web3.to_checksum_address(token_address), "data": data}))
     
-    @retry(max_retries=1, handle_error=True)
-    def send_transaction(
-            self, tx: dict, max_ethereum_gwei: float = False,
-            gas_upper: float = 1.25
-    ) -> str:
+    def send_transactions(
+            self, txs: list, gas_upper: float = 1.25,
+            max_ethereum_gwei: float = False, max_waiting_time: int = 600,
+            live_estimate: bool = False
+    ) -> list:
+        """
+        ::txs built txs (see get_tx_data), the ones without nonce get the next nonces
+        ::returns TxHandle of every tx in the same order, right after the broadcast
+
+        Gas of all txs is estimated in one batch request (known shapes come
+        from the gas cache) and all txs are broadcast in one more. A tx which
+        is not sent gets a handle with `error`, its nonce is taken by the
+        next txs of the batch, so the account gets no nonce gap
+        """
         w3 = self.get_provider()
 
         if max_ethereum_gwei:
-            eth_w3 = self.get_provider(custom_net="ethereum")
-            current_gwei = Web3.from_wei(eth_w3.eth.gas_price, 'gwei')
+            with METRICS.phase(self.net_name, "ethereum_gas_wait"):
+                GasOracle.get(self.nodes, "ethereum").wait_below(
+                    max_ethereum_gwei, logger=self.logger
+                )
 
-            if current_gwei > max_ethereum_gwei:
-                self.logger.error(f'Current eth gwei: {current_gwei}, max: {max_ethereum_gwei}')
-                self.sleeping("Waiting for the best gwei")
-        
-        gasEstimate = w3.eth.estimate_gas(tx) * gas_upper
-        tx['gas'] = round(gasEstimate)
+        handles = [TxHandle(self, dict(tx), max_waiting_time) for tx in txs]
+        for handle in handles:
+            if "nonce" not in handle.tx:
+                handle.tx["nonce"] = self.get_nonce(w3)
 
-        signed_txn = self.eth_account.sign_transaction(tx)
+        try:
+            with METRICS.phase(self.net_name, "estimate_gas"), self.batch(w3) as batch:
+                estimates, codes = self.add_estimates(batch, handles, live_estimate)
+        except Exception:
+            self.nonce_manager.resync()
+            raise
 
-        tx_token = Web3.to_hex(w3.eth.send_raw_transaction(signed_txn.rawTransaction))
-        self.logger.success(f"Approved: {tx_token}")
+        self.apply_codes(codes)
+        ready = self.apply_estimates(handles, estimates, gas_upper)
+        with METRICS.phase(self.net_name, "sign"):
+            raw_txs = self.sign_inline([handle.tx for handle in ready])
 
-        if self.wait_until_tx_finished(tx_token):
-            if self.after_tx_sleeping:
-                self.sleeping("Take a sleep after submited tx")
-            return True
-        
-        else: return False
-        
-    def get_gas_price(self):
-        w3 = self.get_provider()
-        max_gas = Web3.to_wei(self.max_gwei, 'gwei')
+        with METRICS.phase(self.net_name, "send"):
+            for index in range(0, len(ready), SEND_BATCH_SIZE):
+                chunk = ready[index:index + SEND_BATCH_SIZE]
+                try:
+                    with self.batch(w3) as batch:
+                        calls = [
+                            batch.add("eth_sendRawTransaction", [Web3.to_hex(raw_tx)])
+                            for raw_tx in raw_txs[index:index + SEND_BATCH_SIZE]
+                        ]
+                except Exception as error:
+                    self.fail_unsent(ready[index:], error)
+                    break
 
-        while w3.eth.gas_price > max_gas:
-            h_gas, h_max = Web3.from_wei(w3.eth.gas_price, 'gwei'), Web3.from_wei(max_gas, 'gwei')
-            self.logger.error(f'Sender net: {self.net_name}. Current gasPrice: {h_gas} | Max gas price: {h_max}')
-        
-        return round(w3.eth.gas_price)
-    
-    def get_tx_data(self, value: int = 0, increase_gas_price : float = 1.25) -> dict:
-        w3 = self.get_provider()
-        gas_price = round(self.get_gas_price() * increase_gas_price)
+                self.apply_broadcast(chunk, calls)
+        return handles
+
+    def add_estimates(self, batch: "RPCBatch", handles: list, live_estimate: bool = False) -> tuple:
+        """
+        ::live_estimate skip the gas cache and the native transfer constant
+        ::returns (cached gas limit or eth_estimateGas BatchCall of every tx,
+        [(receiver, eth_getCode BatchCall)] of plain transfers to unchecked receivers)
+        """
+        estimates, codes = [], []
+        for handle in handles:
+            gas = None if live_estimate else self.gas_estimates.get(self.net_name, handle.tx)
+            handle.from_cache = gas is not None
+            estimates.append(gas if handle.from_cache else batch.add(
+                "eth_estimateGas", [to_rpc_tx(handle.tx)], from_hex
+            ))
+
+            if self.gas_estimates.code_unknown(self.net_name, handle.tx):
+                codes.append((handle.tx["to"], batch.add("eth_getCode", [handle.tx["to"], "latest"])))
+        return estimates, codes
+
+    def apply_codes(self, codes: list) -> None:
+        for address, call in codes:
+            if not call.error:
+                self.gas_estimates.set_code(self.net_name, address, call.result not in (None, "", "0x"))
+
+    def apply_estimates(self, handles: list, estimates: list, gas_upper: float) -> list:
+        """
+        ::returns handles ready to sign, failed estimates leave their nonces
+        to the next txs of the batch
+        """
+        nonces = sorted(handle.tx["nonce"] for handle in handles)
+        ready  = []
+
+        for handle, estimate in zip(handles, estimates):
+            try:
+                if isinstance(estimate, BatchCall):
+                    estimate = estimate.result
+                    self.gas_estimates.set(self.net_name, handle.tx, estimate)
+                handle.tx["gas"] = round(estimate * gas_upper)
+                ready.append(handle)
+            except Exception as error:
+                self.fail_handle(handle, error)
+
+        if len(ready) < len(handles):
+            ready.sort(key=lambda handle: handle.tx["nonce"])
+            for handle, nonce in zip(ready, nonces):
+                handle.tx["nonce"] = nonce
+
+            for nonce in reversed(nonces[len(ready):]):
+                self.nonce_manager.release(nonce)
+        return ready
+
+    def apply_broadcast(self, handles: list, calls: list) -> None:
+        for handle, call in zip(handles, calls):
+            if call.error:
+                self.handle_nonce_error(handle.tx, call.error)
+                self.fail_handle(handle, ValueError(call.error))
+                continue
+
+            tx_hash = call.result
+            self.logger.success(f"Approved: {tx_hash}", event="tx_sent", tx_hash=tx_hash)
+            handle.add_version(handle.tx, tx_hash)
+
+    def fail_unsent(self, handles: list, error: Exception) -> None:
+        # unknown which txs reached the node
+        self.nonce_manager.resync()
+        for handle in handles:
+            self.fail_handle(handle, error)
+
+    def fail_handle(self, handle: "TxHandle", error: Exception) -> None:
+        METRICS.inc("txs_total", chain=self.net_name, status=TxResult.NOT_SENT)
+        handle.set_error(error)
+
+    def submit(
+            self, tx: dict, max_ethereum_gwei: float = False,
+            gas_upper: float = 1.25, max_waiting_time: int = 600,
+            live_estimate: bool = False
+    ) -> "TxHandle":
+        """
+        ::returns TxHandle right after the broadcast, raises if the tx is not sent
+        """
+        handle = self.send_transactions([tx], gas_upper, max_ethereum_gwei, max_waiting_time, live_estimate)[0]
+        if handle.error is not None:
+            raise handle.error
+        return handle
+
+    @retry(max_retries=1, handle_error=True, raise_error=False)
+    def send_transaction(
+            self, tx: dict, max_ethereum_gwei: float = False,
+            gas_upper: float = 1.25, live_estimate: bool = False
+    ) -> str:
+        handle = self.submit(tx, max_ethereum_gwei, gas_upper, live_estimate=live_estimate)
+
+        with METRICS.phase(self.net_name, "wait_receipt"):
+            status = handle.result()
+
+        if handle.from_cache and self.gas_estimates.ran_out_of_gas(status, handle.tx['gas']):
+            self.logger.error(f'Tx {handle.hash} ran out of cached gas limit, sending again with live estimate')
+            self.gas_estimates.forget(self.net_name, handle.tx)
+            # a live estimate is never resent, so there is one resend at most
+            return self.send_transaction(self.retry_tx(handle.tx), max_ethereum_gwei, gas_upper, live_estimate=True)
+
+        if status:
+            if self.after_tx_sleeping:
+                self.sleeping("Take a sleep after submited tx")
+            return True
+        
+        else: return False
+
+    def bump_transaction(self, handle: "TxHandle", factor: float = 1.125, cancel: bool = False) -> str:
+        """
+        replaces a pending tx by a tx with the same nonce and fees raised `factor` times
+        ::cancel the new tx is an empty transfer to the account itself
+        ::returns hash of the new tx, the handle resolves with the first mined one
+        """
+        tx = handle.replacement(factor, cancel)
+        w3 = self.get_provider()
+
+        with METRICS.phase(self.net_name, "send"):
+            tx_hash = Web3.to_hex(w3.eth.send_raw_transaction(self.eth_account.sign_transaction(tx).rawTransaction))
+        return self.log_replacement(handle, tx, tx_hash, cancel)
+
+    def cancel_transaction(self, handle: "TxHandle", factor: float = 1.125) -> str:
+        return self.bump_transaction(handle, factor, cancel=True)
+
+    def log_replacement(self, handle: "TxHandle", tx: dict, tx_hash: str, cancel: bool) -> str:
+        self.logger.info(
+            f'{handle.hash} is {"cancelled" if cancel else "replaced"} by {tx_hash}',
+            event="tx_cancel" if cancel else "tx_bump", tx_hash=tx_hash
+        )
+        handle.add_version(tx, tx_hash, cancel)
+        return tx_hash
+        
+    def retry_tx(self, tx: dict) -> dict:
+        """
+        ::returns copy of a mined tx without nonce and gas limit, both are
+        filled again when it is sent
+        """
+        tx = dict(tx)
+        tx.pop("nonce", None)
+        tx.pop("gas", None)
+        return tx
+
+    @property
+    def gas_oracle(self) -> "GasOracle":
+        return GasOracle.get(self.nodes, self.net_name)
+
+    def get_gas_fees(self) -> "GasFees":
+        """
+        ::returns fees of the shared chain oracle, waits while gas price is above max_gwei
+        """
+        with METRICS.phase(self.net_name, "gas_price"):
+            return self.gas_oracle.wait_below(self.max_gwei, logger=self.logger)
+
+    def get_gas_price(self) -> int:
+        return round(self.get_gas_fees().gas_price)
+
+    def sign_transactions(self, txs: list, workers: int = None) -> list:
+        """
+        ::txs built txs of this account, signed in a process pool
+        ::returns raw txs in the same order
+        """
+        return sign_transactions([(self, tx) for tx in txs], workers=workers)
+
+    def sign_inline(self, txs: list) -> list:
+        """
+        ::returns raw txs signed in this process with the account key,
+        which is never copied to sign_transactions workers
+        """
+        return [bytes(self.eth_account.sign_transaction(tx).rawTransaction) for tx in txs]
+
+    def batch(self, w3: Web3 = None) -> "RPCBatch":
+        """
+        ::usage
+            with account.batch() as batch:
+                balance = batch.add("eth_getBalance", [account.address, "latest"], from_hex)
+                block   = batch.add("eth_blockNumber", formatter=from_hex)
+
+            print(balance.result, block.result)
+
+        All calls go to one node in one http request
+        """
+        return RPCBatch(w3 if w3 else self.get_provider())
+    
+    @property
+    def nonce_manager(self) -> "NonceManager":
+        return NonceManager.get(self.address, self.net_name)
+
+    def get_nonce(self, w3: Web3 = None) -> int:
+        manager = self.nonce_manager
+        if not manager.synced:
+            # only one thread goes to the node, others wait for its result
+            with manager.sync_lock:
+                if not manager.synced:
+                    w3 = w3 if w3 else self.get_provider()
+                    manager.sync(
+                        w3.eth.get_transaction_count(self.address, "pending")
+                    )
+        return manager.allocate()
+
+    def handle_nonce_error(self, tx: dict, error: object) -> None:
+        if TransactionErrors.classify(error) in ("nonce", "replacement"):
+            self.nonce_manager.resync()
+
+        elif "nonce" in tx:
+            # tx never reached the node, its nonce can be reused
+            self.nonce_manager.release(tx["nonce"])
+
+    def get_tx_data(self, value: int = 0, increase_gas_price : float = 1.25) -> dict:
+        """
+        ::returns tx without nonce, send_transactions gives it the next nonce,
+        so a tx which fails before the broadcast leaves no nonce gap
+        """
+        chain_id = self.get_chain_id()
+        fees     = self.get_gas_fees()
 
         data = {
-            'chainId': w3.eth.chain_id, 
-            'nonce': w3.eth.get_transaction_count(self.eth_account.address),  
+            'chainId': chain_id, 
             'from': self.eth_account.address, 
             "value": value
         }
-        if self.net_name in ["avalanche", "polygon", "arbitrum", "zora", "ethereum"]:
-            data["type"] = "0x2"
+        return self._apply_gas_fields(data, fees, increase_gas_price)
 
-        if self.net_name not in ['arbitrum', "avalanche", "polygon", "zora", "ethereum"]:
-            data["gasPrice"] = gas_price
-            
+    def _apply_gas_fields(self, data: dict, fees: "GasFees", increase_gas_price: float) -> dict:
+        if self.net_name in EIP1559_NETS and fees.max_fee:
+            data["type"] = "0x2"
+            data["maxPriorityFeePerGas"] = fees.priority_fee
+            data["maxFeePerGas"] = max(
+                round(fees.max_fee * increase_gas_price), fees.priority_fee
+            )
         else:
-            data["maxFeePerGas"] = gas_price
-            if self.net_name == "polygon":
-                data["maxPriorityFeePerGas"] = Web3.to_wei(uniform(35, 50), "gwei")
-            elif self.net_name == "avalanche":
-                data["maxPriorityFeePerGas"] = gas_price
-            elif self.net_name == "ethereum":
-                data["maxPriorityFeePerGas"] = Web3.to_wei(uniform(0.03, 0.07), "gwei")
-            elif self.net_name == "arbitrum":
-                data["maxPriorityFeePerGas"] = Web3.to_wei(uniform(0.01, 0.02), "gwei")
-            elif self.net_name == "zora":
-                data["maxPriorityFeePerGas"] = Web3.to_wei(uniform(0.005, 0.006), "gwei")
+            data["gasPrice"] = round(fees.gas_price * increase_gas_price)
 
         return data
     
+    def get_chain_id(self) -> int:
+        return self.metadata.get_or_fetch(
+            self.net_name, "chain_id", lambda: self.get_provider().eth.chain_id
+        )
+
+    def get_decimals(self, token_address: str) -> int:
+        return self.metadata.get_or_fetch(
+            self.net_name, f"{token_address.lower()}:decimals",
+            lambda: self.erc20_call(token_address, ERC20.DECIMALS)
+        )
+
+    def get_symbol(self, token_address: str) -> str:
+        return self.metadata.get_or_fetch(
+            self.net_name, f"{token_address.lower()}:symbol",
+            lambda: self.get_contract(token_address).functions.symbol().call()
+        )
+
     @retry(infinity=True, handle_error=True, custom_message="Cant get native balance")
     def get_native_balance(self) -> int:
         w3 = self.get_provider()
@@ -325,9 +1428,8 @@ class Web3Account:
     
     @retry(infinity=True, handle_error=True, custom_message="Cant get balance of token")
     def get_balance(self, token_address: str, get_decimals: bool = False):
-        contract = self.get_contract(token_address)
-        decimals    = contract.functions.decimals().call()
-        balance     = contract.functions.balanceOf(self.address).call()
+        decimals    = self.get_decimals(token_address)
+        balance     = self.erc20_call(token_address, ERC20.balance_of(self.address))
 
         from_wei_balance = balance / 10**decimals
 
@@ -336,27 +1438,69 @@ class Web3Account:
                 
         return balance, float(from_wei_balance)
     
+    @property
+    def allowance_tracker(self) -> "AllowanceTracker":
+        return AllowanceTracker.get(self.address, self.net_name)
+
     @retry(infinity=True, timing=5, handle_error=True)
-    def approve_token(self, token_contract: str, spender: str, amount: int = False):
-        def _approve_token():
-            contract = self.get_contract(token_contract)
-            already_approved_amount = contract.functions.allowance(self.address, spender).call()
-
-            if already_approved_amount < to_be_approved_balance:
-                tx_data = self.get_tx_data()
-                tx = contract.functions.approve(spender, balance).build_transaction(tx_data)
-                return tx
-            
-        balance, _ = self.get_balance(token_contract)
-        to_be_approved_balance = balance if amount is False else amount
-        
-        check_data = _approve_token()
+    def approve_token(self, token_contract: str, spender: str, amount: int = False, approve_max: bool = False):
+        """
+        ::amount allowance needed, the whole token balance by default
+        ::approve_max approve MAX_UINT256 instead of the whole token balance
+
+        an allowance known from a confirmed approve is not requested again
+        """
+        if amount is False:
+            amount, _ = self.get_balance(token_contract)
+
+        tracker = self.allowance_tracker
+        if tracker.covers(token_contract, spender, amount):
+            return
+
+        already_approved_amount = self.erc20_call(token_contract, ERC20.allowance(self.address, spender))
+        tracker.set(token_contract, spender, already_approved_amount)
 
-        if type(check_data) is dict:
-            if self.send_transaction(check_data):
+        if already_approved_amount < amount:
+            if approve_max:
+                to_be_approved = MAX_UINT256
+            else:
+                # the whole balance, so next swaps of this token need no approve
+                balance, _ = self.get_balance(token_contract)
+                to_be_approved = max(amount, balance)
+
+            tx = self.get_tx_data()
+            tx["to"]   = Web3.to_checksum_address(token_contract)
+            tx["data"] = ERC20.approve(spender, to_be_approved)
+
+            if self.send_transaction(tx):
+                tracker.set(token_contract, spender, to_be_approved)
                 return
             else: raise Exception(f"Cant approve token: {token_contract}")
 
+    def get_multicall(self) -> "Multicall":
+        return Multicall(self.get_provider(), self.net_name)
+
+    def get_balances(self, tokens: list, addresses: list = None) -> dict:
+        """
+        ::tokens erc20 addresses, "eth" is the native coin
+        ::addresses wallets to check, the account itself by default
+
+        returns {address: {token: balance}}, balance is None if its call failed
+        """
+        multicall = self.get_multicall()
+        calls = multicall.balance_calls(tokens, addresses if addresses else [self.address])
+
+        return multicall.collect(calls, multicall.aggregate(calls))
+
+    def get_allowances(self, tokens: list, spender: str, addresses: list = None) -> dict:
+        """
+        returns {address: {token: allowance}} of `spender`
+        """
+        multicall = self.get_multicall()
+        calls = multicall.allowance_calls(tokens, spender, addresses if addresses else [self.address])
+
+        return multicall.collect(calls, multicall.aggregate(calls))
+
     def send_money(self, receipt_address: str, amount: float) -> bool:
         value = Web3.to_wei(amount, "ether") 
         tx = self.get_tx_data(value)
@@ -364,26 +1508,39 @@ class Web3Account:
 
         return self.send_transaction(tx)
     
-    def swap(self, *args, increase_gas_price: float = 1.25):
+    def swap(self, *args, increase_gas_price: float = 1.25, approve_max: bool = False):
         """
         ::args token_in: str, token_out: str, amount: int
+        ::approve_max approve MAX_UINT256 of token_in instead of its whole balance
+
+        allowance of the 1inch spender is checked (or known) before the
+        swap calldata is requested
         """
+        token_in, amount = args[0], args[2]
+        spender = None
+
+        if token_in.upper() != "ETH":
+            spender = self.inch_helper.get_spender()
+            self.approve_token(token_in, spender, amount, approve_max=approve_max)
+
         data = self.inch_helper.get_data(
             *args
         )
         if data.get("statusCode") == 400:
             error = data.get("description")
-            if "Not enough allowance" in error:
+            if "Not enough allowance" in error and spender:
+                # the tracked allowance was spent outside of this account object
                 self.logger.info(f'We must approve token to spend on 1inch, approving...')
 
-                spender = Web3.to_checksum_address(error.split("Spender: ")[1])
-                self.approve_token(args[0], spender)
+                self.allowance_tracker.forget(token_in, spender)
+                self.approve_token(token_in, spender, amount, approve_max=approve_max)
 
-                return self.swap(*args, increase_gas_price=increase_gas_price)
-            else:
-                raise Exception(
-                    f"1Inch server raise exception: {error}"
-                )
+                data = self.inch_helper.get_data(*args)
+
+        if data.get("statusCode") == 400:
+            raise Exception(
+                f"1Inch server raise exception: {data.get('description')}"
+            )
         
         elif "tx" in data.keys():
             value = data["tx"]["value"]
@@ -392,124 +1549,3390 @@ class Web3Account:
             tx["to"] = Web3.to_checksum_address(data["tx"]["to"])
             tx["data"] = data["tx"]["data"]
 
-            return self.send_transaction(tx)
+            status = self.send_transaction(tx)
+            if status and spender:
+                self.allowance_tracker.spend(token_in, spender, amount)
+            return status
             
 
-class TransactionErrors:
-    def __init__(self, error: object, account: Web3Account, custom_message=None) -> None:
-        self.account        = account
-        self.custom_message = custom_message
+class AsyncWeb3Account(Web3Account):
+    """
+    asyncio counterpart of Web3Account: the same api, but every network
+    method is a coroutine built on the async providers, so one event loop
+    can drive thousands of accounts
 
-        if "nonce too low" in str(error):
-            message = "Nonce too low. [it is node error. all is ok, will retry]"
+    ::usage
+        account = AsyncWeb3Account("", "polygon")
+        balance = await account.get_native_balance()
+    """
+    async def sleeping(self, error_message: str = "") -> None:
+        time_sleep = randint(self.timings[0], self.timings[1])
+        self.logger.info(f'Sleeping {time_sleep} seconds.. {error_message}')
+        with METRICS.phase(self.net_name, "sleeping"):
+            await asyncio.sleep(time_sleep)
 
-        elif "gas required exceeds allowance" in str(error):
-            #balance = account
-            message = f"Account dont have native balance to pay comissions. [net: {account.net_name}]"
-        
-        elif "funds for transfer" in str(error):
-            message = f"Account dont have funds for this transfer. [net: {account.net_name}]"
-        
-        elif "we cant't execute" in str(error):
-            message = f"Node provider cant execute our request. Try to change node. [net: {account.net_name}]"
+    async def aclose(self) -> None:
+        """
+        closes 1inch sessions of the running loop, they are shared by all
+        async accounts of the loop and opened again on the next request
+        """
+        await Inch.aclose()
 
-        else:
-            message = str(error)
+    def get_provider(self, custom_net: str = False) -> Web3:
+        net_name = custom_net if custom_net else self.net_name
 
-        self.__log__(message)
+        if self.hedged_reads:
+            provider = self.nodes.routed(net_name, is_async=True)
+        else: provider = self.nodes.pick(net_name, is_async=True)
 
-    
-    def __log__(self, message: str):
-        if self.custom_message is not None:
-            message = f'[{self.custom_message}] {message}'
+        if provider is None:
+            raise Exception(
+                f"Cant find any provider for net name: {net_name}"
+            )
+        else: return provider
 
-        self.account.logger.error(message)
+    async def wait_until_tx_finished(self, transaction_hash: str, max_waiting_time: int = 600) -> "TxResult":
+        with METRICS.phase(self.net_name, "wait_receipt"):
+            result = await asyncio.wrap_future(self.watch_transaction(transaction_hash, max_waiting_time))
+        return self.log_tx_result(result)
 
-class Nodes:
-    def __init__(self, nodes_data: dict, proxies: str = None) -> None:
+    async def send_transactions(
+            self, txs: list, gas_upper: float = 1.25,
+            max_ethereum_gwei: float = False, max_waiting_time: int = 600,
+            live_estimate: bool = False
+    ) -> list:
+        w3 = self.get_provider()
+
+        if max_ethereum_gwei:
+            with METRICS.phase(self.net_name, "ethereum_gas_wait"):
+                await GasOracle.get(self.nodes, "ethereum").wait_below_async(
+                    max_ethereum_gwei, logger=self.logger
+                )
+
+        handles = [TxHandle(self, dict(tx), max_waiting_time) for tx in txs]
+        for handle in handles:
+            if "nonce" not in handle.tx:
+                handle.tx["nonce"] = await self.get_nonce(w3)
+
+        try:
+            with METRICS.phase(self.net_name, "estimate_gas"):
+                async with self.batch(w3) as batch:
+                    estimates, codes = self.add_estimates(batch, handles, live_estimate)
+        except Exception:
+            self.nonce_manager.resync()
+            raise
+
+        self.apply_codes(codes)
+        ready = self.apply_estimates(handles, estimates, gas_upper)
+        with METRICS.phase(self.net_name, "sign"):
+            # signing is cpu work, the loop keeps serving other accounts meanwhile
+            raw_txs = await asyncio.to_thread(self.sign_inline, [handle.tx for handle in ready])
+
+        with METRICS.phase(self.net_name, "send"):
+            for index in range(0, len(ready), SEND_BATCH_SIZE):
+                chunk = ready[index:index + SEND_BATCH_SIZE]
+                try:
+                    async with self.batch(w3) as batch:
+                        calls = [
+                            batch.add("eth_sendRawTransaction", [Web3.to_hex(raw_tx)])
+                            for raw_tx in raw_txs[index:index + SEND_BATCH_SIZE]
+                        ]
+                except Exception as error:
+                    self.fail_unsent(ready[index:], error)
+                    break
+
+                self.apply_broadcast(chunk, calls)
+        return handles
+
+    async def submit(
+            self, tx: dict, max_ethereum_gwei: float = False,
+            gas_upper: float = 1.25, max_waiting_time: int = 600,
+            live_estimate: bool = False
+    ) -> "TxHandle":
+        handle = (await self.send_transactions([tx], gas_upper, max_ethereum_gwei, max_waiting_time, live_estimate))[0]
+        if handle.error is not None:
+            raise handle.error
+        return handle
+
+    @retry(max_retries=1, handle_error=True, raise_error=False)
+    async def send_transaction(
+            self, tx: dict, max_ethereum_gwei: float = False,
+            gas_upper: float = 1.25, live_estimate: bool = False
+    ) -> str:
+        handle = await self.submit(tx, max_ethereum_gwei, gas_upper, live_estimate=live_estimate)
+
+        with METRICS.phase(self.net_name, "wait_receipt"):
+            status = await handle.wait()
+
+        if handle.from_cache and self.gas_estimates.ran_out_of_gas(status, handle.tx['gas']):
+            self.logger.error(f'Tx {handle.hash} ran out of cached gas limit, sending again with live estimate')
+            self.gas_estimates.forget(self.net_name, handle.tx)
+            return await self.send_transaction(self.retry_tx(handle.tx), max_ethereum_gwei, gas_upper, live_estimate=True)
+
+        if status:
+            if self.after_tx_sleeping:
+                await self.sleeping("Take a sleep after submited tx")
+            return True
+
+        else: return False
+
+    async def bump_transaction(self, handle: "TxHandle", factor: float = 1.125, cancel: bool = False) -> str:
+        tx = handle.replacement(factor, cancel)
+        w3 = self.get_provider()
+
+        with METRICS.phase(self.net_name, "send"):
+            tx_hash = Web3.to_hex(await w3.eth.send_raw_transaction(self.eth_account.sign_transaction(tx).rawTransaction))
+        return self.log_replacement(handle, tx, tx_hash, cancel)
+
+    async def cancel_transaction(self, handle: "TxHandle", factor: float = 1.125) -> str:
+        return await self.bump_transaction(handle, factor, cancel=True)
+
+    async def get_gas_fees(self) -> "GasFees":
+        with METRICS.phase(self.net_name, "gas_price"):
+            return await self.gas_oracle.wait_below_async(self.max_gwei, logger=self.logger)
+
+    async def get_gas_price(self) -> int:
+        return round((await self.get_gas_fees()).gas_price)
+
+    async def get_nonce(self, w3: Web3 = None) -> int:
+        if not self.nonce_manager.synced:
+            w3 = w3 if w3 else self.get_provider()
+            self.nonce_manager.sync(
+                await w3.eth.get_transaction_count(self.address, "pending")
+            )
+        return self.nonce_manager.allocate()
+
+    async def get_tx_data(self, value: int = 0, increase_gas_price : float = 1.25) -> dict:
+        chain_id = await self.get_chain_id()
+        fees     = await self.get_gas_fees()
+
+        data = {
+            'chainId': chain_id,
+            'from': self.eth_account.address,
+            "value": value
+        }
+        return self._apply_gas_fields(data, fees, increase_gas_price)
+
+    async def get_chain_id(self) -> int:
+        return await self.metadata.get_or_fetch_async(
+            self.net_name, "chain_id", lambda: self.get_provider().eth.chain_id
+        )
+
+    async def erc20_call(self, token_address: str, data: str, w3: Web3 = None) -> int:
+        w3 = w3 if w3 else self.get_provider()
+        return ERC20.decode_uint(await w3.eth.call({"to": Web3.to_checksum_address(token_address), "data": data}))
+
+    async def get_decimals(self, token_address: str) -> int:
+        return await self.metadata.get_or_fetch_async(
+            self.net_name, f"{token_address.lower()}:decimals",
+            lambda: self.erc20_call(token_address, ERC20.DECIMALS)
+        )
+
+    async def get_symbol(self, token_address: str) -> str:
+        return await self.metadata.get_or_fetch_async(
+            self.net_name, f"{token_address.lower()}:symbol",
+            lambda: self.get_contract(token_address).functions.symbol().call()
+        )
+
+    @retry(infinity=True, handle_error=True, custom_message="Cant get native balance")
+    async def get_native_balance(self) -> int:
+        w3 = self.get_provider()
+        return await w3.eth.get_balance(self.address)
+
+    @retry(infinity=True, handle_error=True, custom_message="Cant get balance of token")
+    async def get_balance(self, token_address: str, get_decimals: bool = False):
+        decimals, balance = await asyncio.gather(
+            self.get_decimals(token_address),
+            self.erc20_call(token_address, ERC20.balance_of(self.address))
+        )
+
+        from_wei_balance = balance / 10**decimals
+
+        if get_decimals:
+            return balance, float(from_wei_balance), decimals
+
+        return balance, float(from_wei_balance)
+
+    @retry(infinity=True, timing=5, handle_error=True)
+    async def approve_token(self, token_contract: str, spender: str, amount: int = False, approve_max: bool = False):
+        if amount is False:
+            amount, _ = await self.get_balance(token_contract)
+
+        tracker = self.allowance_tracker
+        if tracker.covers(token_contract, spender, amount):
+            return
+
+        already_approved_amount = await self.erc20_call(token_contract, ERC20.allowance(self.address, spender))
+        tracker.set(token_contract, spender, already_approved_amount)
+
+        if already_approved_amount < amount:
+            if approve_max:
+                to_be_approved = MAX_UINT256
+            else:
+                balance, _ = await self.get_balance(token_contract)
+                to_be_approved = max(amount, balance)
+
+            tx = await self.get_tx_data()
+            tx["to"]   = Web3.to_checksum_address(token_contract)
+            tx["data"] = ERC20.approve(spender, to_be_approved)
+
+            if await self.send_transaction(tx):
+                tracker.set(token_contract, spender, to_be_approved)
+                return
+            else: raise Exception(f"Cant approve token: {token_contract}")
+
+    async def get_balances(self, tokens: list, addresses: list = None) -> dict:
+        multicall = self.get_multicall()
+        calls = multicall.balance_calls(tokens, addresses if addresses else [self.address])
+
+        return multicall.collect(calls, await multicall.aggregate_async(calls))
+
+    async def get_allowances(self, tokens: list, spender: str, addresses: list = None) -> dict:
+        multicall = self.get_multicall()
+        calls = multicall.allowance_calls(tokens, spender, addresses if addresses else [self.address])
+
+        return multicall.collect(calls, await multicall.aggregate_async(calls))
+
+    async def send_money(self, receipt_address: str, amount: float) -> bool:
+        value = Web3.to_wei(amount, "ether")
+        tx = await self.get_tx_data(value)
+        tx["to"] = Web3.to_checksum_address(receipt_address)
+
+        return await self.send_transaction(tx)
+
+    async def swap(self, *args, increase_gas_price: float = 1.25, approve_max: bool = False):
         """
-        ::nodes_data must be:
-            {
-                "polygon" : ["http://Node1", "http://Node2"....],
-                "bsc"     : ["http://Node1", "http://Node2"....]
-            }
+        ::args token_in: str, token_out: str, amount: int
         """
-        self.nodes_data           = nodes_data
-        self.proxies              = proxies
-        self.connected_rpcs       = {}
-        self.connected_async_rpcs = {}
+        token_in, amount = args[0], args[2]
+        spender = None
 
-        self.connect_to_all_nodes()
+        if token_in.upper() != "ETH":
+            spender = await self.inch_helper.get_spender_async()
+            await self.approve_token(token_in, spender, amount, approve_max=approve_max)
 
-    def connect_to_all_nodes(self):
-        if self.proxies:
-            proxy = {
-                "http"  : f"http://{self.proxies}",
-                "https" : f"http://{self.proxies}"
-            }
-        else: proxy = None
+        data = await self.inch_helper.get_data_async(*args)
 
-        for net_name in self.nodes_data:
-            temp, async_temp = [], []
+        if data.get("statusCode") == 400:
+            error = data.get("description")
+            if "Not enough allowance" in error and spender:
+                self.logger.info(f'We must approve token to spend on 1inch, approving...')
 
-            for i in self.nodes_data[net_name]:
-                temp.append(Web3(Web3.HTTPProvider(i, request_kwargs=proxy)))
+                self.allowance_tracker.forget(token_in, spender)
+                await self.approve_token(token_in, spender, amount, approve_max=approve_max)
 
-                web3 = Web3(
-                    AsyncHTTPProvider(i, request_kwargs=proxy),
-                    modules={"eth": (AsyncEth,)},
-                    middlewares=[]
-                )
-                async_temp.append(web3)
-            
-            self.connected_rpcs.update({net_name: temp})
-            self.connected_async_rpcs.update({net_name: temp})
+                data = await self.inch_helper.get_data_async(*args)
 
-        logs.success(f'Connected to all RPCs')
+        if data.get("statusCode") == 400:
+            raise Exception(
+                f"1Inch server raise exception: {data.get('description')}"
+            )
 
-    @property
-    def nodes(self):
-        return self.connected_rpcs
-    
-    @property
-    def async_nodes(self):
-        return self.connected_async_rpcs
+        elif "tx" in data.keys():
+            value = data["tx"]["value"]
 
+            tx = await self.get_tx_data(int(value), increase_gas_price=increase_gas_price)
+            tx["to"] = Web3.to_checksum_address(data["tx"]["to"])
+            tx["data"] = data["tx"]["data"]
 
-class Inch:
-    def __init__(
-            self, account: Web3Account, 
-            url: str = BASE_INCH_URL,
-            version: int = BASE_INCH_VER
-    ) -> None:
-        self.chain_id = account.get_provider().eth.chain_id
-        self.url      = f'{url}/v{version}.0/{self.chain_id}/swap'
-        self.account  = account
+            status = await self.send_transaction(tx)
+            if status and spender:
+                self.allowance_tracker.spend(token_in, spender, amount)
+            return status
 
-    @retry(max_retries=5, timing=10, handle_error=True, custom_message="1inch handler")
-    def make_request(self, url: str, method: str = "get", **kwargs):
-        response = requests.request(
-            method=method,
-            url=url,
-            **kwargs
-        )
 
-        return response.json()
-    
-    def get_data(self, token_in: str, token_out: str, amount: int) -> str:
-        if token_in.upper() == "ETH":
-            token_in = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
-        elif token_out.upper() == "ETH":
-            token_out = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
-
-        kwargs = {
-            "params": {
-                "fromTokenAddress" : token_in,
-                "toTokenAddress"   : token_out,
-                "fromAddress"      : self.account.address,
-                "slippage"         : 1,
-                "amount"           : amount
-            },
-            "timeout": 10
-        }
-        return self.make_request(self.url, **kwargs)
+class Multicall:
+    def __init__(self, w3: Web3, net_name: str) -> None:
+        """
+        ::w3 sync or async Web3, many view calls are packed into
+        Multicall3 `aggregate3` calls, every call is allowed to fail
+        """
+        self.w3       = w3
+        self.net_name = net_name
+        self.address  = MULTICALL3_ADDRESSES.get(net_name, MULTICALL3_ADDRESS)
+        self.contract = CONTRACTS.get(w3, net_name, self.address, MULTICALL3_ABI)
+
+    def balance_calls(self, tokens: list, addresses: list) -> list:
+        """
+        ::returns [(address, token, (target, allowFailure, callData))]
+        """
+        targets = {token: Web3.to_checksum_address(token) for token in tokens if token.upper() != "ETH"}
+
+        calls = []
+        for address in addresses:
+            address = Web3.to_checksum_address(address)
+
+            for token in tokens:
+                if token.upper() == "ETH":
+                    call_data = ERC20.eth_balance(address)
+                    target    = self.address
+                else:
+                    call_data = ERC20.balance_of(address)
+                    target    = targets[token]
+
+                calls.append((address, token, (target, True, call_data)))
+        return calls
+
+    def allowance_calls(self, tokens: list, spender: str, addresses: list) -> list:
+        spender = Web3.to_checksum_address(spender)
+        targets = {token: Web3.to_checksum_address(token) for token in tokens}
+
+        calls = []
+        for address in addresses:
+            address = Web3.to_checksum_address(address)
+
+            for token in tokens:
+                calls.append((address, token, (targets[token], True, ERC20.allowance(address, spender))))
+        return calls
+
+    @staticmethod
+    def chunks(calls: list) -> list:
+        """
+        splits calls so one aggregate3 stays under the calldata and gas limits
+        """
+        chunks, chunk, size = [], [], 0
+
+        for call in calls:
+            # every call costs its calldata plus ~5 abi words of tuple encoding
+            call_size = len(call[2][2]) // 2 + 160
+
+            if chunk and (
+                size + call_size > MULTICALL_MAX_CALLDATA
+                or (len(chunk) + 1) * MULTICALL_CALL_GAS > MULTICALL_MAX_GAS
+            ):
+                chunks.append(chunk)
+                chunk, size = [], 0
+
+            chunk.append(call)
+            size += call_size
+
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def encode_aggregate(self, chunk: list) -> dict:
+        # encoded with the codec directly, web3 argument validation of
+        # hundreds of tuples costs more than the call itself
+        calls = [
+            (target, allow_failure, bytes.fromhex(call_data[2:]))
+            for _, _, (target, allow_failure, call_data) in chunk
+        ]
+        return {
+            "to"   : self.address,
+            "data" : ERC20.AGGREGATE3 + self.w3.codec.encode(["(address,bool,bytes)[]"], [calls]).hex()
+        }
+
+    def decode_aggregate(self, return_data: bytes) -> list:
+        return self.w3.codec.decode(["(bool,bytes)[]"], bytes(return_data))[0]
+
+    @retry(max_retries=3, timing=1, raise_error=False)
+    def _aggregate(self, chunk: list) -> list:
+        return self.decode_aggregate(self.w3.eth.call(self.encode_aggregate(chunk)))
+
+    @retry(max_retries=3, timing=1, raise_error=False)
+    async def _aggregate_async(self, chunk: list) -> list:
+        return self.decode_aggregate(await self.w3.eth.call(self.encode_aggregate(chunk)))
+
+    def aggregate(self, calls: list) -> list:
+        """
+        ::returns [(success, returnData)] in the order of calls, a chunk
+        which failed as a whole gives (False, b"") for every its call
+        """
+        results = []
+        for chunk in self.chunks(calls):
+            response = self._aggregate(chunk)
+            results.extend(response if response is not None else [(False, b"")] * len(chunk))
+        return results
+
+    async def aggregate_async(self, calls: list) -> list:
+        chunks    = self.chunks(calls)
+        responses = await asyncio.gather(*[self._aggregate_async(chunk) for chunk in chunks])
+
+        results = []
+        for chunk, response in zip(chunks, responses):
+            results.extend(response if response is not None else [(False, b"")] * len(chunk))
+        return results
+
+    def collect(self, calls: list, results: list) -> dict:
+        collected = {}
+        for (address, token, _), (success, return_data) in zip(calls, results):
+            value = None
+            if success and len(return_data) >= 32:
+                value = ERC20.decode_uint(return_data)
+
+            collected.setdefault(address, {})[token] = value
+        return collected
+
+
+class TransactionErrors:
+    # (substring of the node error, category)
+    CATEGORIES = [
+        ("nonce too low",                       "nonce"),
+        ("replacement transaction underpriced", "replacement"),
+        ("gas required exceeds allowance",      "no_gas"),
+        ("funds for transfer",                  "no_funds"),
+        ("insufficient funds",                  "no_funds"),
+        ("we cant't execute",                   "node")
+    ]
+
+    def __init__(self, error: object, account: Web3Account, custom_message=None) -> None:
+        self.account        = account
+        self.custom_message = custom_message
+        self.category       = self.classify(error)
+
+        if self.category == "nonce":
+            message = "Nonce too low. [it is node error. all is ok, will retry]"
+
+        elif self.category == "replacement":
+            message = "Replacement transaction underpriced. [nonce is already used by pending tx, will resync]"
+
+        elif self.category == "no_gas":
+            #balance = account
+            message = f"Account dont have native balance to pay comissions. [net: {account.net_name}]"
+        
+        elif self.category == "no_funds":
+            message = f"Account dont have funds for this transfer. [net: {account.net_name}]"
+        
+        elif self.category == "node":
+            message = f"Node provider cant execute our request. Try to change node. [net: {account.net_name}]"
+
+        else:
+            message = str(error)
+
+        self.__log__(message)
+
+    @classmethod
+    def classify(cls, error: object) -> str:
+        if isinstance(error, node_exceptions()):
+            return "node"
+
+        error = str(error)
+        for pattern, category in cls.CATEGORIES:
+            if pattern in error:
+                return category
+
+        if any(marker in error.lower() for marker in NODE_ERROR_MARKERS):
+            return "node"
+
+    def __log__(self, message: str):
+        if self.custom_message is not None:
+            message = f'[{self.custom_message}] {message}'
+
+        self.account.logger.error(message)
+
+
+class MetadataCache:
+    """
+    Values which never change on a chain: chain_id, token decimals and symbol.
+
+    They are kept in memory and, when `path` is set, in a SQLite file,
+    so other processes and later runs read them without any RPC
+    """
+    def __init__(self, path: str = None) -> None:
+        self.path   = path
+        self.values = {}
+        self.hits   = 0
+        self.misses = 0
+        self.lock   = threading.Lock()
+        self._db    = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None and self.path:
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata "
+                "(net_name TEXT, key TEXT, value TEXT, PRIMARY KEY (net_name, key))"
+            )
+            self._db.commit()
+        return self._db
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.values)}
+
+    def get(self, net_name: str, key: str):
+        value = self.values.get((net_name, key))
+
+        if value is None and self.path:
+            with self.lock:
+                row = self.db.execute(
+                    "SELECT value FROM metadata WHERE net_name = ? AND key = ?",
+                    (net_name, key)
+                ).fetchone()
+
+            if row is not None:
+                value = json.loads(row[0])
+                self.values[(net_name, key)] = value
+
+        if value is None:
+            self.misses += 1
+        else: self.hits += 1
+
+        return value
+
+    def set(self, net_name: str, key: str, value):
+        self.values[(net_name, key)] = value
+
+        if self.path:
+            with self.lock:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?)",
+                    (net_name, key, json.dumps(value))
+                )
+                self.db.commit()
+        return value
+
+    def get_or_fetch(self, net_name: str, key: str, fetch):
+        value = self.get(net_name, key)
+        if value is None:
+            value = self.set(net_name, key, fetch())
+        return value
+
+    async def get_or_fetch_async(self, net_name: str, key: str, fetch):
+        value = self.get(net_name, key)
+        if value is None:
+            value = self.set(net_name, key, await fetch())
+        return value
+
+    def clear(self) -> None:
+        self.values = {}
+        self.hits, self.misses = 0, 0
+
+        if self.path:
+            with self.lock:
+                self.db.execute("DELETE FROM metadata")
+                self.db.commit()
+
+
+METADATA_CACHE = MetadataCache()
+
+
+class GasEstimateCache:
+    """
+    Memoized `estimate_gas` of repeated tx shapes, keyed by (chain, to,
+    selector, calldata shape, value class). Calldata shape is its length and
+    which 32-byte words are zero, so the same call with other non-zero
+    arguments shares the estimate. Entries live TTL seconds, the least
+    recently used are evicted above MAX_SIZE.
+
+    Plain native transfers cost 21000 everywhere except DYNAMIC_TRANSFER_NETS,
+    where gas includes L1 data fees and is always estimated. The constant is
+    used only for receivers known to have no code (see set_code): a contract
+    with `receive()` (a Safe, WETH, a bridge) needs more
+    """
+    TTL                   = 600
+    MAX_SIZE              = 10000
+    NATIVE_TRANSFER_GAS   = 21000
+    DYNAMIC_TRANSFER_NETS = {"arbitrum", "arbitrum_nova", "zksync", "mantle"}
+
+    def __init__(self, ttl: float = None, max_size: int = None) -> None:
+        self.ttl      = ttl if ttl else self.TTL
+        self.max_size = max_size if max_size else self.MAX_SIZE
+        self.entries  = OrderedDict()
+        self.codes    = OrderedDict()
+        self.lock     = threading.Lock()
+
+    @staticmethod
+    def key(net_name: str, tx: dict) -> tuple:
+        data = tx.get("data") or "0x"
+        if not isinstance(data, str):
+            data = Web3.to_hex(data)
+        data = data[2:] if data.startswith("0x") else data
+
+        words = tuple(
+            int(data[index:index + 64], 16) == 0 for index in range(8, len(data), 64)
+        )
+        return (
+            net_name, str(tx.get("to", "")).lower(), data[:8],
+            (len(data), words), bool(tx.get("value"))
+        )
+
+    @staticmethod
+    def is_plain_transfer(tx: dict) -> bool:
+        return tx.get("data") in (None, "", "0x", b"") and bool(tx.get("to"))
+
+    def is_native_transfer(self, net_name: str, tx: dict) -> bool:
+        return (
+            net_name not in self.DYNAMIC_TRANSFER_NETS and self.is_plain_transfer(tx) and
+            self.codes.get((net_name, str(tx["to"]).lower())) is False
+        )
+
+    def code_unknown(self, net_name: str, tx: dict) -> bool:
+        """
+        ::returns True for a plain transfer to an address which was not checked for code yet
+        """
+        return (
+            net_name not in self.DYNAMIC_TRANSFER_NETS and self.is_plain_transfer(tx) and
+            (net_name, str(tx["to"]).lower()) not in self.codes
+        )
+
+    def set_code(self, net_name: str, address: str, has_code: bool) -> None:
+        with self.lock:
+            self.codes[(net_name, address.lower())] = has_code
+            while len(self.codes) > self.max_size:
+                self.codes.popitem(last=False)
+
+    def get(self, net_name: str, tx: dict) -> int:
+        """
+        ::returns known estimate or None
+        """
+        if self.is_native_transfer(net_name, tx):
+            return self.NATIVE_TRANSFER_GAS
+
+        key = self.key(net_name, tx)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, net_name: str, tx: dict, gas: int) -> None:
+        if self.is_native_transfer(net_name, tx):
+            return
+
+        with self.lock:
+            self.entries[self.key(net_name, tx)] = (time.time() + self.ttl, gas)
+            self.entries.move_to_end(self.key(net_name, tx))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def forget(self, net_name: str, tx: dict) -> None:
+        with self.lock:
+            self.entries.pop(self.key(net_name, tx), None)
+            # the receiver could get code since it was checked
+            if tx.get("to"):
+                self.codes.pop((net_name, str(tx["to"]).lower()), None)
+
+    @staticmethod
+    def ran_out_of_gas(result: "TxResult", gas_limit: int) -> bool:
+        # out of gas burns the whole limit, or all but 1/64 of it in a subcall
+        return (
+            result.status == TxResult.FAILED and result.gas_used is not None and
+            result.gas_used * 64 >= gas_limit * 63
+        )
+
+
+GAS_ESTIMATES = GasEstimateCache()
+
+
+class NonceManager:
+    """
+    Hands out nonces of one (address, chain) from memory, so building a tx
+    costs no `get_transaction_count` call and several txs can be in flight.
+
+    It is synced with the node `pending` count on the first use and after
+    every `resync` (nonce too low / replacement underpriced / dropped tx)
+    """
+    _managers = {}
+    _lock     = threading.Lock()
+
+    def __init__(self, address: str, net_name: str) -> None:
+        self.address    = address
+        self.net_name   = net_name
+        self.next_nonce = None
+        self.released   = []
+        self.lock       = threading.Lock()
+        self.sync_lock  = threading.Lock()
+
+    @classmethod
+    def get(cls, address: str, net_name: str) -> "NonceManager":
+        key = (address.lower(), net_name)
+        manager = cls._managers.get(key)
+
+        if manager is None:
+            with cls._lock:
+                manager = cls._managers.setdefault(key, cls(address, net_name))
+        return manager
+
+    @property
+    def synced(self) -> bool:
+        return self.next_nonce is not None
+
+    def sync(self, pending_count: int) -> None:
+        with self.lock:
+            # another thread could sync and allocate while we were fetching
+            if self.next_nonce is None:
+                self.next_nonce = pending_count
+                self.released   = []
+
+    def resync(self) -> None:
+        with self.lock:
+            self.next_nonce = None
+            self.released   = []
+
+    def allocate(self) -> int:
+        with self.lock:
+            if self.next_nonce is None:
+                raise Exception(
+                    f"Nonce manager is not synced: {self.address} [net: {self.net_name}]"
+                )
+
+            if self.released:
+                return heapq.heappop(self.released)
+
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+    def release(self, nonce: int) -> None:
+        """
+        ::nonce of a tx which never reached the node, it is given out again
+        before any new one, so the account does not get a nonce gap
+        """
+        with self.lock:
+            if self.next_nonce is None or nonce >= self.next_nonce:
+                return
+
+            if nonce == self.next_nonce - 1:
+                self.next_nonce -= 1
+            elif nonce not in self.released:
+                heapq.heappush(self.released, nonce)
+
+
+class AllowanceTracker:
+    """
+    Allowances of one (address, chain) known from allowance calls and
+    confirmed approves, so repeated swaps of a token need no allowance RPC.
+    Swaps decrease it, MAX_UINT256 allowances are treated as infinite
+    """
+    _trackers = {}
+    _lock     = threading.Lock()
+
+    def __init__(self, address: str, net_name: str) -> None:
+        self.address    = address
+        self.net_name   = net_name
+        self.allowances = {}
+        self.lock       = threading.Lock()
+
+    @classmethod
+    def get(cls, address: str, net_name: str) -> "AllowanceTracker":
+        key = (address.lower(), net_name)
+        tracker = cls._trackers.get(key)
+
+        if tracker is None:
+            with cls._lock:
+                tracker = cls._trackers.setdefault(key, cls(address, net_name))
+        return tracker
+
+    def allowance(self, token: str, spender: str) -> int:
+        return self.allowances.get((token.lower(), spender.lower()))
+
+    def covers(self, token: str, spender: str, amount: int) -> bool:
+        allowance = self.allowance(token, spender)
+        return allowance is not None and allowance >= amount
+
+    def set(self, token: str, spender: str, amount: int) -> None:
+        with self.lock:
+            self.allowances[(token.lower(), spender.lower())] = amount
+
+    def spend(self, token: str, spender: str, amount: int) -> None:
+        key = (token.lower(), spender.lower())
+        with self.lock:
+            allowance = self.allowances.get(key)
+            if allowance is not None and allowance < MAX_UINT256:
+                self.allowances[key] = max(0, allowance - amount)
+
+    def forget(self, token: str, spender: str) -> None:
+        with self.lock:
+            self.allowances.pop((token.lower(), spender.lower()), None)
+
+
+class TxResult:
+    SUCCESS   = "success"
+    FAILED    = "failed"
+    TIMEOUT   = "timeout"
+    NOT_SENT  = "not_sent"
+    # a version of a TxHandle which lost to another one with the same nonce
+    REPLACED  = "replaced"
+    CANCELLED = "cancelled"
+
+    def __init__(self, transaction_hash: str, status: str, receipt: dict = None) -> None:
+        """
+        ::receipt raw JSON-RPC receipt, None on timeout
+        """
+        self.transaction_hash = transaction_hash
+        self.status           = status
+        self.receipt          = receipt
+
+    @property
+    def block_number(self) -> int:
+        if self.receipt:
+            return from_hex(self.receipt["blockNumber"])
+
+    @property
+    def gas_used(self) -> int:
+        if self.receipt:
+            return from_hex(self.receipt["gasUsed"])
+
+    def __bool__(self) -> bool:
+        return self.status == self.SUCCESS
+
+    def __repr__(self) -> str:
+        return f"TxResult({self.transaction_hash}, {self.status})"
+
+
+class TxHandle:
+    """
+    A tx of `send_transactions`, returned right after the broadcast: poll it,
+    wait for it (sync or async) or replace it while it is pending. All
+    versions (bumps / cancel) share the nonce, the handle resolves with the
+    first mined one, or with TIMEOUT when every version timed out
+    """
+    def __init__(self, account: "Web3Account", tx: dict, max_waiting_time: int = 600) -> None:
+        self.account          = account
+        self.tx               = tx
+        self.max_waiting_time = max_waiting_time
+        self.error            = None
+        self.from_cache       = False
+        self.hashes           = []
+        self.cancel_hashes    = set()
+        self.timeouts         = 0
+        self.resolved         = False
+        self.future           = Future()
+        self.lock             = threading.Lock()
+
+    @property
+    def hash(self) -> str:
+        # the last sent version
+        return self.hashes[-1] if self.hashes else None
+
+    @property
+    def nonce(self) -> int:
+        return self.tx.get("nonce")
+
+    def __repr__(self) -> str:
+        return f"TxHandle({self.nonce}, {self.hash}, {self.poll()})"
+
+    def set_error(self, error: Exception) -> None:
+        self.error    = error
+        self.resolved = True
+        self.future.set_result(TxResult(None, TxResult.NOT_SENT))
+
+    def add_version(self, tx: dict, tx_hash: str, cancel: bool = False) -> None:
+        tx_hash = tx_hash.lower()
+        with self.lock:
+            self.tx = tx
+            self.hashes.append(tx_hash)
+            if cancel:
+                self.cancel_hashes.add(tx_hash)
+
+        self.account.watch_transaction(tx_hash, self.max_waiting_time).add_done_callback(self._on_result)
+
+    def _on_result(self, future: Future) -> None:
+        result = future.result()
+        if result.status == TxResult.REPLACED:
+            return
+
+        with self.lock:
+            if self.resolved:
+                return
+
+            if result.status == TxResult.TIMEOUT:
+                self.timeouts += 1
+                if self.timeouts < len(self.hashes):
+                    return
+
+            elif result.transaction_hash in self.cancel_hashes:
+                result = TxResult(result.transaction_hash, TxResult.CANCELLED, result.receipt)
+
+            self.resolved = True
+            others = [tx_hash for tx_hash in self.hashes if tx_hash != result.transaction_hash]
+
+        account = self.account
+        account.log_tx_result(result)
+        METRICS.inc("txs_total", chain=account.net_name, status=result.status)
+        if result.status == TxResult.TIMEOUT:
+            # tx could be dropped from mempool, so its nonce must be re-read
+            account.nonce_manager.resync()
+        else:
+            for tx_hash in others:
+                account.receipt_watcher.forget(tx_hash)
+
+        self.future.set_result(result)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def poll(self) -> "TxResult":
+        """
+        ::returns TxResult or None while the tx is pending
+        """
+        return self.future.result() if self.future.done() else None
+
+    def result(self, timeout: float = None) -> "TxResult":
+        return self.future.result(timeout)
+
+    async def wait(self) -> "TxResult":
+        return await asyncio.wrap_future(self.future)
+
+    def replacement(self, factor: float, cancel: bool = False) -> dict:
+        """
+        ::returns the last version with fees raised `factor` times (nodes want
+        at least 10% more), `cancel` makes it an empty transfer to the account
+        """
+        if self.hash is None or self.done():
+            raise Exception(f"Tx with nonce {self.nonce} is not pending: {self.poll()}")
+
+        tx = dict(self.tx)
+        if cancel:
+            tx.pop("data", None)
+            tx.update({"to": self.account.address, "value": 0, "gas": GasEstimateCache.NATIVE_TRANSFER_GAS})
+
+        for field in ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas"):
+            if field in tx:
+                tx[field] = int(tx[field] * factor) + 1
+        return tx
+
+    def bump(self, factor: float = 1.125):
+        """
+        ::returns hash of the new version (a coroutine for async accounts)
+        """
+        return self.account.bump_transaction(self, factor)
+
+    def cancel(self, factor: float = 1.125):
+        return self.account.cancel_transaction(self, factor)
+
+    @staticmethod
+    def wait_all(handles: list, timeout: float = None) -> list:
+        """
+        ::returns TxResult of every handle in the same order
+        """
+        return [handle.result(timeout) for handle in handles]
+
+    @staticmethod
+    async def gather(handles: list) -> list:
+        return list(await asyncio.gather(*[handle.wait() for handle in handles]))
+
+
+class ReceiptWatcher:
+    """
+    One watcher per chain in the process: it follows new blocks and resolves
+    every pending hash from the receipts of that block, so the RPC load
+    depends on the block rate, not on the number of pending txs
+    """
+    POLL_INTERVAL = 1
+    # new blocks since the last tick are read in batches of this many eth_getBlockReceipts
+    BLOCKS_PER_BATCH = 10
+    # after a longer gap it is cheaper to ask pending hashes directly
+    MAX_BLOCK_GAP = 200
+
+    _watchers = {}
+    _lock     = threading.Lock()
+
+    def __init__(self, nodes: "Nodes", net_name: str) -> None:
+        self.nodes          = nodes
+        self.net_name       = net_name
+        self.pending        = {}
+        self.new_hashes     = set()
+        self.last_block     = None
+        self.block_receipts = True
+        self.thread         = None
+        self.lock           = threading.Lock()
+
+    @classmethod
+    def get(cls, nodes: "Nodes", net_name: str) -> "ReceiptWatcher":
+        key = (net_name, tuple(nodes.nodes_data.get(net_name, [])), nodes.proxies)
+        watcher = cls._watchers.get(key)
+
+        if watcher is None:
+            with cls._lock:
+                watcher = cls._watchers.setdefault(key, cls(nodes, net_name))
+        return watcher
+
+    def watch(self, transaction_hash: str, max_waiting_time: int = 600, callback=None) -> Future:
+        transaction_hash = transaction_hash.lower()
+        future = Future()
+        if callback:
+            future.add_done_callback(lambda done: callback(done.result()))
+
+        with self.lock:
+            self.pending.setdefault(transaction_hash, []).append(
+                (future, time.time() + max_waiting_time)
+            )
+            self.new_hashes.add(transaction_hash)
+
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        return future
+
+    def forget(self, transaction_hash: str) -> None:
+        """
+        stops watching a hash which can't be mined anymore (its nonce is
+        taken by a replacement), waiters get a REPLACED result
+        """
+        self._resolve(transaction_hash.lower(), TxResult.REPLACED)
+
+    def _resolve(self, transaction_hash: str, status: str, receipt: dict = None, expired: bool = False) -> None:
+        now = time.time()
+        with self.lock:
+            waiters = self.pending.pop(transaction_hash, [])
+            if expired:
+                # only waiters with a passed deadline time out
+                left = [(future, deadline) for future, deadline in waiters if deadline > now]
+                waiters = [(future, deadline) for future, deadline in waiters if deadline <= now]
+                if left:
+                    self.pending[transaction_hash] = left
+
+        for future, _ in waiters:
+            if not future.done():
+                future.set_result(TxResult(transaction_hash, status, receipt))
+
+    def _resolve_receipts(self, receipts: list) -> None:
+        for receipt in receipts:
+            if not receipt:
+                continue
+
+            transaction_hash = receipt["transactionHash"].lower()
+            if transaction_hash in self.pending:
+                status = TxResult.SUCCESS if from_hex(receipt["status"]) == 1 else TxResult.FAILED
+                self._resolve(transaction_hash, status, receipt)
+
+    def _lookup(self, w3: Web3, hashes: list) -> None:
+        if hashes:
+            batch = RPCBatch(w3)
+            for transaction_hash in hashes:
+                batch.add("eth_getTransactionReceipt", [transaction_hash])
+
+            self._resolve_receipts([call.response.get("result") for call in batch.execute()])
+
+    def _tick(self) -> None:
+        w3 = self.nodes.pick(self.net_name)
+        block = w3.eth.block_number
+
+        with self.lock:
+            new_hashes, self.new_hashes = list(self.new_hashes), set()
+
+        # hashes could be mined before they were given to the watcher
+        self._lookup(w3, new_hashes)
+
+        if self.last_block is not None and block > self.last_block:
+            # receipts of a block which failed are looked up by hash
+            missed  = not self.block_receipts or block - self.last_block > self.MAX_BLOCK_GAP
+            numbers = range(self.last_block + 1, block + 1)
+
+            for index in range(0, 0 if missed else len(numbers), self.BLOCKS_PER_BATCH):
+                if not self.pending:
+                    break
+
+                batch = RPCBatch(w3)
+                for number in numbers[index:index + self.BLOCKS_PER_BATCH]:
+                    batch.add("eth_getBlockReceipts", [hex(number)])
+
+                calls = batch.execute()
+                if any(call.unsupported for call in calls):
+                    self.block_receipts = False
+                    logs.info(f'eth_getBlockReceipts is not supported on {self.net_name}, using receipt lookups')
+
+                for call in calls:
+                    # a node behind the head gives null for a block it does not have yet
+                    if call.error or call.response.get("result") is None:
+                        missed = True
+                    else: self._resolve_receipts(call.response["result"])
+
+                if not self.block_receipts:
+                    break
+
+            if missed:
+                self._lookup(w3, list(self.pending))
+
+        self.last_block = block
+
+        now = time.time()
+        with self.lock:
+            pending = list(self.pending.items())
+
+        for transaction_hash, waiters in pending:
+            if any(deadline <= now for _, deadline in waiters):
+                self._resolve(transaction_hash, TxResult.TIMEOUT, expired=True)
+
+    def _run(self) -> None:
+        while True:
+            with self.lock:
+                if not self.pending:
+                    # blocks mined while nothing is watched are not walked later
+                    self.thread     = None
+                    self.last_block = None
+                    return
+
+            try:
+                self._tick()
+            except Exception as error:
+                logs.error(f'Receipt watcher [net: {self.net_name}]: {error}')
+
+            time.sleep(self.POLL_INTERVAL)
+
+
+class GasFees:
+    def __init__(
+            self, gas_price: int, base_fee: int = None,
+            priority_fee: int = None, block: int = None
+    ) -> None:
+        """
+        ::all values in wei, base_fee is the fee of the next block,
+        EIP-1559 fields are None when the chain has no fee history
+        """
+        self.gas_price    = gas_price
+        self.base_fee     = base_fee
+        self.priority_fee = priority_fee
+        self.block        = block
+        self.updated_at   = time.time()
+
+    @property
+    def max_fee(self) -> int:
+        if self.base_fee is not None:
+            return 2 * self.base_fee + self.priority_fee
+
+    def __repr__(self) -> str:
+        return (
+            f"GasFees(gas_price={Web3.from_wei(self.gas_price, 'gwei')}, "
+            f"max_fee={self.max_fee and Web3.from_wei(self.max_fee, 'gwei')}, "
+            f"priority_fee={self.priority_fee and Web3.from_wei(self.priority_fee, 'gwei')})"
+        )
+
+
+class GasOracle:
+    """
+    One oracle per chain in the process. Fees are refreshed at most once per
+    `interval` (gas price + `eth_feeHistory` in one batch) and shared by all
+    accounts, so any number of waiters for cheap gas costs one poll
+    """
+    INTERVAL            = 3
+    FEE_HISTORY_BLOCKS  = 10
+    PRIORITY_PERCENTILE = 50
+
+    _oracles = {}
+    _lock    = threading.Lock()
+
+    def __init__(self, nodes: "Nodes", net_name: str, interval: float = None) -> None:
+        self.nodes       = nodes
+        self.net_name    = net_name
+        self.interval    = interval if interval else self.INTERVAL
+        self.fees        = None
+        self.fee_history = True
+        self.lock        = threading.Lock()
+
+    @classmethod
+    def get(cls, nodes: "Nodes", net_name: str) -> "GasOracle":
+        key = (net_name, tuple(nodes.nodes_data.get(net_name, [])), nodes.proxies)
+        oracle = cls._oracles.get(key)
+
+        if oracle is None:
+            with cls._lock:
+                oracle = cls._oracles.setdefault(key, cls(nodes, net_name))
+        return oracle
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.fees is not None and time.time() - self.fees.updated_at < self.interval
+
+    def refresh(self) -> GasFees:
+        w3 = self.nodes.pick(self.net_name)
+        if w3 is None:
+            raise Exception(f"Cant find any provider for net name: {self.net_name}")
+
+        with RPCBatch(w3) as batch:
+            gas_price = batch.add("eth_gasPrice", formatter=from_hex)
+            history   = batch.add(
+                "eth_feeHistory",
+                [hex(self.FEE_HISTORY_BLOCKS), "latest", [self.PRIORITY_PERCENTILE]]
+            ) if self.fee_history else None
+
+        if history is not None and history.unsupported:
+            self.fee_history = False
+            logs.info(f'eth_feeHistory is not supported on {self.net_name}, using gas price only')
+
+        # after a transient error the fees are gas price only until the next refresh
+        if self.fee_history and not history.error and history.response.get("result"):
+            result = history.result
+            rewards = sorted(
+                from_hex(reward[0]) for reward in result.get("reward") or [] if reward
+            )
+            priority_fee = max(
+                rewards[len(rewards) // 2] if rewards else 0,
+                Web3.to_wei(MIN_PRIORITY_FEE.get(self.net_name, 0), "gwei")
+            )
+            self.fees = GasFees(
+                gas_price.result, from_hex(result["baseFeePerGas"][-1]),
+                priority_fee, from_hex(result["oldestBlock"]) + len(result["baseFeePerGas"]) - 1
+            )
+        else: self.fees = GasFees(gas_price.result)
+
+        return self.fees
+
+    def current(self) -> GasFees:
+        if not self.is_fresh:
+            with self.lock:
+                # callers which waited for the lock get the fresh fees
+                if not self.is_fresh:
+                    self.refresh()
+        return self.fees
+
+    def wait_below(self, max_gwei: float, logger: "Logger" = None, timing: float = None) -> GasFees:
+        max_gas = Web3.to_wei(max_gwei, 'gwei')
+        fees = self.current()
+
+        if fees.gas_price > max_gas:
+            self._log_waiting(fees, max_gas, logger)
+
+        while fees.gas_price > max_gas:
+            time.sleep(timing if timing else self.interval)
+            fees = self.current()
+        return fees
+
+    async def wait_below_async(self, max_gwei: float, logger: "Logger" = None, timing: float = None) -> GasFees:
+        max_gas = Web3.to_wei(max_gwei, 'gwei')
+        fees = self.fees if self.is_fresh else await asyncio.to_thread(self.current)
+
+        if fees.gas_price > max_gas:
+            self._log_waiting(fees, max_gas, logger)
+
+        while fees.gas_price > max_gas:
+            await asyncio.sleep(timing if timing else self.interval)
+            fees = self.fees if self.is_fresh else await asyncio.to_thread(self.current)
+        return fees
+
+    def _log_waiting(self, fees: GasFees, max_gas: int, logger: "Logger" = None) -> None:
+        h_gas, h_max = Web3.from_wei(fees.gas_price, 'gwei'), Web3.from_wei(max_gas, 'gwei')
+        message = f'Sender net: {self.net_name}. Current gasPrice: {h_gas} | Max gas price: {h_max}. Waiting..'
+
+        if logger:
+            logger.error(message)
+        else: logs.error(message)
+
+
+class SharedHTTPProviderMixin:
+    def __init__(
+            self, endpoint_uri: str, session: requests.Session,
+            request_kwargs: dict = None, health: "EndpointHealth" = None
+    ) -> None:
+        """
+        ::session is shared by every provider with the same (url, proxy),
+        so all accounts reuse the same keep-alive connections
+        ::health latency and error stats of the endpoint, used by RPCRouter
+        """
+        request_kwargs = dict(request_kwargs or {})
+        request_kwargs.setdefault("timeout", 10)
+
+        super().__init__(endpoint_uri, request_kwargs=request_kwargs)
+        self.session           = session
+        self.health            = health
+        self.chain_id_response = None
+
+    def _post(self, payload: bytes) -> bytes:
+        RateLimiter.wait(self.endpoint_uri)
+
+        start = time.time()
+        try:
+            response = self.session.post(
+                self.endpoint_uri, data=payload, **self.get_request_kwargs()
+            )
+            response.raise_for_status()
+        except Exception as error:
+            record_health(self.health, start, False)
+            error.endpoint_uri = self.endpoint_uri
+            raise
+
+        record_health(self.health, start, not is_node_error(response.content))
+        return response.content
+
+    def make_request(self, method: str, params) -> dict:
+        # web3 validation middleware asks chain id before every eth_call and
+        # estimate_gas, the node chain never changes, so it is asked once
+        if method == "eth_chainId" and self.chain_id_response is not None:
+            return dict(self.chain_id_response)
+
+        start = time.perf_counter()
+        try:
+            response = self.decode_rpc_response(
+                self._post(self.encode_rpc_request(method, params))
+            )
+        except Exception:
+            METRICS.record_rpc(self.endpoint_uri, [method], start)
+            raise
+        METRICS.record_rpc(self.endpoint_uri, [method], start, [response])
+        tag_errors([response], self.endpoint_uri)
+
+        if method == "eth_chainId" and "result" in response:
+            self.chain_id_response = response
+        return response
+
+    def make_batch_request(self, calls: list) -> list:
+        """
+        ::calls [(method, params), ...], responses are returned in the same order
+        """
+        methods = [method for method, _ in calls]
+        start   = time.perf_counter()
+        try:
+            responses = decode_batch_response(
+                self._post(encode_batch_request(calls)), len(calls), self.endpoint_uri
+            )
+        except Exception:
+            METRICS.record_rpc(self.endpoint_uri, methods, start)
+            raise
+
+        if responses is None:
+            # node does not support batches, so calls are made one by one
+            responses = [self.make_request(method, params) for method, params in calls]
+        else: METRICS.record_rpc(self.endpoint_uri, methods, start, tag_errors(responses, self.endpoint_uri))
+        return responses
+
+
+class SharedAsyncHTTPProviderMixin:
+    def __init__(
+            self, endpoint_uri: str, request_kwargs: dict = None,
+            health: "EndpointHealth" = None
+    ) -> None:
+        super().__init__(endpoint_uri, request_kwargs=request_kwargs)
+        self.health = health
+
+    async def _post(self, payload: bytes) -> bytes:
+        await RateLimiter.wait_async(self.endpoint_uri)
+
+        start = time.time()
+        try:
+            response = await web3_request().async_make_post_request(
+                self.endpoint_uri, payload, **self.get_request_kwargs()
+            )
+        except Exception as error:
+            record_health(self.health, start, False)
+            error.endpoint_uri = self.endpoint_uri
+            raise
+
+        record_health(self.health, start, not is_node_error(response))
+        return response
+
+    async def make_request(self, method: str, params) -> dict:
+        start = time.perf_counter()
+        try:
+            response = self.decode_rpc_response(
+                await self._post(self.encode_rpc_request(method, params))
+            )
+        except Exception:
+            METRICS.record_rpc(self.endpoint_uri, [method], start)
+            raise
+
+        METRICS.record_rpc(self.endpoint_uri, [method], start, [response])
+        return tag_errors([response], self.endpoint_uri)[0]
+
+    async def make_batch_request(self, calls: list) -> list:
+        methods = [method for method, _ in calls]
+        start   = time.perf_counter()
+        try:
+            responses = decode_batch_response(
+                await self._post(encode_batch_request(calls)), len(calls), self.endpoint_uri
+            )
+        except Exception:
+            METRICS.record_rpc(self.endpoint_uri, methods, start)
+            raise
+
+        if responses is None:
+            responses = [await self.make_request(method, params) for method, params in calls]
+        else: METRICS.record_rpc(self.endpoint_uri, methods, start, tag_errors(responses, self.endpoint_uri))
+        return responses
+
+
+class RoutedHTTPProviderMixin:
+    def __init__(self, router: "RPCRouter", hedge_percentile: float = 0.9) -> None:
+        """
+        Sends every request to the endpoint picked by `router`. Idempotent
+        reads are hedged: when the first node is slower than its latency
+        percentile, the same read goes to a second node and the first answer
+        wins. Writes always go to exactly one node
+        """
+        super().__init__()
+        self.router           = router
+        self.hedge_percentile = hedge_percentile
+
+    def make_request(self, method: str, params) -> dict:
+        primary = self.router.pick()
+        if method not in HEDGED_METHODS or len(self.router.providers) < 2:
+            return primary.provider.make_request(method, params)
+
+        first = hedge_pool().submit(primary.provider.make_request, method, params)
+        try:
+            return first.result(timeout=primary.provider.health.hedge_delay(self.hedge_percentile))
+        except FutureTimeoutError:
+            pass
+
+        secondary = self.router.pick(exclude=primary)
+        futures   = {first, hedge_pool().submit(secondary.provider.make_request, method, params)}
+
+        response, error = None, None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+
+                response = future.result()
+                if not is_node_error(response):
+                    return response
+
+        if response is not None:
+            return response
+        raise error
+
+    def make_batch_request(self, calls: list) -> list:
+        return self.router.pick().provider.make_batch_request(calls)
+
+
+class RoutedAsyncHTTPProviderMixin:
+    def __init__(self, router: "RPCRouter", hedge_percentile: float = 0.9) -> None:
+        super().__init__()
+        self.router           = router
+        self.hedge_percentile = hedge_percentile
+
+    async def make_request(self, method: str, params) -> dict:
+        primary = self.router.pick()
+        if method not in HEDGED_METHODS or len(self.router.providers) < 2:
+            return await primary.provider.make_request(method, params)
+
+        first = asyncio.ensure_future(primary.provider.make_request(method, params))
+        done, _ = await asyncio.wait(
+            {first}, timeout=primary.provider.health.hedge_delay(self.hedge_percentile)
+        )
+        if done:
+            return first.result()
+
+        secondary = self.router.pick(exclude=primary)
+        futures   = {first, asyncio.ensure_future(secondary.provider.make_request(method, params))}
+
+        response, error = None, None
+        try:
+            while futures:
+                done, futures = await asyncio.wait(futures, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        error = future.exception()
+                        continue
+
+                    response = future.result()
+                    if not is_node_error(response):
+                        return response
+        finally:
+            for future in futures:
+                future.cancel()
+
+        if response is not None:
+            return response
+        raise error
+
+    async def make_batch_request(self, calls: list) -> list:
+        return await self.router.pick().provider.make_batch_request(calls)
+
+
+# provider classes extend web3 bases, so they are built from their
+# mixins on the first connection (see provider_class)
+LAZY_PROVIDERS = {
+    "SharedHTTPProvider"      : ("web3.providers.rpc", "HTTPProvider"),
+    "SharedAsyncHTTPProvider" : ("web3.providers.async_rpc", "AsyncHTTPProvider"),
+    "RoutedHTTPProvider"      : ("web3.providers.base", "JSONBaseProvider"),
+    "RoutedAsyncHTTPProvider" : ("web3.providers.async_base", "AsyncJSONBaseProvider")
+}
+PROVIDERS_LOCK = threading.Lock()
+
+def provider_class(name: str) -> type:
+    provider = globals().get(name)
+    if provider is None:
+        with PROVIDERS_LOCK:
+            provider = globals().get(name)
+            if provider is None:
+                module, base = LAZY_PROVIDERS[name]
+                mixin = globals()[name + "Mixin"]
+                provider = type(name, (mixin, getattr(importlib.import_module(module), base)), {
+                    "__module__" : __name__,
+                    "__doc__"    : mixin.__doc__
+                })
+                globals()[name] = provider
+    return provider
+
+def web3_request():
+    return importlib.import_module("web3._utils.request")
+
+def async_eth() -> type:
+    return importlib.import_module("web3.eth").AsyncEth
+
+def __getattr__(name: str):
+    # `Account.SharedHTTPProvider` works before the first connection too
+    if name in LAZY_PROVIDERS:
+        return provider_class(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class RPCError(dict):
+    """
+    `error` of a JSON-RPC response, which remembers the endpoint that sent it.
+    web3 raises ValueError(error), so `retry` finds the endpoint in its args
+    """
+    endpoint_uri = None
+
+
+def tag_errors(responses: list, endpoint_uri: str) -> list:
+    for response in responses:
+        error = response.get("error") if isinstance(response, dict) else None
+        if isinstance(error, dict):
+            response["error"] = RPCError(error)
+            response["error"].endpoint_uri = endpoint_uri
+    return responses
+
+def error_endpoint(error: Exception) -> str:
+    """
+    ::returns url of the node which raised or replied `error`, None if unknown
+    """
+    endpoint = getattr(error, "endpoint_uri", None)
+    if endpoint is None and error.args:
+        endpoint = getattr(error.args[0], "endpoint_uri", None)
+    return endpoint
+
+def is_node_error(response) -> bool:
+    """
+    ::response raw bytes or decoded JSON-RPC response. Only errors of the
+    node itself (rate limits, overload) count, reverts are not node errors
+    """
+    if isinstance(response, (bytes, str)):
+        text = response.decode(errors="ignore") if isinstance(response, bytes) else response
+        if '"error"' not in text:
+            return False
+    elif isinstance(response, dict):
+        if "error" not in response:
+            return False
+        text = str(response["error"])
+    else:
+        return False
+
+    text = text.lower()
+    return any(marker in text for marker in NODE_ERROR_MARKERS)
+
+def record_health(health: "EndpointHealth", start: float, ok: bool) -> None:
+    if health is not None:
+        health.record(time.time() - start, ok)
+
+_hedge_pool = None
+
+def hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    if _hedge_pool is None:
+        _hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+    return _hedge_pool
+
+
+class EndpointHealth:
+    """
+    Latency EWMA, error rate and circuit breaker of one (url, proxy)
+    """
+    ALPHA             = 0.2
+    FAILURES_TO_OPEN  = 5
+    OPEN_TIME         = 15
+    MAX_OPEN_TIME     = 300
+    HEDGE_DELAY       = 1
+    MIN_HEDGE_SAMPLES = 20
+
+    _endpoints = {}
+    _lock      = threading.Lock()
+
+    def __init__(self, url: str) -> None:
+        self.url        = url
+        self.latency    = None
+        self.error_rate = 0.0
+        self.failures   = 0
+        self.opened_at  = None
+        self.open_time  = self.OPEN_TIME
+        self.probing    = False
+        self.latencies  = deque(maxlen=200)
+        self.lock       = threading.Lock()
+
+    @classmethod
+    def get(cls, url: str, proxies: str = None) -> "EndpointHealth":
+        key = (url, proxies)
+        health = cls._endpoints.get(key)
+
+        if health is None:
+            with cls._lock:
+                health = cls._endpoints.setdefault(key, cls(url))
+        return health
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    @property
+    def score(self) -> float:
+        # unknown nodes look fast, so they get traffic and a real latency
+        latency = self.latency if self.latency is not None else 0.05
+        return latency * (1 + 10 * self.error_rate)
+
+    @property
+    def needs_probe(self) -> bool:
+        return (
+            self.is_open and not self.probing
+            and time.time() - self.opened_at >= self.open_time
+        )
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self.lock:
+            if ok:
+                self.latency = latency if self.latency is None else (
+                    self.ALPHA * latency + (1 - self.ALPHA) * self.latency
+                )
+                self.latencies.append(latency)
+                self.error_rate *= 1 - self.ALPHA
+                self.failures    = 0
+            else:
+                self.error_rate = self.ALPHA + (1 - self.ALPHA) * self.error_rate
+                self.failures  += 1
+
+                if self.failures >= self.FAILURES_TO_OPEN and not self.is_open:
+                    self.opened_at = time.time()
+                    logs.error(f'RPC {self.url} is ejected for {self.open_time}s after {self.failures} errors')
+
+    def start_probe(self) -> bool:
+        with self.lock:
+            if not self.needs_probe:
+                return False
+            self.probing = True
+            return True
+
+    def finish_probe(self, latency: float, ok: bool) -> None:
+        with self.lock:
+            self.probing = False
+            if ok:
+                self.opened_at, self.open_time = None, self.OPEN_TIME
+                self.failures, self.error_rate = 0, 0.0
+                self.latency = latency
+                logs.success(f'RPC {self.url} passed probe and is back in rotation')
+            else:
+                self.opened_at = time.time()
+                self.open_time = min(self.open_time * 2, self.MAX_OPEN_TIME)
+
+    def percentile(self, q: float) -> float:
+        latencies = sorted(self.latencies)
+        if latencies:
+            return latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+
+    def hedge_delay(self, q: float) -> float:
+        if len(self.latencies) < self.MIN_HEDGE_SAMPLES:
+            return self.HEDGE_DELAY
+        return self.percentile(q)
+
+
+class RateLimiter:
+    """
+    Requests per second limit of one RPC endpoint, shared by every provider
+    of the url. Callers reserve the next free slot and sleep until it, so
+    waiting is fair and costs no polling
+    """
+    _limiters = {}
+    _lock     = threading.Lock()
+
+    def __init__(self, rate: float, burst: float = None) -> None:
+        self.rate       = rate
+        self.burst      = burst if burst else max(1, rate)
+        self.tokens     = self.burst
+        self.updated_at = time.time()
+        self.lock       = threading.Lock()
+
+    @classmethod
+    def set_limit(cls, url: str, rate: float, burst: float = None) -> "RateLimiter":
+        """
+        ::returns the replaced limiter, None if the url had no limit
+        """
+        with cls._lock:
+            previous = cls._limiters.get(url)
+            cls._limiters[url] = cls(rate, burst)
+        return previous
+
+    @classmethod
+    def restore_limit(cls, url: str, limiter: "RateLimiter") -> None:
+        """
+        ::limiter a limiter returned by set_limit, None removes the limit
+        """
+        with cls._lock:
+            if limiter is None:
+                cls._limiters.pop(url, None)
+            else: cls._limiters[url] = limiter
+
+    @classmethod
+    def remove_limit(cls, url: str) -> None:
+        with cls._lock:
+            cls._limiters.pop(url, None)
+
+    def reserve(self) -> float:
+        """
+        ::returns seconds to wait before the request
+        """
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    @classmethod
+    def wait(cls, url: str) -> None:
+        limiter = cls._limiters.get(url)
+        if limiter is not None:
+            delay = limiter.reserve()
+            if delay:
+                time.sleep(delay)
+
+    @classmethod
+    async def wait_async(cls, url: str) -> None:
+        limiter = cls._limiters.get(url)
+        if limiter is not None:
+            delay = limiter.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+
+class RPCRouter:
+    """
+    Picks an endpoint of one chain by health instead of at random: the
+    better of two random healthy nodes (by latency and error rate) wins,
+    nodes with an open circuit get no traffic until a probe passes
+    """
+    def __init__(self, nodes: "Nodes", net_name: str, providers: list) -> None:
+        self.nodes     = nodes
+        self.net_name  = net_name
+        self.providers = providers
+
+    def pick(self, exclude: Web3 = None) -> Web3:
+        candidates = [w3 for w3 in self.providers if w3 is not exclude] or self.providers
+
+        for w3 in candidates:
+            if w3.provider.health.needs_probe:
+                self.probe(w3.provider.health)
+
+        healthy = [w3 for w3 in candidates if not w3.provider.health.is_open]
+        if not healthy:
+            # every circuit is open, the least bad node is better than nothing
+            return min(candidates, key=lambda w3: w3.provider.health.score)
+
+        if len(healthy) == 1:
+            return healthy[0]
+
+        first, second = sample(healthy, 2)
+        return first if first.provider.health.score <= second.provider.health.score else second
+
+    def probe(self, health: EndpointHealth) -> None:
+        if health.start_probe():
+            threading.Thread(target=self._probe, args=(health,), daemon=True).start()
+
+    def _probe(self, health: EndpointHealth) -> None:
+        start = time.time()
+        try:
+            response = self.nodes.get_session(health.url).post(
+                health.url, timeout=10, proxies=self.nodes.proxy,
+                json={"jsonrpc": "2.0", "method": "eth_blockNumber", "params": [], "id": 0}
+            )
+            response.raise_for_status()
+            ok = "result" in response.json()
+        except Exception:
+            ok = False
+
+        health.finish_probe(time.time() - start, ok)
+
+
+def encode_batch_request(calls: list) -> bytes:
+    return json.dumps([
+        {"jsonrpc": "2.0", "method": method, "params": params, "id": index}
+        for index, (method, params) in enumerate(calls)
+    ]).encode()
+
+def decode_batch_response(raw_response: bytes, size: int, endpoint_uri: str = None) -> list:
+    """
+    ::returns responses in the order of calls, None if the node does not take
+    batches. Any other error of the whole batch (like a rate limit) is raised,
+    so `retry` and failover handle it
+    """
+    responses = json.loads(raw_response)
+    if not isinstance(responses, list):
+        error = responses.get("error") if isinstance(responses, dict) else None
+        if isinstance(error, dict) and error.get("code") in BATCH_UNSUPPORTED_CODES:
+            return None
+        raise ValueError(tag_errors([{"error": error if error else responses}], endpoint_uri)[0]["error"])
+
+    # nodes may answer a batch in any order
+    by_id = {response.get("id"): response for response in responses}
+    return [by_id.get(index, {"error": "no response in batch"}) for index in range(size)]
+
+
+
+
+class BatchCall:
+    def __init__(self, method: str, params: list, formatter=None) -> None:
+        self.method    = method
+        self.params    = params
+        self.formatter = formatter
+        self.response  = None
+
+    @property
+    def error(self):
+        if self.response is not None:
+            return self.response.get("error")
+
+    @property
+    def result(self):
+        if self.response is None:
+            raise Exception(f"Batch with {self.method} was not executed")
+
+        if self.error:
+            raise ValueError(self.error)
+
+        result = self.response.get("result")
+        if self.formatter and result is not None:
+            return self.formatter(result)
+        return result
+
+    @property
+    def unsupported(self) -> bool:
+        """
+        ::returns True if the node does not have the method
+        """
+        error = self.error
+        if not error:
+            return False
+
+        if isinstance(error, dict):
+            if error.get("code") == METHOD_NOT_FOUND_CODE:
+                return True
+            error = error.get("message", "")
+        return any(marker in str(error).lower() for marker in METHOD_NOT_FOUND_MARKERS)
+
+
+class RPCBatch:
+    def __init__(self, w3: Web3) -> None:
+        """
+        ::w3 sync or async Web3 (from Nodes), every call of the batch is
+        sent to its node as one JSON-RPC batch request
+        """
+        self.w3    = w3
+        self.calls = []
+
+    def add(self, method: str, params: list = None, formatter=None) -> BatchCall:
+        call = BatchCall(method, params if params else [], formatter)
+        self.calls.append(call)
+        return call
+
+    def _fill(self, responses: list) -> None:
+        for call, response in zip(self.calls, responses):
+            call.response = response
+
+    def execute(self) -> list:
+        if self.calls:
+            self._fill(self.w3.provider.make_batch_request(
+                [(call.method, call.params) for call in self.calls]
+            ))
+        return self.calls
+
+    async def execute_async(self) -> list:
+        if self.calls:
+            self._fill(await self.w3.provider.make_batch_request(
+                [(call.method, call.params) for call in self.calls]
+            ))
+        return self.calls
+
+    def __enter__(self) -> "RPCBatch":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.execute()
+
+    async def __aenter__(self) -> "RPCBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.execute_async()
+
+
+class Nodes:
+    POOL_SIZE = 64
+
+    # process-wide registry, shared by every Nodes instance
+    _connected_rpcs       = {}
+    _connected_async_rpcs = {}
+    _sessions             = {}
+    _routers              = {}
+    _routed               = {}
+    _lock                 = threading.RLock()
+
+    def __init__(self, nodes_data: dict, proxies: str = None) -> None:
+        """
+        ::nodes_data must be:
+            {
+                "polygon" : ["http://Node1", "http://Node2"....],
+                "bsc"     : ["http://Node1", "http://Node2"....]
+            }
+
+        Nothing is connected here: providers for a chain are created on the
+        first `get` and shared by all accounts with the same (chain, url, proxy)
+        """
+        self.nodes_data    = nodes_data
+        self.proxies       = proxies
+        self._chains       = {}
+        self._async_chains = {}
+
+    @property
+    def proxy(self) -> dict:
+        if self.proxies:
+            return {
+                "http"  : f"http://{self.proxies}",
+                "https" : f"http://{self.proxies}"
+            }
+
+    def get_session(self, url: str) -> requests.Session:
+        key = (url, self.proxies)
+        session = Nodes._sessions.get(key)
+
+        if session is None:
+            with Nodes._lock:
+                session = Nodes._sessions.get(key)
+                if session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_connections=1, pool_maxsize=self.POOL_SIZE
+                    )
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+
+                    Nodes._sessions[key] = session
+        return session
+
+    def connect(self, net_name: str) -> list:
+        urls = self.nodes_data.get(net_name)
+        if not urls:
+            return None
+
+        request_kwargs = {"proxies": self.proxy} if self.proxies else None
+        connected = []
+
+        with Nodes._lock:
+            for url in urls:
+                key = (net_name, url, self.proxies)
+                if key not in Nodes._connected_rpcs:
+                    Nodes._connected_rpcs[key] = Web3(
+                        provider_class("SharedHTTPProvider")(
+                            url, self.get_session(url), request_kwargs=request_kwargs,
+                            health=EndpointHealth.get(url, self.proxies)
+                        )
+                    )
+                connected.append(Nodes._connected_rpcs[key])
+
+        self._chains[net_name] = connected
+        return connected
+
+    def connect_async(self, net_name: str) -> list:
+        urls = self.nodes_data.get(net_name)
+        if not urls:
+            return None
+
+        request_kwargs = {"proxy": f"http://{self.proxies}"} if self.proxies else None
+        connected = []
+
+        with Nodes._lock:
+            for url in urls:
+                key = (net_name, url, self.proxies)
+                if key not in Nodes._connected_async_rpcs:
+                    Nodes._connected_async_rpcs[key] = Web3(
+                        provider_class("SharedAsyncHTTPProvider")(
+                            url, request_kwargs=request_kwargs,
+                            health=EndpointHealth.get(url, self.proxies)
+                        ),
+                        modules={"eth": (async_eth(),)},
+                        middlewares=[]
+                    )
+                connected.append(Nodes._connected_async_rpcs[key])
+
+        self._async_chains[net_name] = connected
+        return connected
+
+    def get(self, net_name: str, default=None) -> list:
+        connected = self._chains.get(net_name)
+        if connected is None:
+            connected = self.connect(net_name)
+
+        return connected if connected else default
+
+    def get_async(self, net_name: str, default=None) -> list:
+        connected = self._async_chains.get(net_name)
+        if connected is None:
+            connected = self.connect_async(net_name)
+
+        return connected if connected else default
+
+    def router(self, net_name: str, is_async: bool = False) -> RPCRouter:
+        providers = self.get_async(net_name) if is_async else self.get(net_name)
+        if not providers:
+            return None
+
+        key = (net_name, tuple(self.nodes_data[net_name]), self.proxies, is_async)
+        router = Nodes._routers.get(key)
+
+        if router is None:
+            with Nodes._lock:
+                router = Nodes._routers.setdefault(
+                    key, RPCRouter(self, net_name, providers)
+                )
+        return router
+
+    def pick(self, net_name: str, is_async: bool = False) -> Web3:
+        router = self.router(net_name, is_async)
+        if router is not None:
+            return router.pick()
+
+    def routed(self, net_name: str, is_async: bool = False) -> Web3:
+        """
+        ::returns Web3 which routes every request by health and hedges reads
+        """
+        router = self.router(net_name, is_async)
+        if router is None:
+            return None
+
+        key = (net_name, tuple(self.nodes_data[net_name]), self.proxies, is_async)
+        if key not in Nodes._routed:
+            with Nodes._lock:
+                if is_async:
+                    w3 = Web3(
+                        provider_class("RoutedAsyncHTTPProvider")(router),
+                        modules={"eth": (async_eth(),)},
+                        middlewares=[]
+                    )
+                else: w3 = Web3(provider_class("RoutedHTTPProvider")(router))
+
+                Nodes._routed.setdefault(key, w3)
+        return Nodes._routed[key]
+
+    def connect_to_all_nodes(self):
+        for net_name in self.nodes_data:
+            self.connect(net_name)
+            self.connect_async(net_name)
+
+        logs.success(f'Connected to all RPCs')
+
+    @property
+    def nodes(self):
+        return {net_name: self.get(net_name) for net_name in self.nodes_data}
+    
+    @property
+    def async_nodes(self):
+        return {net_name: self.get_async(net_name) for net_name in self.nodes_data}
+
+
+class Inch:
+    """
+    1inch api client. Http connections are pooled per (api url, proxy) and
+    shared by every account, quote and spender lookups are cached for a
+    short time and rate-limit headers of the api pause all its clients
+    """
+    QUOTE_TTL      = 10
+    SPENDER_TTL    = 3600
+    # amounts are rounded down to this count of significant digits for the quote cache key
+    AMOUNT_DIGITS  = 3
+    RATE_LIMIT_GAP = 1
+
+    _cache          = {}
+    _blocked_until  = {}
+    # {event loop: {api url: aiohttp session}}
+    _async_sessions = weakref.WeakKeyDictionary()
+    _lock           = threading.Lock()
+
+    def __init__(
+            self, account: Web3Account, 
+            url: str = BASE_INCH_URL,
+            version: int = BASE_INCH_VER
+    ) -> None:
+        self.base_url  = url
+        self.version   = version
+        self.account   = account
+        self._chain_id = None
+
+    @property
+    def chain_id(self) -> int:
+        # resolved on the first swap, so creating an account costs no RPC
+        if self._chain_id is None:
+            self._chain_id = self.account.get_chain_id()
+        return self._chain_id
+
+    async def resolve_chain_id(self) -> int:
+        # AsyncWeb3Account.get_chain_id is a coroutine
+        if self._chain_id is None:
+            self._chain_id = await self.account.get_chain_id()
+        return self._chain_id
+
+    @property
+    def api_url(self) -> str:
+        return f'{self.base_url}/v{self.version}.0/{self.chain_id}'
+
+    @property
+    def url(self) -> str:
+        return f'{self.api_url}/swap'
+
+    @property
+    def session(self) -> requests.Session:
+        return self.account.nodes.get_session(self.base_url)
+
+    def async_session(self):
+        # aiohttp sessions are bound to the event loop they were created in
+        loop = asyncio.get_running_loop()
+        sessions = Inch._async_sessions.get(loop)
+        if sessions is None:
+            # sessions of loops which ended without aclose can't be used or closed any more
+            for closed_loop in [other for other in Inch._async_sessions if other.is_closed()]:
+                Inch._async_sessions.pop(closed_loop, None)
+            sessions = Inch._async_sessions[loop] = {}
+
+        session = sessions.get(self.base_url)
+        if session is None or session.closed:
+            session = sessions[self.base_url] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=Nodes.POOL_SIZE)
+            )
+        return session
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """
+        closes sessions of the running loop, call it before the loop ends
+        """
+        sessions = cls._async_sessions.pop(asyncio.get_running_loop(), {})
+        for session in sessions.values():
+            await session.close()
+
+    @classmethod
+    def cached(cls, key: tuple):
+        value = cls._cache.get(key)
+        if value is not None and value[0] > time.time():
+            return value[1]
+
+    @classmethod
+    def cache(cls, key: tuple, value: object, ttl: float) -> None:
+        with cls._lock:
+            now = time.time()
+            if len(cls._cache) > 10000:
+                cls._cache = {k: v for k, v in cls._cache.items() if v[0] > now}
+            cls._cache[key] = (now + ttl, value)
+
+    @classmethod
+    def amount_bucket(cls, amount: int) -> int:
+        amount = int(amount)
+        digits = len(str(amount)) - cls.AMOUNT_DIGITS
+        if digits <= 0:
+            return amount
+        return amount // 10 ** digits * 10 ** digits
+
+    def pause(self) -> float:
+        return Inch._blocked_until.get(self.base_url, 0) - time.time()
+
+    def check_rate_limit(self, status: int, headers) -> None:
+        """
+        ::raises Exception on 429 and 5xx, so `retry` repeats the request
+        """
+        delay = None
+        if status == 429:
+            delay = float(headers.get("Retry-After", self.RATE_LIMIT_GAP))
+        elif headers.get("X-RateLimit-Remaining") == "0":
+            delay = float(headers.get("X-RateLimit-Reset", self.RATE_LIMIT_GAP))
+
+        if delay is not None:
+            # reset can be an unix timestamp or seconds to wait
+            until = delay if delay > 10 ** 9 else time.time() + delay
+            with Inch._lock:
+                Inch._blocked_until[self.base_url] = max(Inch._blocked_until.get(self.base_url, 0), until)
+
+        if status == 429 or status >= 500:
+            raise Exception(f'1inch api responded with status {status}')
+
+    def record_request(self, endpoint: str, start: float, status: int) -> None:
+        """
+        ::status http status, None if the request failed
+        """
+        METRICS.inc("inch_requests_total", endpoint=endpoint, status=status if status else "failed")
+        if status is None or status >= 400:
+            METRICS.inc("inch_errors_total", endpoint=endpoint)
+        METRICS.observe("inch_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+    def request_kwargs(self, params: dict) -> dict:
+        return {"params": {k: str(v) for k, v in params.items()}, "timeout": 10}
+
+    @retry(max_retries=5, timing=1, handle_error=True, custom_message="1inch handler")
+    def make_request(self, url: str, method: str = "get", **kwargs):
+        pause = self.pause()
+        if pause > 0:
+            time.sleep(pause)
+
+        endpoint = url.rsplit("/", 1)[-1]
+        start    = time.perf_counter()
+        try:
+            response = self.session.request(
+                method=method,
+                url=url,
+                proxies=self.account.nodes.proxy,
+                **kwargs
+            )
+        except Exception:
+            self.record_request(endpoint, start, None)
+            raise
+
+        self.record_request(endpoint, start, response.status_code)
+        self.check_rate_limit(response.status_code, response.headers)
+
+        return response.json()
+
+    @retry(max_retries=5, timing=1, handle_error=True, custom_message="1inch handler")
+    async def make_request_async(self, url: str, method: str = "get", **kwargs):
+        pause = self.pause()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+        proxy    = self.account.nodes.proxy
+        endpoint = url.rsplit("/", 1)[-1]
+        start    = time.perf_counter()
+        try:
+            response = await self.async_session().request(
+                method=method,
+                url=url,
+                proxy=proxy["http"] if proxy else None,
+                params=kwargs.get("params"),
+                timeout=aiohttp.ClientTimeout(total=kwargs.get("timeout", 10))
+            )
+        except Exception:
+            self.record_request(endpoint, start, None)
+            raise
+
+        self.record_request(endpoint, start, response.status)
+        async with response:
+            self.check_rate_limit(response.status, response.headers)
+            return await response.json(content_type=None)
+
+    @staticmethod
+    def token_address(token: str) -> str:
+        if token.upper() == "ETH":
+            return "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
+        return token
+
+    def swap_params(self, token_in: str, token_out: str, amount: int) -> dict:
+        return self.request_kwargs({
+            "fromTokenAddress" : self.token_address(token_in),
+            "toTokenAddress"   : self.token_address(token_out),
+            "fromAddress"      : self.account.address,
+            "slippage"         : 1,
+            "amount"           : amount
+        })
+
+    def quote_params(self, token_in: str, token_out: str, amount: int) -> tuple:
+        token_in, token_out = self.token_address(token_in), self.token_address(token_out)
+        bucket = self.amount_bucket(amount)
+
+        key = ("quote", self.base_url, self.chain_id, token_in.lower(), token_out.lower(), bucket)
+        kwargs = self.request_kwargs({
+            "fromTokenAddress" : token_in,
+            "toTokenAddress"   : token_out,
+            "amount"           : bucket
+        })
+        return key, kwargs
+
+    def get_data(self, token_in: str, token_out: str, amount: int) -> dict:
+        return self.make_request(self.url, **self.swap_params(token_in, token_out, amount))
+
+    async def get_data_async(self, token_in: str, token_out: str, amount: int) -> dict:
+        await self.resolve_chain_id()
+        return await self.make_request_async(self.url, **self.swap_params(token_in, token_out, amount))
+
+    def get_quote(self, token_in: str, token_out: str, amount: int) -> dict:
+        """
+        ::returns 1inch quote, amounts close to each other share one cached quote
+        """
+        key, kwargs = self.quote_params(token_in, token_out, amount)
+        quote = self.cached(key)
+        if quote is None:
+            quote = self.make_request(f'{self.api_url}/quote', **kwargs)
+            if quote and "toTokenAmount" in quote:
+                self.cache(key, quote, self.QUOTE_TTL)
+        return quote
+
+    async def get_quote_async(self, token_in: str, token_out: str, amount: int) -> dict:
+        await self.resolve_chain_id()
+        key, kwargs = self.quote_params(token_in, token_out, amount)
+        quote = self.cached(key)
+        if quote is None:
+            quote = await self.make_request_async(f'{self.api_url}/quote', **kwargs)
+            if quote and "toTokenAmount" in quote:
+                self.cache(key, quote, self.QUOTE_TTL)
+        return quote
+
+    async def get_quotes_async(self, requests_data: list) -> list:
+        """
+        ::requests_data list of (token_in, token_out, amount), all quotes are fetched at once
+        """
+        return await asyncio.gather(*[
+            self.get_quote_async(*request_data) for request_data in requests_data
+        ])
+
+    def get_spender(self) -> str:
+        key = ("spender", self.base_url, self.chain_id)
+        spender = self.cached(key)
+        if spender is None:
+            spender = Web3.to_checksum_address(
+                self.make_request(f'{self.api_url}/approve/spender')["address"]
+            )
+            self.cache(key, spender, self.SPENDER_TTL)
+        return spender
+
+    async def get_spender_async(self) -> str:
+        await self.resolve_chain_id()
+        key = ("spender", self.base_url, self.chain_id)
+        spender = self.cached(key)
+        if spender is None:
+            response = await self.make_request_async(f'{self.api_url}/approve/spender')
+            spender = Web3.to_checksum_address(response["address"])
+            self.cache(key, spender, self.SPENDER_TTL)
+        return spender
+
+
+SIGNING_ACCOUNTS = {}
+
+def sign_transaction_chunk(items: list) -> list:
+    """
+    runs in sign_transactions worker processes
+    ::items [(secret key, tx), ...]
+    """
+    raw_txs = []
+    for secret_key, tx in items:
+        # key derivation is cached per worker, fleets repeat the same keys
+        account = SIGNING_ACCOUNTS.get(secret_key)
+        if account is None:
+            account = SIGNING_ACCOUNTS[secret_key] = acc.from_key(secret_key)
+        raw_txs.append(bytes(account.sign_transaction(tx).rawTransaction))
+    return raw_txs
+
+
+def sign_transactions(
+        items: list, workers: int = None,
+        chunk_size: int = 256, executor: ProcessPoolExecutor = None
+) -> list:
+    """
+    ::items [(Web3Account or secret key, built tx), ...], txs must be complete:
+    nonce, gas, fees and chainId are not filled here
+    ::workers processes, cpu count by default. Small jobs are signed in this process
+    ::executor reuse a pool between calls
+    ::returns raw txs (bytes) in the order of items
+    """
+    items = [
+        (owner.eth_account.key.hex() if isinstance(owner, Web3Account) else owner, tx)
+        for owner, tx in items
+    ]
+    chunks = [items[index:index + chunk_size] for index in range(0, len(items), chunk_size)]
+    workers = workers if workers else cpu_count() or 1
+
+    if executor is None and (workers == 1 or len(chunks) <= 1):
+        return sign_transaction_chunk(items)
+
+    if executor is not None:
+        return [raw_tx for chunk in executor.map(sign_transaction_chunk, chunks) for raw_tx in chunk]
+
+    with ProcessPoolExecutor(workers) as executor:
+        return [raw_tx for chunk in executor.map(sign_transaction_chunk, chunks) for raw_tx in chunk]
+
+
+class PortfolioScanner:
+    """
+    Native and ERC-20 balances of a stream of addresses on many chains.
+
+    Addresses are read page by page, so memory depends on `page_size` and
+    not on the input. Every page is split into Multicall3 chunks which are
+    sent to all chains at once from a thread pool, each chunk to the node
+    picked by the chain router. With `checkpoint` the count of finished
+    addresses is saved after every page and a new scan skips them.
+
+    Chains of a chunk which failed as a whole are not yielded with the
+    page, balances of the other chains are. The failed (address, chain)
+    pairs are appended to `<checkpoint>.failed` (a temp file without
+    checkpoint) and only their chains are scanned again after the input.
+    Pairs failing again stay in the file for the next scan, without
+    checkpoint they are yielded with None balances
+    """
+    CSV_COLUMNS = ["address", "chain", "token", "balance"]
+
+    def __init__(
+            self, tokens: dict = None, nodes: dict = DEFAULT_NODES,
+            proxies: str = None, page_size: int = 1000,
+            workers: int = 32, checkpoint: str = None
+    ) -> None:
+        """
+        ::tokens {net_name: [token addresses]}, "eth" is the native coin,
+        native coins of all `nodes` chains by default
+        ::workers multicall chunks in flight across all chains
+        ::checkpoint json file with the progress of the scan
+        """
+        self.tokens     = tokens if tokens else {net_name: ["eth"] for net_name in nodes}
+        self.nodes      = Nodes(nodes, proxies=proxies)
+        self.page_size  = page_size
+        self.workers    = workers
+        self.checkpoint = checkpoint
+        self.multicalls = {}
+
+    def load_checkpoint(self) -> dict:
+        checkpoint = {"done": 0, "failed": 0, "retried": 0}
+        if self.checkpoint and path.exists(self.checkpoint):
+            with open(self.checkpoint, encoding="utf-8") as file:
+                checkpoint.update(json.load(file))
+        return checkpoint
+
+    @property
+    def failed_path(self) -> str:
+        return self.checkpoint + ".failed"
+
+    @property
+    def done(self) -> int:
+        """
+        ::returns count of addresses read by previous scans
+        """
+        return self.load_checkpoint()["done"]
+
+    @property
+    def failed(self) -> list:
+        """
+        ::returns (address, net_name) pairs whose multicall failed in previous
+        scans, the next scan retries them
+        """
+        checkpoint = self.load_checkpoint()
+        if not self.checkpoint or not path.exists(self.failed_path):
+            return []
+
+        with open(self.failed_path, "rb") as file:
+            return self.read_failed(file, checkpoint["retried"], checkpoint["failed"], None)[0]
+
+    def save_checkpoint(self, progress: dict) -> None:
+        """
+        ::progress {"done": count of read addresses, "failed": size of the failed
+        pairs file, "retried": its bytes which are scanned again}
+        """
+        if not self.checkpoint:
+            return
+
+        temp_path = self.checkpoint + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(dict(progress, time=time.time()), file)
+        replace(temp_path, self.checkpoint)
+
+    def multicall(self, net_name: str) -> Multicall:
+        w3 = self.nodes.pick(net_name)
+        multicall = self.multicalls.get(id(w3))
+        if multicall is None:
+            multicall = self.multicalls[id(w3)] = Multicall(w3, net_name)
+        return multicall
+
+    def scan_chunk(self, net_name: str, chunk: list) -> list:
+        """
+        ::returns aggregate3 results of one chunk, None if it failed as a whole
+        """
+        return self.multicall(net_name)._aggregate(chunk)
+
+    def read_page(self, addresses) -> list:
+        page = []
+        for address in islice(addresses, self.page_size):
+            address = address.strip()
+            if not address:
+                continue
+
+            try:
+                page.append(Web3.to_checksum_address(address))
+            except ValueError:
+                logs.error(f'Skipping invalid address: {address}')
+        return page
+
+    def scan_page(self, executor: ThreadPoolExecutor, targets: dict) -> tuple:
+        """
+        ::targets {net_name: addresses}
+        ::returns ({address: {net_name: {token: balance}}}, failed (address, net_name) pairs),
+        balance is None if its call failed
+        """
+        futures = []
+        for net_name, addresses in targets.items():
+            multicall = self.multicall(net_name)
+            for chunk in Multicall.chunks(multicall.balance_calls(self.tokens[net_name], addresses)):
+                futures.append((net_name, chunk, executor.submit(self.scan_chunk, net_name, chunk)))
+
+        balances, failed = {}, {}
+        for net_name, chunk, future in futures:
+            results = future.result()
+            if results is None:
+                failed.update(((address, net_name), None) for address, _, _ in chunk)
+                results = [(False, b"")] * len(chunk)
+
+            collected = self.multicall(net_name).collect(chunk, results)
+            for address, values in collected.items():
+                balances.setdefault(address, {})[net_name] = values
+        return balances, list(failed)
+
+    @staticmethod
+    def without(balances: dict, failed: list) -> dict:
+        """
+        ::returns balances without failed (address, net_name) pairs, an address
+        without any chain left is dropped
+        """
+        failed, result = set(failed), {}
+        for address, chains in balances.items():
+            chains = {net_name: values for net_name, values in chains.items() if (address, net_name) not in failed}
+            if chains:
+                result[address] = chains
+        return result
+
+    def open_failed(self, checkpoint: dict):
+        """
+        ::returns the failed pairs file, only its pairs not retried yet are kept
+        and the checkpoint offsets are moved to them
+        """
+        if not self.checkpoint:
+            return tempfile.TemporaryFile()
+
+        start, end = checkpoint["retried"], checkpoint["failed"]
+        if start and path.exists(self.failed_path):
+            temp_path = self.failed_path + ".tmp"
+            with open(self.failed_path, "rb") as source, open(temp_path, "wb") as target:
+                source.seek(start)
+                left = end - start
+                while left > 0:
+                    block = source.read(min(left, 1 << 20))
+                    if not block:
+                        break
+                    target.write(block)
+                    left -= len(block)
+            replace(temp_path, self.failed_path)
+
+            checkpoint.update(failed=end - start, retried=0)
+            self.save_checkpoint(checkpoint)
+
+        file = open(self.failed_path, "a+b")
+        # pairs of a page which was yielded but not saved are appended again
+        file.truncate(min(checkpoint["failed"], file.seek(0, 2)))
+        file.seek(0, 2)
+        return file
+
+    def read_failed(self, file, start: int, end: int, count: int = None) -> tuple:
+        """
+        ::returns (up to `count` failed pairs from `start` byte, byte after them)
+        """
+        file.seek(start)
+        pairs = []
+        while file.tell() < end and (count is None or len(pairs) < count):
+            pairs.append(tuple(json.loads(file.readline())))
+        return pairs, file.tell()
+
+    @staticmethod
+    def add_failed(file, pairs: list) -> int:
+        """
+        ::returns size of the file after the pairs are appended
+        """
+        file.seek(0, 2)
+        file.write("".join(json.dumps(pair) + "\n" for pair in pairs).encode())
+        file.flush()
+        return file.tell()
+
+    def pages(self, addresses):
+        """
+        yields (balances of a page, checkpoint progress after it),
+        the caller saves the checkpoint when the page is consumed
+        """
+        addresses = iter(addresses)
+        checkpoint = self.load_checkpoint()
+        done = checkpoint["done"]
+        if done:
+            logs.info(f'Resuming scan after {done} addresses')
+            # skipped lines are read, not scanned
+            for _ in islice(addresses, done):
+                pass
+
+        failed_again = 0
+        with self.open_failed(checkpoint) as failed_file, \
+                ThreadPoolExecutor(self.workers, thread_name_prefix="scanner") as executor:
+            while True:
+                raw_page = list(islice(addresses, self.page_size))
+                if not raw_page:
+                    break
+
+                done += len(raw_page)
+                page = self.read_page(raw_page)
+                balances, page_failed = self.scan_page(executor, {net_name: page for net_name in self.tokens})
+                failed_size = self.add_failed(failed_file, page_failed)
+                yield self.without(balances, page_failed), {"done": done, "failed": failed_size, "retried": 0}
+
+            # failed chains of this and previous scans get one more try,
+            # the ones failing again are appended after `end`
+            retried, end = 0, failed_file.seek(0, 2)
+            while retried < end:
+                pairs, retried = self.read_failed(failed_file, retried, end, self.page_size)
+
+                targets = {}
+                for address, net_name in pairs:
+                    targets.setdefault(net_name, []).append(address)
+
+                balances, page_failed = self.scan_page(executor, targets)
+                failed_size = self.add_failed(failed_file, page_failed)
+                failed_again += len(page_failed)
+
+                if self.checkpoint:
+                    balances = self.without(balances, page_failed)
+                yield balances, {"done": done, "failed": failed_size, "retried": retried}
+
+        if failed_again:
+            logs.error(
+                f'Multicall of {failed_again} addresses and chains failed, ' +
+                ("a new scan with the same checkpoint retries them" if self.checkpoint else "their balances are None")
+            )
+
+    def scan(self, addresses):
+        """
+        ::addresses any iterable of addresses, like an opened file with one address per line
+        yields (address, {net_name: {token: balance}}) in the input order, addresses
+        of failed chunks at the end
+        """
+        for balances, progress in self.pages(addresses):
+            yield from balances.items()
+            self.save_checkpoint(progress)
+
+    @staticmethod
+    def rows(balances: dict):
+        for address, chains in balances.items():
+            for net_name, tokens in chains.items():
+                for token, balance in tokens.items():
+                    yield [address, net_name, token, "" if balance is None else str(balance)]
+
+    def write_csv(self, addresses, file_path: str) -> str:
+        """
+        appends rows `address,chain,token,balance` page by page, a resumed
+        scan continues the same file
+        """
+        resume = self.done > 0 and path.exists(file_path)
+        with open(file_path, "a" if resume else "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            if not resume:
+                writer.writerow(self.CSV_COLUMNS)
+
+            for balances, progress in self.pages(addresses):
+                writer.writerows(self.rows(balances))
+                # rows are on disk before the checkpoint counts them
+                file.flush()
+                self.save_checkpoint(progress)
+        return file_path
+
+    def write_parquet(self, addresses, file_path: str) -> str:
+        """
+        needs `pyarrow`, one row group per page. Balances are strings, uint256 does not fit int64.
+        Parquet can't be appended, so a resumed scan writes
+        `<name>.from-<done>.parquet` next to the first file
+        ::returns path of the written file
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise Exception("write_parquet needs pyarrow: pip install pyarrow")
+
+        done = self.done
+        if done:
+            file_path = f'{path.splitext(file_path)[0]}.from-{done}.parquet'
+
+        schema = pyarrow.schema([(column, pyarrow.string()) for column in self.CSV_COLUMNS])
+        with pyarrow.parquet.ParquetWriter(file_path, schema) as writer:
+            for balances, progress in self.pages(addresses):
+                columns = list(zip(*self.rows(balances))) or [[] for _ in self.CSV_COLUMNS]
+                writer.write_table(pyarrow.Table.from_arrays(
+                    [pyarrow.array(column, pyarrow.string()) for column in columns], schema=schema
+                ))
+                self.save_checkpoint(progress)
+        return file_path
+
+
+class TransferStore:
+    """
+    SQLite file of ERC-20 transfers found by TransferIndexer and of its
+    cursors: the last indexed block of every (chain, tracked address)
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.db   = sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS transfers ("
+            "net_name TEXT, block INTEGER, timestamp INTEGER, tx_hash TEXT, log_index INTEGER, "
+            "token TEXT, sender TEXT, receiver TEXT, value TEXT, "
+            "PRIMARY KEY (net_name, tx_hash, log_index))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS transfers_sender ON transfers (sender, timestamp)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS transfers_receiver ON transfers (receiver, timestamp)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS transfers_token ON transfers (token, timestamp)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS cursors "
+            "(net_name TEXT, address TEXT, tokens TEXT, block INTEGER, PRIMARY KEY (net_name, address, tokens))"
+        )
+        self.db.commit()
+
+    def cursors(self, net_name: str, addresses: list, tokens: str) -> dict:
+        """
+        ::returns {address: the last indexed block, None for a new address}
+        """
+        with self.lock:
+            rows = dict(self.db.execute(
+                "SELECT address, block FROM cursors WHERE net_name = ? AND tokens = ?",
+                (net_name, tokens)
+            ).fetchall())
+
+        return {address: rows.get(address) for address in addresses}
+
+    def cursor(self, net_name: str, addresses: list, tokens: str) -> int:
+        """
+        ::returns the last block indexed for all `addresses`, None if one of them is new
+        """
+        blocks = list(self.cursors(net_name, addresses, tokens).values())
+        return None if None in blocks else min(blocks)
+
+    def add(self, net_name: str, rows: list, addresses: list, tokens: str, block: int) -> int:
+        """
+        saves transfers and moves the cursor to `block` in one transaction
+        ::returns count of new rows, known transfers are skipped
+        """
+        with self.lock, self.db:
+            changes = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO transfers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = self.db.total_changes - changes
+
+            self.db.executemany(
+                "INSERT OR REPLACE INTO cursors VALUES (?, ?, ?, ?)",
+                [(net_name, address, tokens, block) for address in addresses]
+            )
+        return added
+
+    def transfers(
+            self, address: str = None, token: str = None, net_name: str = None,
+            start: int = None, end: int = None, direction: str = None, limit: int = None
+    ) -> list:
+        """
+        ::start, end unix time range, `end` is not included
+        ::direction "in" or "out" of `address`, both by default
+        ::returns transfer dicts, oldest first
+        """
+        where, params = [], []
+        if address:
+            address = address.lower()
+            if direction == "in":
+                where.append("receiver = ?")
+            elif direction == "out":
+                where.append("sender = ?")
+            else: where.append("(sender = ? OR receiver = ?)")
+            params += [address] * (1 if direction in ("in", "out") else 2)
+
+        for column, operator, value in (
+                ("token", "=", token.lower() if token else None),
+                ("net_name", "=", net_name),
+                ("timestamp", ">=", start),
+                ("timestamp", "<", end)
+        ):
+            if value is not None:
+                where.append(f"{column} {operator} ?")
+                params.append(value)
+
+        query = "SELECT * FROM transfers"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY timestamp, block, log_index"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+
+        with self.lock:
+            cursor = self.db.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+
+        transfers = []
+        for row in rows:
+            transfer = dict(zip(columns, row))
+            transfer["value"] = int(transfer["value"])
+            transfers.append(transfer)
+        return transfers
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+
+class TransferIndexer:
+    """
+    Incoming and outgoing ERC-20 transfers of tracked addresses, pulled
+    from `eth_getLogs` of the chain nodes into a TransferStore.
+
+    Every run starts from the stored cursors of the chain, so only new blocks
+    are fetched. A new address is backfilled alone from its start block to
+    the cursor of the others and then indexed together with them. The block
+    range is cut into chunks which are fetched from a thread pool; a chunk
+    which hits a node result or range limit is split in halves and next
+    chunks of the chain get the smaller size
+    """
+    def __init__(
+            self, addresses: list, path: str = "transfers.db",
+            tokens: dict = None, nodes: dict = DEFAULT_NODES,
+            proxies: str = None, start_blocks: dict = None,
+            chunk_size: int = 5000, workers: int = 8,
+            confirmations: int = 5, max_retries: int = 3
+    ) -> None:
+        """
+        ::tokens {net_name: [token addresses]}, transfers of any token by default
+        ::start_blocks {net_name: first block} of addresses without a cursor, 0 by default
+        ::chunk_size blocks in one eth_getLogs request before splits
+        ::confirmations newest blocks which are not indexed yet, they can be reorged
+        """
+        self.addresses     = sorted({address.lower() for address in addresses})
+        self.store         = TransferStore(path)
+        self.tokens        = tokens if tokens else {}
+        self.nodes         = Nodes(nodes, proxies=proxies)
+        self.start_blocks  = start_blocks if start_blocks else {}
+        self.chunk_size    = chunk_size
+        self.workers       = workers
+        self.confirmations = confirmations
+        self.max_retries   = max_retries
+        self.spans         = {}
+
+    def tokens_key(self, net_name: str) -> str:
+        # cursors of a token list are not valid for another one
+        tokens = self.tokens.get(net_name)
+        return ",".join(sorted(token.lower() for token in tokens)) if tokens else "*"
+
+    def topic_filters(self, addresses: list) -> list:
+        """
+        ::returns topics of `from` and `to` filters of every address group
+        """
+        filters = []
+        for index in range(0, len(addresses), LOG_FILTER_ADDRESSES):
+            words = ["0x" + ERC20.address_word(address) for address in addresses[index:index + LOG_FILTER_ADDRESSES]]
+            filters.append([ERC20.TRANSFER, words])
+            filters.append([ERC20.TRANSFER, None, words])
+        return filters
+
+    @staticmethod
+    def is_range_error(error) -> bool:
+        text = str(error).lower()
+        return any(marker in text for marker in LOG_RANGE_ERROR_MARKERS)
+
+    def get_logs(self, net_name: str, from_block: int, to_block: int, topics: list) -> list:
+        log_filter = {"fromBlock": hex(from_block), "toBlock": hex(to_block), "topics": topics}
+        if self.tokens.get(net_name):
+            log_filter["address"] = [Web3.to_checksum_address(token) for token in self.tokens[net_name]]
+
+        error = None
+        for _ in range(self.max_retries):
+            try:
+                # raw logs, web3 formatting of thousands of logs costs more than the request
+                response = self.nodes.pick(net_name).provider.make_request("eth_getLogs", [log_filter])
+            except node_exceptions() as node_error:
+                error = node_error
+                continue
+
+            if "error" not in response:
+                return response["result"]
+
+            error = response["error"]
+            if self.is_range_error(error) and to_block > from_block:
+                middle = (from_block + to_block) // 2
+                self.spans[net_name] = min(self.spans.get(net_name, self.chunk_size), middle - from_block + 1)
+                return (
+                    self.get_logs(net_name, from_block, middle, topics) +
+                    self.get_logs(net_name, middle + 1, to_block, topics)
+                )
+
+        raise Exception(f"eth_getLogs of blocks {from_block}-{to_block} failed [net: {net_name}]: {error}")
+
+    @retry(max_retries=3, timing=1, handle_error=True, custom_message="Transfer indexer")
+    def block_timestamps(self, net_name: str, blocks: list) -> dict:
+        w3 = self.nodes.pick(net_name)
+        timestamps = {}
+        for index in range(0, len(blocks), SEND_BATCH_SIZE):
+            with RPCBatch(w3) as batch:
+                calls = [
+                    (block, batch.add("eth_getBlockByNumber", [hex(block), False]))
+                    for block in blocks[index:index + SEND_BATCH_SIZE]
+                ]
+
+            for block, call in calls:
+                timestamps[block] = from_hex(call.result["timestamp"])
+        return timestamps
+
+    def fetch_range(self, net_name: str, from_block: int, to_block: int, addresses: list) -> list:
+        """
+        ::returns transfer rows of the store
+        """
+        found = {}
+        for topics in self.topic_filters(addresses):
+            for log in self.get_logs(net_name, from_block, to_block, topics):
+                # ERC-721 Transfer has the same topic with an indexed token id
+                if len(log["topics"]) == 3 and not log.get("removed"):
+                    found[(log["transactionHash"], from_hex(log["logIndex"]))] = log
+
+        # some nodes put the block time into logs
+        timestamps = {
+            from_hex(log["blockNumber"]): from_hex(log["blockTimestamp"])
+            for log in found.values() if log.get("blockTimestamp")
+        }
+        missing = sorted({from_hex(log["blockNumber"]) for log in found.values()} - set(timestamps))
+        if missing:
+            timestamps.update(self.block_timestamps(net_name, missing))
+
+        rows = []
+        for (tx_hash, log_index), log in found.items():
+            block = from_hex(log["blockNumber"])
+            rows.append((
+                net_name, block, timestamps[block], tx_hash, log_index, log["address"].lower(),
+                "0x" + log["topics"][1][-40:], "0x" + log["topics"][2][-40:],
+                str(from_hex(log["data"]) if log["data"] not in ("0x", "") else 0)
+            ))
+        return rows
+
+    def index_range(
+            self, executor: ThreadPoolExecutor, net_name: str,
+            addresses: list, tokens: str, next_block: int, last_block: int
+    ) -> int:
+        found, pending = 0, deque()
+        while pending or next_block <= last_block:
+            while next_block <= last_block and len(pending) < self.workers:
+                to_block = min(last_block, next_block + self.spans.get(net_name, self.chunk_size) - 1)
+                pending.append((to_block, executor.submit(self.fetch_range, net_name, next_block, to_block, addresses)))
+                next_block = to_block + 1
+
+            # chunks are saved in block order, so the cursor never skips a chunk
+            to_block, future = pending.popleft()
+            found += self.store.add(net_name, future.result(), addresses, tokens, to_block)
+        return found
+
+    def update_chain(self, executor: ThreadPoolExecutor, net_name: str) -> int:
+        tokens = self.tokens_key(net_name)
+        head = self.nodes.pick(net_name).eth.block_number - self.confirmations
+
+        # addresses by their last indexed block, new ones are just before the start block
+        groups = {}
+        for address, block in self.store.cursors(net_name, self.addresses, tokens).items():
+            groups.setdefault(block if block is not None else self.start_blocks.get(net_name, 0) - 1, []).append(address)
+
+        found, addresses, blocks = 0, [], sorted(groups)
+        for index, block in enumerate(blocks):
+            # lagging addresses catch up with the next cursor and go on together with its addresses
+            addresses = sorted(addresses + groups[block])
+            last_block = min(head, blocks[index + 1]) if index + 1 < len(blocks) else head
+            found += self.index_range(executor, net_name, addresses, tokens, block + 1, last_block)
+        return found
+
+    def update(self, net_names: list = None) -> dict:
+        """
+        ::net_names chains to index, all chains of `nodes` by default
+        ::returns {net_name: count of new transfer rows}
+        """
+        self.spans = {}
+        found = {}
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="indexer") as executor:
+            for net_name in net_names if net_names else list(self.nodes.nodes_data):
+                found[net_name] = self.update_chain(executor, net_name)
+                logs.info(f'Transfer indexer [net: {net_name}]: {found[net_name]} new transfers')
+        return found
+
+    def transfers(self, *args, **kwargs) -> list:
+        """
+        local query, see TransferStore.transfers
+        """
+        return self.store.transfers(*args, **kwargs)
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def decrypt_keystore(keystore: dict, password: str) -> str:
+    """
+    runs in KeyLoader worker processes, scrypt makes it slow on purpose
+    """
+    return Web3.to_hex(acc.decrypt(keystore, password))
+
+
+class KeyLoader:
+    """
+    Loads secret keys from a directory of V3 keystore files (*.json), a
+    csv file or a text file with one key per line.
+
+    Keystores are decrypted in a process pool and keys are yielded as soon
+    as they are ready. Addresses can be read without any decryption: from
+    the keystore itself or from the address cache of previous runs
+    """
+    def __init__(
+            self, source: str, password: str = None,
+            workers: int = None, address_cache: str = None
+    ) -> None:
+        """
+        ::source directory, .csv file with `key` or `keystore` (path) column
+        and optional `password` and `proxy` columns, or a text file of keys
+        ::password password of every keystore without its own one
+        ::workers processes decrypting keystores, cpu count by default
+        ::address_cache json file {source: address}, addresses of raw keys
+        and of keystores without `address` are saved there
+        """
+        self.source        = source
+        self.password      = password
+        self.workers       = workers
+        self.address_cache = address_cache
+        self.cache         = self.load_cache()
+        self.errors        = []
+
+    def load_cache(self) -> dict:
+        if self.address_cache and path.exists(self.address_cache):
+            with open(self.address_cache, encoding="utf-8") as file:
+                return json.load(file)
+        return {}
+
+    def save_cache(self) -> None:
+        if not self.address_cache:
+            return
+
+        temp_path = self.address_cache + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.cache, file, indent=2)
+        replace(temp_path, self.address_cache)
+
+    @staticmethod
+    def key_id(secret_key: str) -> str:
+        # keys are never written to the cache, only their hashes
+        secret_key = secret_key.lower()
+        if secret_key.startswith("0x"):
+            secret_key = secret_key[2:]
+        return hashlib.sha256(secret_key.encode()).hexdigest()
+
+    def read_keystore(self, file_path: str, password: str = None, proxy: str = None) -> dict:
+        with open(file_path, encoding="utf-8") as file:
+            keystore = json.load(file)
+
+        address = keystore.get("address")
+        return {
+            "id"       : path.abspath(file_path),
+            "keystore" : keystore,
+            "password" : password if password is not None else self.password,
+            "proxy"    : proxy,
+            "address"  : Web3.to_checksum_address(address) if address else None
+        }
+
+    def read_key(self, secret_key: str, proxy: str = None) -> dict:
+        return {"id": self.key_id(secret_key), "key": secret_key, "proxy": proxy}
+
+    def entries(self):
+        """
+        yields one dict per key: {id, key or keystore, password, proxy, address}
+        """
+        if path.isdir(self.source):
+            for name in sorted(listdir(self.source)):
+                if name.endswith(".json"):
+                    yield self.read_keystore(path.join(self.source, name))
+
+        elif self.source.endswith(".csv"):
+            directory = path.dirname(path.abspath(self.source))
+            with open(self.source, encoding="utf-8", newline="") as file:
+                for row in csv.DictReader(file):
+                    proxy = row.get("proxy") or None
+                    if row.get("keystore"):
+                        yield self.read_keystore(
+                            path.join(directory, row["keystore"]), row.get("password") or None, proxy
+                        )
+                    elif row.get("key"):
+                        yield self.read_key(row["key"].strip(), proxy)
+
+        else:
+            with open(self.source, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        yield self.read_key(line.strip())
+
+    def remember(self, entry: dict, secret_key: str) -> None:
+        entry["key"] = secret_key
+        if entry.get("address") is None:
+            entry["address"] = acc.from_key(secret_key).address
+        self.cache[entry["id"]] = entry["address"]
+
+    def keys(self, entries=None):
+        """
+        ::entries entries to decrypt, all entries of the source by default
+        yields entries with decrypted `key` in order of readiness, keystores
+        which can't be decrypted are logged and saved to `errors`
+        """
+        window = (self.workers if self.workers else cpu_count() or 1) * 4
+        entries = entries if entries is not None else self.entries()
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            pending = {}
+            for entry in entries:
+                if "keystore" not in entry:
+                    self.remember(entry, entry["key"])
+                    yield entry
+                    continue
+
+                pending[executor.submit(decrypt_keystore, entry["keystore"], entry["password"])] = entry
+
+                # only a window of keystores is submitted, so memory does not grow with the fleet
+                if len(pending) >= window:
+                    done = next(as_completed(pending))
+                    yield from self.collect(done, pending.pop(done))
+
+            for done in as_completed(pending):
+                yield from self.collect(done, pending[done])
+
+        self.save_cache()
+
+    def collect(self, future: Future, entry: dict):
+        try:
+            self.remember(entry, future.result())
+        except Exception as error:
+            self.errors.append((entry["id"], str(error)))
+            logs.error(f'Cant decrypt keystore {entry["id"]}: {error}')
+            return
+
+        del entry["keystore"]
+        yield entry
+
+    def addresses(self) -> list:
+        """
+        ::returns addresses of all keys, keystores are decrypted only if their
+        address is neither in the file nor in the address cache
+        """
+        entries = list(self.entries())
+        missing = [entry for entry in entries if not entry.get("address") and entry["id"] not in self.cache]
+        if missing:
+            # derives only the missing addresses and fills the cache
+            for entry in self.keys(missing):
+                pass
+
+        self.save_cache()
+        return [entry.get("address") or self.cache.get(entry["id"]) for entry in entries]
+
+    def accounts(self, net_name: str, account_class: type = None, **account_kwargs):
+        """
+        ::account_class Web3Account by default, or AsyncWeb3Account
+        yields ready accounts while the rest of keystores are decrypted
+        """
+        account_class = account_class if account_class else Web3Account
+        for entry in self.keys():
+            kwargs = dict(account_kwargs)
+            if entry.get("proxy") and "proxies" not in kwargs:
+                kwargs["proxies"] = entry["proxy"]
+            yield account_class(entry["key"], net_name, **kwargs)
+
+
+class Orchestrator:
+    """
+    Runs one task for many accounts concurrently in one event loop.
+
+    Concurrency is limited per chain and per proxy, requests per second per
+    RPC endpoint. Random delays between steps are timers, an account waiting
+    for its next step holds no slot. Progress is saved to a json file at
+    most every SAVE_INTERVAL seconds and at the end of the run, in a thread
+    so the loop is not blocked. A restarted run skips finished accounts and steps
+    """
+    SAVE_INTERVAL = 1
+
+    def __init__(
+            self, keys: list, net_name: str = None,
+            task=None, steps: list = None,
+            nodes: dict = DEFAULT_NODES,
+            proxies=None,
+            sleeping_timings: list = [30, 60],
+            chain_limit: int = 10,
+            proxy_limit: int = 5,
+            endpoint_rps: float = None,
+            progress_path: str = None,
+            **account_kwargs
+    ) -> None:
+        """
+        ::keys secret keys, or (secret key, net_name) pairs
+        ::task coroutine function `task(account)`, its result is saved
+        ::steps instead of task: list of (method name, *args) of AsyncWeb3Account,
+        like [("send_money", address, 0.001), ("swap", "eth", token, amount)]
+        ::proxies one proxy for all accounts, a list (proxy of the key with the same index) or {key: proxy}
+        ::chain_limit accounts running at once on one chain
+        ::proxy_limit accounts running at once through one proxy, accounts without proxy are limited by chain_limit only
+        ::endpoint_rps requests per second of every RPC endpoint, or {url: rps},
+        limits of the urls before the run are restored after it
+        ::progress_path json file of the run, `logs/progress.json` by default
+        ::account_kwargs other AsyncWeb3Account arguments, after_tx_sleeping
+        is always off: steps are spaced by sleeping_timings
+        """
+        if (task is None) == (steps is None):
+            raise Exception("Orchestrator needs task or steps")
+
+        self.jobs             = [key if isinstance(key, (tuple, list)) else (key, net_name) for key in keys]
+        self.task             = task
+        self.steps            = steps
+        self.nodes            = nodes
+        self.proxies          = proxies
+        self.timings          = sleeping_timings
+        self.chain_limit      = chain_limit
+        self.proxy_limit      = proxy_limit
+        self.endpoint_rps     = endpoint_rps
+        self.account_kwargs   = account_kwargs
+        self.progress_path    = progress_path if progress_path else path.join(getcwd(), "logs", "progress.json")
+
+        self.progress         = self.load_progress()
+        self.chain_semaphores = {}
+        self.proxy_semaphores = {}
+
+        # progress changes and the last written change, a late write never overwrites a newer one
+        self.version          = 0
+        self.saved_version    = -1
+        self.saver            = None
+        self.save_lock        = threading.Lock()
+
+    def load_progress(self) -> dict:
+        if path.exists(self.progress_path):
+            with open(self.progress_path, encoding="utf-8") as file:
+                return json.load(file)
+        return {}
+
+    def dump_progress(self) -> tuple:
+        # serialized on the loop, which is the only writer of self.progress
+        return json.dumps(self.progress, indent=2, default=str), self.version
+
+    def write_progress(self, data: str, version: int) -> None:
+        with self.save_lock:
+            if version <= self.saved_version:
+                return
+
+            # written to a temporary file first, so a killed run never leaves broken json
+            makedirs(path.dirname(self.progress_path) or ".", exist_ok=True)
+            temp_path = self.progress_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                file.write(data)
+            replace(temp_path, self.progress_path)
+            self.saved_version = version
+
+    def save_progress(self) -> None:
+        self.write_progress(*self.dump_progress())
+
+    def progress_changed(self) -> None:
+        """
+        schedules one write for all changes of the next SAVE_INTERVAL seconds
+        """
+        self.version += 1
+        if self.saver is None:
+            self.saver = asyncio.create_task(self.save_later())
+
+    async def save_later(self) -> None:
+        await asyncio.sleep(self.SAVE_INTERVAL)
+        self.saver = None
+        await asyncio.to_thread(self.write_progress, *self.dump_progress())
+
+    async def flush_progress(self) -> None:
+        if self.saver is not None:
+            self.saver.cancel()
+            self.saver = None
+        await asyncio.to_thread(self.write_progress, *self.dump_progress())
+
+    def proxy_of(self, index: int, key: str) -> str:
+        if isinstance(self.proxies, dict):
+            return self.proxies.get(key)
+        elif isinstance(self.proxies, (list, tuple)):
+            return self.proxies[index % len(self.proxies)] if self.proxies else None
+        return self.proxies
+
+    def set_endpoint_limits(self) -> dict:
+        """
+        ::returns {url: replaced limiter}, they are restored after the run
+        """
+        if not self.endpoint_rps:
+            return {}
+
+        if isinstance(self.endpoint_rps, dict):
+            limits = self.endpoint_rps
+        else:
+            net_names = {net_name for _, net_name in self.jobs}
+            limits = {
+                url: self.endpoint_rps
+                for net_name in net_names for url in self.nodes.get(net_name, [])
+            }
+
+        return {url: RateLimiter.set_limit(url, rps) for url, rps in limits.items()}
+
+    def semaphore(self, semaphores: dict, key: str, limit: int) -> asyncio.Semaphore:
+        if key not in semaphores:
+            semaphores[key] = asyncio.Semaphore(limit)
+        return semaphores[key]
+
+    async def run_step(self, account: AsyncWeb3Account, step):
+        chain = self.semaphore(self.chain_semaphores, account.net_name, self.chain_limit)
+        if account.nodes.proxies:
+            proxy = self.semaphore(self.proxy_semaphores, account.nodes.proxies, self.proxy_limit)
+        else: proxy = nullcontext()
+
+        async with chain, proxy:
+            if self.task is not None:
+                return await self.task(account)
+
+            method, *args = step
+            return await getattr(account, method)(*args)
+
+    async def run_account(self, index: int, secret_key: str, net_name: str) -> None:
+        account = AsyncWeb3Account(
+            secret_key, net_name, nodes=self.nodes, proxies=self.proxy_of(index, secret_key),
+            sleeping_timings=self.timings, **dict(self.account_kwargs, after_tx_sleeping=False)
+        )
+        key = f'{account.address}:{net_name}'
+        record = self.progress.setdefault(key, {"status": "pending", "step": 0, "results": []})
+        if record["status"] == "done":
+            return
+
+        steps = self.steps if self.task is None else [None]
+        record["status"] = "running"
+
+        try:
+            while record["step"] < len(steps):
+                if record["step"] > 0:
+                    # a timer, not a held slot: other accounts run meanwhile
+                    await account.sleeping()
+
+                result = await self.run_step(account, steps[record["step"]])
+                record["results"].append(result)
+                record["step"] += 1
+                self.progress_changed()
+
+            record["status"] = "done"
+            record.pop("error", None)
+
+        except Exception as error:
+            record["status"] = "failed"
+            record["error"]  = str(error)
+            account.logger.error(f'Job failed on step {record["step"]}: {error}')
+
+        self.progress_changed()
+
+    async def run_async(self) -> dict:
+        """
+        ::returns progress of all accounts: {"address:net_name": {status, step, results, error}}
+        """
+        replaced = self.set_endpoint_limits()
+        try:
+            await asyncio.gather(*[
+                self.run_account(index, secret_key, net_name)
+                for index, (secret_key, net_name) in enumerate(self.jobs)
+            ])
+        finally:
+            for url, limiter in replaced.items():
+                RateLimiter.restore_limit(url, limiter)
+
+            await self.flush_progress()
+            await Inch.aclose()
+        return self.progress
+
+    def run(self) -> dict:
+        return asyncio.run(self.run_async())
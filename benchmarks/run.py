@@ -0,0 +1,364 @@
+"""
+Benchmarks of the hot paths against a local stub node and 1inch stand-in
+
+    python benchmarks/run.py
+    python benchmarks/run.py --scenarios send_money,swap --accounts 1,100,1000 --latency 0.02
+
+Every (scenario, accounts) pair runs in a fresh process, so peak RSS is
+its own. Results are printed and written to benchmarks/results.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from os import path
+import subprocess
+import argparse
+import platform
+import tempfile
+import asyncio
+import json
+import time
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCHMARKS_PATH = path.dirname(path.abspath(__file__))
+sys.path.insert(0, path.dirname(BENCHMARKS_PATH))
+sys.path.insert(0, BENCHMARKS_PATH)
+
+from Account import *
+from stub_node import StubNode
+from stub_inch import StubInch
+
+
+NET_NAME = "polygon"
+TOKEN    = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+RECEIVER = "0x54C32309b67e72bD44899e46EC630d14Eb96125f"
+THREADS  = 64
+
+# seconds, a startup phase above its budget is reported as a regression
+STARTUP_BUDGET = {
+    "import"        : 0.3,
+    "first_account" : 1.5,
+    "first_call"    : 1.5
+}
+
+# a short-lived script: import, one account, one balance read
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import Account
+imported = time.perf_counter()
+account = Account.Web3Account(sys.argv[1], "polygon", nodes={"polygon": [sys.argv[2]]}, after_tx_sleeping=False)
+created = time.perf_counter()
+account.get_native_balance()
+called = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_account": created - imported, "first_call": called - created}))
+"""
+
+
+class Environment:
+    def __init__(self, latency: float, error_rate: float, block_time: float) -> None:
+        self.node = StubNode(latency=latency, error_rate=error_rate, block_time=block_time).start()
+        self.inch = StubInch(latency=latency).start()
+
+    @property
+    def nodes(self) -> dict:
+        return {NET_NAME: [self.node.url]}
+
+    def key(self, index: int) -> str:
+        return "0x%064x" % (index + 1)
+
+    def account(self, index: int) -> Web3Account:
+        account = Web3Account(self.key(index), NET_NAME, nodes=self.nodes, after_tx_sleeping=False)
+        account.inch_helper.base_url = self.inch.url
+        return account
+
+    def async_account(self, index: int) -> AsyncWeb3Account:
+        account = AsyncWeb3Account(self.key(index), NET_NAME, nodes=self.nodes, after_tx_sleeping=False)
+        account.inch_helper.base_url = self.inch.url
+        return account
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+async def timed_async(coroutine) -> float:
+    start = time.perf_counter()
+    await coroutine
+    return time.perf_counter() - start
+
+
+def run_threaded(func, count: int) -> list:
+    with ThreadPoolExecutor(min(THREADS, count)) as executor:
+        return list(executor.map(lambda index: timed(func, index), range(count)))
+
+
+def scenario_startup(env: Environment, count: int) -> tuple:
+    # `count` fresh interpreters, the module is imported lazily in each
+    phases = []
+    for index in range(count):
+        process = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, env.key(index), env.node.url],
+            capture_output=True, text=True, cwd=path.dirname(BENCHMARKS_PATH), check=True
+        )
+        phases.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+    medians = {phase: round(percentile([run[phase] for run in phases], 0.5), 4) for phase in STARTUP_BUDGET}
+    return [sum(run.values()) for run in phases], {
+        "startup"     : medians,
+        "over_budget" : [phase for phase, budget in STARTUP_BUDGET.items() if medians[phase] > budget]
+    }
+
+
+def scenario_init(env: Environment, count: int) -> list:
+    return [timed(env.account, index) for index in range(count)]
+
+
+def scenario_get_balance(env: Environment, count: int) -> list:
+    accounts = [env.account(index) for index in range(count)]
+    return run_threaded(lambda index: accounts[index].get_balance(TOKEN), count)
+
+
+def scenario_get_balances(env: Environment, count: int) -> list:
+    # one multicall scan of `count` wallets, one op per wallet
+    account = env.account(0)
+    addresses = [env.account(index).address for index in range(count)]
+
+    duration = timed(account.get_balances, ["eth", TOKEN], addresses)
+    return [duration / count] * count
+
+
+def scenario_send_money(env: Environment, count: int) -> list:
+    accounts = [env.account(index) for index in range(count)]
+    return run_threaded(lambda index: accounts[index].send_money(RECEIVER, 0.001), count)
+
+
+def scenario_send_money_async(env: Environment, count: int) -> list:
+    async def main():
+        accounts = [env.async_account(index) for index in range(count)]
+        return await asyncio.gather(*[
+            timed_async(account.send_money(RECEIVER, 0.001)) for account in accounts
+        ])
+    return list(asyncio.run(main()))
+
+
+def scenario_send_batch(env: Environment, count: int) -> list:
+    # `count` transfers of one account, broadcast at once and awaited together
+    account = env.account(0)
+    txs = [dict(account.get_tx_data(10 ** 15), to=RECEIVER) for _ in range(count)]
+
+    duration = timed(lambda: TxHandle.wait_all(account.send_transactions(txs)))
+    return [duration / count] * count
+
+
+def scenario_swap(env: Environment, count: int) -> list:
+    accounts = [env.account(index) for index in range(count)]
+    return run_threaded(lambda index: accounts[index].swap(TOKEN, "eth", 10 ** 18), count)
+
+
+def scenario_get_contract(env: Environment, count: int) -> list:
+    account = env.account(0)
+    return [timed(account.get_contract, TOKEN) for _ in range(count)]
+
+
+def scenario_get_contract_uncached(env: Environment, count: int) -> list:
+    # the path before ContractCache: the ABI is parsed on every call
+    w3 = env.account(0).get_provider()
+    return [timed(lambda: w3.eth.contract(TOKEN, abi=BASE_ERC20_ABI)) for _ in range(count)]
+
+
+def scenario_encode_web3(env: Environment, count: int) -> list:
+    contract = env.account(0).get_contract(TOKEN)
+    return [timed(contract.encodeABI, "balanceOf", [RECEIVER]) for _ in range(count)]
+
+
+def scenario_encode_fast(env: Environment, count: int) -> list:
+    return [timed(ERC20.balance_of, RECEIVER) for _ in range(count)]
+
+
+def scenario_index_transfers(env: Environment, count: int) -> list:
+    # transfer history of `count` addresses over 50k blocks, one op per address
+    env.node.block = 50_000
+    addresses = [env.account(index).address for index in range(count)]
+    indexer = TransferIndexer(
+        addresses, path.join(tempfile.mkdtemp(), "transfers.db"),
+        nodes=env.nodes, confirmations=0
+    )
+
+    duration = timed(indexer.update)
+    return [duration / count] * count
+
+
+def signing_jobs(env: Environment, count: int) -> list:
+    # `count` transfers from 10 accounts, built offline
+    accounts = [env.account(index) for index in range(min(10, count))]
+    return [
+        (accounts[index % len(accounts)], {
+            "chainId"              : 137,
+            "nonce"                : index // len(accounts),
+            "to"                   : RECEIVER,
+            "value"                : 10 ** 15,
+            "gas"                  : 21000,
+            "maxFeePerGas"         : 50 * 10 ** 9,
+            "maxPriorityFeePerGas" : 30 * 10 ** 9,
+            "type"                 : 2
+        })
+        for index in range(count)
+    ]
+
+
+def scenario_sign_inline(env: Environment, count: int) -> list:
+    jobs = signing_jobs(env, count)
+    return [timed(account.eth_account.sign_transaction, tx) for account, tx in jobs]
+
+
+def scenario_sign_pool(env: Environment, count: int) -> list:
+    jobs = signing_jobs(env, count)
+
+    duration = timed(sign_transactions, jobs)
+    return [duration / count] * count
+
+
+SCENARIOS = {
+    "startup"          : scenario_startup,
+    "init"             : scenario_init,
+    "get_balance"      : scenario_get_balance,
+    "get_balances"     : scenario_get_balances,
+    "send_money"       : scenario_send_money,
+    "send_money_async" : scenario_send_money_async,
+    "send_batch"       : scenario_send_batch,
+    "swap"             : scenario_swap,
+    "get_contract"     : scenario_get_contract,
+    "get_contract_uncached" : scenario_get_contract_uncached,
+    "encode_web3"      : scenario_encode_web3,
+    "encode_fast"      : scenario_encode_fast,
+    "index_transfers"  : scenario_index_transfers,
+    "sign_inline"      : scenario_sign_inline,
+    "sign_pool"        : scenario_sign_pool
+}
+
+
+def percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else None
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scenario(name: str, count: int, latency: float, error_rate: float, block_time: float) -> dict:
+    logs.remove()
+    LOG_SINK.directory = tempfile.mkdtemp()
+
+    # lazy imports of the module are measured by the startup scenario only
+    for module in (Web3, acc, requests, aiohttp):
+        module.load()
+
+    env = Environment(latency, error_rate, block_time)
+
+    start = time.perf_counter()
+    durations = SCENARIOS[name](env, count)
+    wall_time = time.perf_counter() - start
+
+    extra = {}
+    if isinstance(durations, tuple):
+        durations, extra = durations
+
+    rpc_calls = Counter(env.node.calls)
+    return dict({
+        "scenario"           : name,
+        "accounts"           : count,
+        "ops"                : len(durations),
+        "wall_time"          : round(wall_time, 4),
+        "throughput"         : round(len(durations) / wall_time, 2) if wall_time else None,
+        "p50"                : round(percentile(durations, 0.5), 5),
+        "p99"                : round(percentile(durations, 0.99), 5),
+        "rpc_calls_per_op"   : round(sum(rpc_calls.values()) / len(durations), 3),
+        "http_requests_per_op" : round(env.node.http_requests / len(durations), 3),
+        "inch_calls_per_op"  : round(sum(env.inch.calls.values()) / len(durations), 3),
+        "rpc_methods"        : dict(rpc_calls.most_common()),
+        "peak_rss_mb"        : peak_rss_mb()
+    }, **extra)
+
+
+def run_child(args, name: str, count: int) -> dict:
+    command = [
+        sys.executable, path.abspath(__file__), "--child", name, str(count),
+        "--latency", str(args.latency), "--error-rate", str(args.error_rate),
+        "--block-time", str(args.block_time)
+    ]
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {"scenario": name, "accounts": count, "error": process.stderr.strip().splitlines()[-1:]}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def print_result(result: dict) -> None:
+    if "error" in result:
+        print(f'{result["scenario"]:<21} {result["accounts"]:>6}  failed: {result["error"]}')
+        return
+
+    print(
+        f'{result["scenario"]:<21} {result["accounts"]:>6}  '
+        f'{result["rpc_calls_per_op"]:>7} rpc/op  {result["http_requests_per_op"]:>7} http/op  '
+        f'p50 {result["p50"] * 1000:>9.2f}ms  p99 {result["p99"] * 1000:>9.2f}ms  '
+        f'{result["throughput"]:>9} op/s  {result["peak_rss_mb"]} MB'
+    )
+    if "startup" in result:
+        phases = "  ".join(f'{phase} {value * 1000:.0f}ms' for phase, value in result["startup"].items())
+        print(f'{"":<29}{phases}  over budget: {result["over_budget"] or "none"}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="web3_account benchmarks")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated, all by default")
+    parser.add_argument("--accounts", default="1,10,100", help="comma separated account counts")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every node request")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of failed node calls")
+    parser.add_argument("--block-time", type=float, default=0.5)
+    parser.add_argument("--output", default=path.join(BENCHMARKS_PATH, "results.json"))
+    parser.add_argument("--child", nargs=2, metavar=("SCENARIO", "ACCOUNTS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        name, count = args.child
+        result = run_scenario(name, int(count), args.latency, args.error_rate, args.block_time)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for name in args.scenarios.split(","):
+        for count in [int(count) for count in args.accounts.split(",")]:
+            result = run_child(args, name, count)
+            print_result(result)
+            results.append(result)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({
+            "time"     : time.time(),
+            "python"   : platform.python_version(),
+            "platform" : platform.platform(),
+            "settings" : {
+                "latency"    : args.latency,
+                "error_rate" : args.error_rate,
+                "block_time" : args.block_time
+            },
+            "results"  : results
+        }, file, indent=2)
+    print(f'Results are saved to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from collections import Counter
+import threading
+import json
+import time
+
+
+NATIVE   = "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee"
+SPENDER  = "0x1111111254eeb25477b68fb85ed929f73a960582"
+CALLDATA = "0x12aa3caf" + "00" * 320
+
+
+class StubInch:
+    """
+    1inch api stand-in: /quote, /swap and /approve/spender of any chain.
+    `rate_limit` requests per second are served, the rest get 429
+    """
+    def __init__(self, latency: float = 0, rate_limit: float = None) -> None:
+        self.latency    = latency
+        self.rate_limit = rate_limit
+
+        self.calls       = Counter()
+        self.connections = 0
+        self.limited     = 0
+        self.window      = (0, 0)
+        self.lock        = threading.Lock()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 1024
+        self.url    = f'http://127.0.0.1:{self.server.server_port}'
+
+    def handler(self):
+        inch = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with inch.lock:
+                    inch.connections += 1
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                params = {key: value[0] for key, value in parse_qs(url.query).items()}
+
+                if inch.latency:
+                    time.sleep(inch.latency)
+                status, headers, response = inch.handle(url.path, params)
+
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self) -> "StubInch":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.calls.clear()
+            self.connections = 0
+            self.limited     = 0
+
+    def is_limited(self) -> bool:
+        if not self.rate_limit:
+            return False
+
+        with self.lock:
+            second, count = self.window
+            now = int(time.time())
+            if now != second:
+                second, count = now, 0
+
+            self.window = (second, count + 1)
+            if count >= self.rate_limit:
+                self.limited += 1
+                return True
+        return False
+
+    def handle(self, url_path: str, params: dict) -> tuple:
+        endpoint = url_path.rstrip("/").rsplit("/", 1)[-1]
+        with self.lock:
+            self.calls[endpoint] += 1
+
+        if self.is_limited():
+            return 429, {"Retry-After": "1"}, {"statusCode": 429, "description": "Too many requests"}
+
+        if endpoint == "spender":
+            return 200, {}, {"address": SPENDER}
+
+        elif endpoint == "quote":
+            return 200, {}, {
+                "fromTokenAmount" : params["amount"],
+                "toTokenAmount"   : str(int(params["amount"]) * 2)
+            }
+
+        elif endpoint == "swap":
+            native_in = params["fromTokenAddress"].lower() == NATIVE
+            return 200, {}, {
+                "fromTokenAmount" : params["amount"],
+                "toTokenAmount"   : str(int(params["amount"]) * 2),
+                "tx"              : {
+                    "from"  : params["fromAddress"],
+                    "to"    : SPENDER,
+                    "data"  : CALLDATA,
+                    "value" : params["amount"] if native_in else "0"
+                }
+            }
+
+        return 404, {}, {"statusCode": 404, "description": "Not found"}
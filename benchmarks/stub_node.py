@@ -0,0 +1,265 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import Counter
+from random import random
+import threading
+import json
+import time
+
+from eth_account import Account as acc
+from eth_abi import encode, decode
+from eth_utils import keccak, to_hex
+
+
+ERC20_DECIMALS  = "313ce567"
+ERC20_BALANCE   = "70a08231"
+ERC20_ALLOWANCE = "dd62ed3e"
+ERC20_SYMBOL    = "95d89b41"
+ETH_BALANCE     = "4d2301cc"
+AGGREGATE3      = "82ad56cb"
+TRANSFER_TOPIC  = to_hex(keccak(text="Transfer(address,address,uint256)"))
+LOGS_TOKEN      = "0x" + "33" * 20
+
+RECEIPT_FIELDS = {
+    "blockHash"         : "0x" + "00" * 32,
+    "logs"              : [],
+    "transactionIndex"  : "0x0",
+    "cumulativeGasUsed" : "0x5208",
+    "gasUsed"           : "0x5208",
+    "effectiveGasPrice" : "0x1",
+    "contractAddress"   : None,
+    "logsBloom"         : "0x" + "00" * 256,
+    "type"              : "0x2"
+}
+
+
+class LogLimitError(Exception):
+    pass
+
+
+class StubNode:
+    """
+    In-process JSON-RPC node for benchmarks: every sent tx is mined in the
+    next block, balances and allowances are constant. Counts rpc calls per
+    method and http requests (a batch is one request)
+    """
+    def __init__(
+            self, chain_id: int = 137, latency: float = 0,
+            error_rate: float = 0, block_time: float = 1,
+            log_every: int = 100, max_logs: int = 10000
+    ) -> None:
+        """
+        ::latency seconds added to every http request
+        ::error_rate share of calls answered with a retriable node error
+        ::log_every every filtered address has a transfer in and out once in `log_every` blocks
+        ::max_logs eth_getLogs with more results is answered with a limit error
+        """
+        self.chain_id   = chain_id
+        self.latency    = latency
+        self.error_rate = error_rate
+        self.block_time = block_time
+        self.log_every  = log_every
+        self.max_logs   = max_logs
+
+        self.calls         = Counter()
+        self.http_requests = 0
+        # error object answered to a whole batch, like a node without batches
+        self.batch_error   = None
+        self.block         = 100
+        self.mined_at      = {}
+        self.senders       = {}
+        self.nonces        = Counter()
+        self.lock          = threading.Lock()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 1024
+        self.url    = f'http://127.0.0.1:{self.server.server_port}'
+
+    def handler(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with node.lock:
+                    node.http_requests += 1
+                if node.latency:
+                    time.sleep(node.latency)
+
+                if isinstance(body, list) and node.batch_error:
+                    response = {"jsonrpc": "2.0", "id": None, "error": node.batch_error}
+                elif isinstance(body, list):
+                    response = [node.handle(request) for request in body]
+                else: response = node.handle(body)
+
+                data = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self) -> "StubNode":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.mine, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.calls.clear()
+            self.http_requests = 0
+
+    def mine(self) -> None:
+        while True:
+            time.sleep(self.block_time)
+            self.block += 1
+
+    def handle(self, request: dict) -> dict:
+        method, params = request["method"], request.get("params", [])
+        with self.lock:
+            self.calls[method] += 1
+
+        response = {"jsonrpc": "2.0", "id": request["id"]}
+        handler = getattr(self, method, None)
+
+        if handler is None:
+            response["error"] = {"code": -32601, "message": "the method does not exist"}
+        elif self.error_rate and random() < self.error_rate:
+            response["error"] = {"code": -32000, "message": "header not found"}
+        else:
+            try:
+                response["result"] = handler(*params)
+            except LogLimitError as error:
+                response["error"] = {"code": -32005, "message": str(error)}
+
+        return response
+
+    def eth_chainId(self) -> str:
+        return hex(self.chain_id)
+
+    def net_version(self) -> str:
+        return str(self.chain_id)
+
+    def eth_blockNumber(self) -> str:
+        return hex(self.block)
+
+    def eth_gasPrice(self) -> str:
+        return hex(30 * 10 ** 9)
+
+    def eth_maxPriorityFeePerGas(self) -> str:
+        return hex(2 * 10 ** 9)
+
+    def eth_feeHistory(self, count, block: str, percentiles: list) -> dict:
+        count = int(count, 16) if isinstance(count, str) else count
+        return {
+            "oldestBlock"   : hex(self.block - count),
+            "baseFeePerGas" : [hex(20 * 10 ** 9)] * (count + 1),
+            "gasUsedRatio"  : [0.5] * count,
+            "reward"        : [[hex(10 ** 9)] * len(percentiles)] * count
+        }
+
+    def eth_getTransactionCount(self, address: str, block: str = "latest") -> str:
+        return hex(self.nonces[address.lower()])
+
+    def eth_getBalance(self, address: str, block: str = "latest") -> str:
+        return hex(10 ** 20)
+
+    def eth_getCode(self, address: str, block: str = "latest") -> str:
+        return "0x"
+
+    def eth_estimateGas(self, tx: dict, *args) -> str:
+        return hex(50000 if tx.get("data") not in (None, "0x") else 21000)
+
+    def eth_sendRawTransaction(self, raw_tx: str) -> str:
+        tx_hash = to_hex(keccak(hexstr=raw_tx))
+        sender  = acc.recover_transaction(raw_tx).lower()
+
+        with self.lock:
+            self.nonces[sender] += 1
+            self.mined_at[tx_hash] = self.block + 1
+            self.senders[tx_hash]  = sender
+        return tx_hash
+
+    def eth_getTransactionReceipt(self, tx_hash: str) -> dict:
+        block = self.mined_at.get(tx_hash)
+        if block is None or block > self.block:
+            return None
+
+        return dict(
+            RECEIPT_FIELDS,
+            transactionHash=tx_hash, status="0x1", blockNumber=hex(block),
+            to="0x" + "22" * 20, **{"from": self.senders[tx_hash]}
+        )
+
+    def eth_getBlockReceipts(self, block: str) -> list:
+        block = int(block, 16)
+        return [
+            self.eth_getTransactionReceipt(tx_hash)
+            for tx_hash, mined_at in list(self.mined_at.items()) if mined_at == block
+        ]
+
+    def eth_getBlockByNumber(self, block: str, full: bool = False) -> dict:
+        number = self.block if block in ("latest", "pending") else int(block, 16)
+        return {"number": hex(number), "timestamp": hex(1_700_000_000 + number * 2), "transactions": []}
+
+    def eth_getLogs(self, log_filter: dict) -> list:
+        topics = log_filter.get("topics") or []
+        if not topics or topics[0] != TRANSFER_TOPIC:
+            return []
+
+        # [topic, senders] or [topic, None, receivers]
+        side = 1 if len(topics) == 2 or topics[1] else 2
+        words = topics[side] if isinstance(topics[side], list) else [topics[side]]
+        first = int(log_filter["fromBlock"], 16)
+        last  = int(log_filter["toBlock"], 16)
+
+        blocks = range(first + (-first) % self.log_every, last + 1, self.log_every)
+        if len(blocks) * len(words) > self.max_logs:
+            raise LogLimitError(f"query returned more than {self.max_logs} results")
+
+        logs = []
+        for block in blocks:
+            for index, word in enumerate(words):
+                other = "0x" + "00" * 12 + "44" * 20
+                logs.append({
+                    "address"          : LOGS_TOKEN,
+                    "topics"           : [TRANSFER_TOPIC, word, other] if side == 1 else [TRANSFER_TOPIC, other, word],
+                    "data"             : "0x" + encode(["uint256"], [10 ** 18 + block]).hex(),
+                    "blockNumber"      : hex(block),
+                    "transactionHash"  : to_hex(keccak(text=f"{block}:{side}:{word}")),
+                    "logIndex"         : hex(index),
+                    "removed"          : False
+                })
+        return logs
+
+    def eth_call(self, tx: dict, block: str = "latest") -> str:
+        return "0x" + self.call(bytes.fromhex(tx["data"][2:])).hex()
+
+    def call(self, data: bytes) -> bytes:
+        selector = data[:4].hex()
+
+        if selector == ERC20_DECIMALS:
+            return encode(["uint256"], [18])
+        elif selector == ERC20_BALANCE:
+            return encode(["uint256"], [5 * 10 ** 18])
+        elif selector == ERC20_ALLOWANCE:
+            return encode(["uint256"], [0])
+        elif selector == ERC20_SYMBOL:
+            return encode(["string"], ["TKN"])
+        elif selector == ETH_BALANCE:
+            return encode(["uint256"], [10 ** 20])
+        elif selector == AGGREGATE3:
+            calls, = decode(["(address,bool,bytes)[]"], data[4:])
+            return encode(["(bool,bytes)[]"], [[(True, self.call(call_data)) for _, _, call_data in calls]])
+
+        return b""
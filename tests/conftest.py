@@ -0,0 +1,36 @@
+from os import path
+import sys
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path[:0] = [ROOT, path.join(ROOT, "benchmarks")]
+
+import pytest
+
+from Account import LOG_SINK, ReceiptWatcher
+from stub_inch import StubInch
+from stub_node import StubNode
+
+
+ReceiptWatcher.POLL_INTERVAL = 0.05
+
+
+@pytest.fixture(scope="session", autouse=True)
+def log_directory(tmp_path_factory):
+    # account logs of the tests stay out of the working directory
+    LOG_SINK.directory = str(tmp_path_factory.mktemp("logs"))
+    yield LOG_SINK.directory
+    LOG_SINK.flush()
+
+
+@pytest.fixture(scope="module")
+def node():
+    node = StubNode(block_time=0.1).start()
+    yield node
+    node.stop()
+
+
+@pytest.fixture(scope="module")
+def inch():
+    inch = StubInch().start()
+    yield inch
+    inch.stop()
@@ -0,0 +1,56 @@
+from itertools import count
+
+import pytest
+
+from Account import Inch, MAX_UINT256, Web3, Web3Account
+from stub_inch import SPENDER
+
+NET_NAME = "polygon"
+TOKEN    = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+KEYS     = count(0xA110)
+
+
+@pytest.fixture
+def account(node, inch):
+    Inch._cache.clear()
+    account = Web3Account("0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url]}, after_tx_sleeping=False)
+    account.inch_helper.base_url = inch.url
+    node.reset_counters()
+    inch.reset_counters()
+    return account
+
+
+def test_known_allowance_skips_reads(account, node, inch):
+    account.allowance_tracker.set(TOKEN, SPENDER, 10 ** 18)
+    assert account.swap(TOKEN, "eth", 10 ** 18) is True
+
+    # no allowance call and no approve, one swap request and one tx
+    assert node.calls["eth_call"] == 0
+    assert node.calls["eth_sendRawTransaction"] == 1
+    assert inch.calls["swap"] == 1
+    assert not account.allowance_tracker.covers(TOKEN, SPENDER, 1)
+
+
+def test_approve_max(account, node):
+    assert account.swap(TOKEN, "eth", 10 ** 18, approve_max=True) is True
+    # a max allowance is not spent, like in ERC20 tokens
+    assert account.allowance_tracker.allowance(TOKEN, SPENDER) == MAX_UINT256
+
+    node.reset_counters()
+    assert account.swap(TOKEN, "eth", 10 ** 20, approve_max=True) is True
+    assert node.calls["eth_call"] == 0
+    assert node.calls["eth_sendRawTransaction"] == 1
+
+
+def test_allowance_spent_elsewhere(account, node, inch, monkeypatch):
+    # the tracker trusts an allowance which another wallet app spent meanwhile
+    account.allowance_tracker.set(TOKEN, SPENDER, 10 ** 18)
+    get_data, replies = account.inch_helper.get_data, [{
+        "statusCode": 400, "description": f"Not enough allowance. Spender: {Web3.to_checksum_address(SPENDER)}"
+    }]
+    monkeypatch.setattr(account.inch_helper, "get_data", lambda *args: replies.pop() if replies else get_data(*args))
+
+    assert account.swap(TOKEN, "eth", 10 ** 18) is True
+    # the allowance is read again, approved and the swap is asked once more
+    assert node.calls["eth_sendRawTransaction"] == 2
+    assert inch.calls["swap"] == 1
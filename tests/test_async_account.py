@@ -0,0 +1,93 @@
+from itertools import count
+import asyncio
+
+import pytest
+
+import Account
+from Account import AsyncWeb3Account, TxHandle, TxResult, Web3
+from stub_inch import SPENDER
+
+NET_NAME = "polygon"
+TOKEN    = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+RECEIVER = "0x54C32309b67e72bD44899e46EC630d14Eb96125f"
+KEYS     = count(0xA5C0)
+
+
+@pytest.fixture
+def account(node, inch):
+    # a fresh key per test, so nonces and allowances do not leak between tests
+    account = AsyncWeb3Account("0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url]}, after_tx_sleeping=False)
+    account.inch_helper.base_url = inch.url
+    node.reset_counters()
+    inch.reset_counters()
+    return account
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_get_native_balance(account, node):
+    assert run(account.get_native_balance()) == Web3.to_wei(100, "ether")
+    assert node.calls["eth_getBalance"] == 1
+
+
+def test_get_balance(account):
+    balance, from_wei_balance, decimals = run(account.get_balance(TOKEN, get_decimals=True))
+    assert (balance, from_wei_balance, decimals) == (5 * 10 ** 18, 5.0, 18)
+
+
+def test_send_money(account, node):
+    assert run(account.send_money(RECEIVER, 0.01)) is True
+    assert node.calls["eth_sendRawTransaction"] == 1
+
+
+def test_approve_token(account, node):
+    async def approve():
+        await account.approve_token(TOKEN, SPENDER, 10 ** 18)
+        # the tracked allowance covers the second call, nothing is sent
+        await account.approve_token(TOKEN, SPENDER, 10 ** 18)
+
+    run(approve())
+    assert node.calls["eth_sendRawTransaction"] == 1
+    assert account.allowance_tracker.covers(TOKEN, SPENDER, 10 ** 18)
+
+
+def test_swap_token(account, node, inch):
+    assert run(account.swap(TOKEN, "eth", 10 ** 18)) is True
+
+    # approve and swap txs
+    assert node.calls["eth_sendRawTransaction"] == 2
+    assert inch.calls["spender"] == 1 and inch.calls["swap"] == 1
+
+
+def test_second_swap_needs_no_approve(account, node):
+    async def swaps():
+        assert await account.swap(TOKEN, "eth", 10 ** 18) is True
+        assert await account.swap(TOKEN, "eth", 10 ** 18) is True
+
+    run(swaps())
+
+    # one approve of the whole balance and two swap txs
+    assert node.calls["eth_sendRawTransaction"] == 3
+
+
+def test_swap_native(account, node, inch):
+    assert run(account.swap("eth", TOKEN, 10 ** 17)) is True
+
+    assert node.calls["eth_sendRawTransaction"] == 1
+    assert inch.calls["spender"] == 0 and inch.calls["swap"] == 1
+
+
+def test_send_transactions(account, node, monkeypatch):
+    # the process pool of the bulk api is not used for txs of one account
+    monkeypatch.setattr(Account, "sign_transactions", None)
+    txs = [dict(run(account.get_tx_data(10 ** 15)), to=RECEIVER) for _ in range(3)]
+
+    async def send():
+        handles = await account.send_transactions(txs)
+        return await TxHandle.gather(handles)
+
+    results = run(send())
+    assert [result.status for result in results] == [TxResult.SUCCESS] * 3
+    assert node.calls["eth_sendRawTransaction"] == 3
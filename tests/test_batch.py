@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+import pytest
+
+from Account import AsyncWeb3Account, Nodes, RPCBatch, Web3Account, decode_batch_response, error_endpoint, from_hex
+
+NET_NAME = "polygon"
+ADDRESS  = "0x54C32309b67e72bD44899e46EC630d14Eb96125f"
+
+
+@pytest.fixture
+def w3(node):
+    node.reset_counters()
+    yield Nodes({NET_NAME: [node.url]}).pick(NET_NAME)
+    node.batch_error = None
+
+
+def batch(w3) -> tuple:
+    with RPCBatch(w3) as batch:
+        balance = batch.add("eth_getBalance", [ADDRESS, "latest"], from_hex)
+        block   = batch.add("eth_blockNumber", formatter=from_hex)
+    return balance.result, block.result
+
+
+def test_one_request(w3, node):
+    balance, block = batch(w3)
+
+    assert balance == 10 ** 20 and block >= 100
+    assert node.http_requests == 1
+
+
+@pytest.mark.parametrize("count", [2, 20])
+def test_tx_preparation_requests(node, monkeypatch, count):
+    account = Web3Account("0x%064x" % (0xBA70 + count), NET_NAME, nodes={NET_NAME: [node.url]})
+    txs = [dict(account.get_tx_data(10 ** 15), to=ADDRESS) for _ in range(count)]
+
+    # the receipt watcher thread shares the provider, only requests of this thread are counted
+    provider, requests, caller = account.get_provider().provider, [], threading.current_thread()
+    post = provider._post
+
+    def counted(payload):
+        if threading.current_thread() is caller:
+            requests.append(payload)
+        return post(payload)
+
+    monkeypatch.setattr(provider, "_post", counted)
+    handles = account.send_transactions(txs)
+
+    # pending nonce, estimates (none for cached shapes) and broadcast, for any count of txs
+    assert len(requests) <= 3
+    # the watcher stops polling the node once the txs are mined
+    assert all(handle.result() for handle in handles)
+
+
+def test_out_of_order_replies():
+    replies = b'[{"id": 1, "result": "0x1"}, {"id": 0, "result": "0x0"}]'
+    assert [reply["result"] for reply in decode_batch_response(replies, 2)] == ["0x0", "0x1"]
+
+
+@pytest.mark.parametrize("code", [-32601, -32600])
+def test_fallback_without_batches(w3, node, code):
+    node.batch_error = {"code": code, "message": "batch requests are not supported"}
+    balance, _ = batch(w3)
+
+    # the batch and then its calls one by one
+    assert balance == 10 ** 20
+    assert node.http_requests == 3
+
+
+def test_batch_error_raised(w3, node):
+    node.batch_error = {"code": -32005, "message": "rate limit exceeded"}
+    with pytest.raises(ValueError) as error:
+        batch(w3)
+
+    # retry finds the node in the error and no single requests are sent
+    assert error_endpoint(error.value) == node.url
+    assert node.http_requests == 1
+
+
+def test_async_batch_error_raised(node):
+    node.batch_error = {"code": -32005, "message": "rate limit exceeded"}
+    account = AsyncWeb3Account("0x%064x" % 0xBA7C, NET_NAME, nodes={NET_NAME: [node.url]})
+
+    async def read():
+        async with account.batch() as batch:
+            batch.add("eth_blockNumber", formatter=from_hex)
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(read())
+    finally:
+        node.batch_error = None
@@ -0,0 +1,55 @@
+from itertools import count
+
+from Account import BASE_ERC20_ABI, ERC20, MULTICALL3_ABI, ContractCache, Web3, Web3Account
+
+NET_NAME = "polygon"
+TOKEN    = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+OWNER    = "0x54C32309b67e72bD44899e46EC630d14Eb96125f"
+SPENDER  = "0x1111111254EEB25477B68fb85Ed929f73A960582"
+KEYS     = count(0xC0C0)
+
+
+def account(node) -> Web3Account:
+    return Web3Account("0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url]})
+
+
+def test_encoders_match_web3(node):
+    contract = account(node).get_contract(TOKEN)
+
+    assert ERC20.balance_of(OWNER) == contract.encodeABI("balanceOf", [OWNER])
+    assert ERC20.allowance(OWNER, SPENDER) == contract.encodeABI("allowance", [OWNER, SPENDER])
+    assert ERC20.approve(SPENDER, 2 ** 256 - 1) == contract.encodeABI("approve", [SPENDER, 2 ** 256 - 1])
+    assert ERC20.DECIMALS == contract.encodeABI("decimals", [])
+    assert ERC20.TRANSFER == Web3.to_hex(Web3.keccak(text="Transfer(address,address,uint256)"))
+
+
+def test_selectors_match_signatures():
+    selectors = {
+        ERC20.BALANCE_OF  : "balanceOf(address)",
+        ERC20.ETH_BALANCE : "getEthBalance(address)",
+        ERC20.AGGREGATE3  : "aggregate3((address,bool,bytes)[])"
+    }
+    for selector, signature in selectors.items():
+        assert selector == Web3.to_hex(Web3.keccak(text=signature))[:10]
+
+
+def test_contract_shared_by_accounts(node):
+    first, second = account(node), account(node)
+
+    assert first.get_contract(TOKEN) is second.get_contract(TOKEN.lower())
+    # another ABI of the same address is another object
+    assert first.get_contract(TOKEN) is not first.get_contract(TOKEN, abi=MULTICALL3_ABI)
+
+
+def test_lru(node):
+    cache = ContractCache(max_size=2)
+    w3 = account(node).get_provider()
+    addresses = [Web3.to_checksum_address("0x%040x" % (0xC0 + index)) for index in range(3)]
+    first = cache.get(w3, NET_NAME, addresses[0], BASE_ERC20_ABI)
+
+    cache.get(w3, NET_NAME, addresses[1], BASE_ERC20_ABI)
+    assert cache.get(w3, NET_NAME, addresses[0], BASE_ERC20_ABI) is first
+
+    # the least recently used one is dropped
+    cache.get(w3, NET_NAME, addresses[2], BASE_ERC20_ABI)
+    assert [key[1] for key in cache.contracts] == [addresses[0].lower(), addresses[2].lower()]
@@ -0,0 +1,92 @@
+from itertools import count
+import time
+
+import pytest
+
+from Account import ERC20, GasEstimateCache, Web3, Web3Account
+
+NET_NAME = "polygon"
+TOKEN    = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+RECEIVER = "0x54C32309b67e72bD44899e46EC630d14Eb96125f"
+KEYS     = count(0x6A50)
+
+
+@pytest.fixture
+def account(node):
+    account = Web3Account(
+        "0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url]},
+        after_tx_sleeping=False, gas_estimates=GasEstimateCache()
+    )
+    node.reset_counters()
+    return account
+
+
+def approve_tx(account, spender: str) -> dict:
+    return dict(account.get_tx_data(), to=TOKEN, data=ERC20.approve(spender, 10 ** 18))
+
+
+def test_key_shape():
+    first  = {"to": TOKEN, "data": ERC20.approve(RECEIVER, 10 ** 18)}
+    second = {"to": TOKEN, "data": ERC20.approve(RECEIVER, 5)}
+    zero   = {"to": TOKEN, "data": ERC20.approve(RECEIVER, 0)}
+
+    # other non-zero arguments share the estimate, a zero word is another shape
+    assert GasEstimateCache.key(NET_NAME, first) == GasEstimateCache.key(NET_NAME, second)
+    assert GasEstimateCache.key(NET_NAME, first) != GasEstimateCache.key(NET_NAME, zero)
+
+
+def test_ttl_and_lru():
+    cache = GasEstimateCache(ttl=0.1, max_size=2)
+    txs = [{"to": TOKEN, "data": "0x%08x" % index} for index in range(3)]
+    for index, tx in enumerate(txs):
+        cache.set(NET_NAME, tx, 1000 + index)
+
+    # the oldest is evicted, the rest expire
+    assert [cache.get(NET_NAME, tx) for tx in txs] == [None, 1001, 1002]
+    time.sleep(0.15)
+    assert cache.get(NET_NAME, txs[2]) is None
+
+
+def test_repeated_shape_not_estimated(account, node):
+    assert account.send_transaction(approve_tx(account, RECEIVER))
+    node.reset_counters()
+
+    handle = account.submit(approve_tx(account, Web3.to_checksum_address("0x" + "12" * 20)))
+    assert handle.from_cache and handle.result()
+    assert node.calls["eth_estimateGas"] == 0
+
+
+def test_native_transfer_constant(account, node):
+    for _ in range(2):
+        assert account.send_money(RECEIVER, 0.001)
+
+    # code of the receiver is checked once, then 21000 is known
+    assert node.calls["eth_getCode"] == 1
+    assert node.calls["eth_estimateGas"] == 1
+
+
+def test_out_of_gas_falls_back_to_live_estimate(account, node):
+    account.gas_estimates.set(NET_NAME, approve_tx(account, RECEIVER), 30000)
+    handle, failed = node.handle, []
+
+    def out_of_gas(request):
+        response = handle(request)
+        result = response.get("result")
+        if request["method"] in ("eth_getTransactionReceipt", "eth_getBlockReceipts") and result and not failed:
+            receipts = result if isinstance(result, list) else [result]
+            for receipt in receipts:
+                # the cached limit of 30000 * 1.25 is burnt
+                receipt.update(status="0x0", gasUsed=hex(37500))
+                failed.append(receipt["transactionHash"])
+        return response
+
+    node.handle = out_of_gas
+    try:
+        assert account.send_transaction(approve_tx(account, RECEIVER))
+    finally:
+        del node.handle
+
+    # one resend with a live estimate, which replaces the cached one
+    assert node.calls["eth_sendRawTransaction"] == 2
+    assert node.calls["eth_estimateGas"] == 1
+    assert account.gas_estimates.get(NET_NAME, approve_tx(account, RECEIVER)) == 50000
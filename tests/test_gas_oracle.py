@@ -0,0 +1,56 @@
+import pytest
+
+from Account import GasOracle, Nodes
+
+NET_NAME = "polygon"
+
+
+@pytest.fixture
+def oracle(node):
+    yield GasOracle(Nodes({NET_NAME: [node.url]}), NET_NAME)
+    node.__dict__.pop("handle", None)
+
+
+def fee_history_error(node, error: dict) -> None:
+    handle = node.handle
+
+    def failing(request):
+        if request["method"] == "eth_feeHistory":
+            return {"jsonrpc": "2.0", "id": request["id"], "error": error}
+        return handle(request)
+
+    node.handle = failing
+
+
+def test_fee_history(oracle):
+    fees = oracle.refresh()
+
+    assert oracle.fee_history
+    assert fees.base_fee is not None and fees.max_fee > fees.base_fee
+
+
+def test_transient_error(node, oracle):
+    fee_history_error(node, {"code": -32000, "message": "request timed out"})
+    fees = oracle.refresh()
+
+    # this refresh has gas price only, EIP-1559 fees come back with the next one
+    assert oracle.fee_history
+    assert fees.gas_price and fees.base_fee is None
+
+    del node.handle
+    assert oracle.refresh().base_fee is not None
+
+
+@pytest.mark.parametrize("error", [
+    {"code": -32601, "message": "the method eth_feeHistory does not exist/is not available"},
+    {"code": -32000, "message": "method not found"}
+])
+def test_unsupported(node, oracle, error):
+    fee_history_error(node, error)
+    oracle.refresh()
+    assert not oracle.fee_history
+
+    del node.handle
+    node.reset_counters()
+    assert oracle.refresh().base_fee is None
+    assert node.calls["eth_feeHistory"] == 0
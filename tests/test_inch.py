@@ -0,0 +1,148 @@
+from itertools import count
+import asyncio
+import gc
+import time
+
+import pytest
+
+from Account import AsyncWeb3Account, Inch, Web3, Web3Account
+from stub_inch import SPENDER
+
+NET_NAME = "polygon"
+TOKEN    = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+KEYS     = count(0x1C40)
+
+
+@pytest.fixture
+def make_account(node, inch):
+    Inch._cache.clear()
+    Inch._blocked_until.clear()
+    inch.reset_counters()
+
+    def make_account(account_class=Web3Account):
+        account = account_class("0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url]}, after_tx_sleeping=False)
+        account.inch_helper.base_url = inch.url
+        return account
+
+    yield make_account
+    inch.rate_limit = None
+
+
+def test_quote_cache(make_account, inch):
+    helper = make_account().inch_helper
+
+    quote = helper.get_quote(TOKEN, "eth", 10 ** 18)
+    assert quote["toTokenAmount"] == str(2 * 10 ** 18)
+
+    # the same amount bucket of any account is served from the cache
+    assert make_account().inch_helper.get_quote(TOKEN, "eth", 10 ** 18 + 1) == quote
+    assert inch.calls["quote"] == 1
+
+    helper.get_quote(TOKEN, "eth", 2 * 10 ** 18)
+    assert inch.calls["quote"] == 2
+
+
+def test_quote_cache_async(make_account, inch):
+    helper = make_account(AsyncWeb3Account).inch_helper
+
+    quotes = asyncio.run(helper.get_quotes_async([(TOKEN, "eth", 10 ** 18)] * 3))
+    assert inch.calls["quote"] >= 1
+    assert all(quote == quotes[0] for quote in quotes)
+
+    calls = inch.calls["quote"]
+    asyncio.run(helper.get_quote_async(TOKEN, "eth", 10 ** 18))
+    assert inch.calls["quote"] == calls
+
+
+def test_quote_cache_expires(make_account, inch, monkeypatch):
+    helper = make_account().inch_helper
+    monkeypatch.setattr(Inch, "QUOTE_TTL", 0)
+
+    helper.get_quote(TOKEN, "eth", 10 ** 18)
+    helper.get_quote(TOKEN, "eth", 10 ** 18)
+    assert inch.calls["quote"] == 2
+
+
+def test_spender_cache(make_account, inch):
+    assert make_account().inch_helper.get_spender() == Web3.to_checksum_address(SPENDER)
+    assert make_account().inch_helper.get_spender() == Web3.to_checksum_address(SPENDER)
+    assert asyncio.run(make_account(AsyncWeb3Account).inch_helper.get_spender_async()) == Web3.to_checksum_address(SPENDER)
+
+    assert inch.calls["spender"] == 1
+
+
+def test_check_rate_limit(make_account):
+    helper = make_account().inch_helper
+
+    helper.check_rate_limit(200, {"X-RateLimit-Remaining": "5"})
+    assert helper.pause() <= 0
+
+    with pytest.raises(Exception):
+        helper.check_rate_limit(429, {"Retry-After": "2"})
+    assert 1.5 < helper.pause() <= 2
+
+    # the pause is shared by every client of the api
+    assert 1.5 < make_account().inch_helper.pause() <= 2
+
+
+def test_check_rate_limit_headers(make_account):
+    helper = make_account().inch_helper
+
+    # a successful response with no requests left also pauses
+    helper.check_rate_limit(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1"})
+    assert 0.5 < helper.pause() <= 1
+
+    # reset as an unix timestamp
+    helper.check_rate_limit(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 3)})
+    assert 2.5 < helper.pause() <= 3
+
+
+def test_retry_after_pause(make_account, inch):
+    helper = make_account().inch_helper
+    helper.get_spender()
+    inch.rate_limit = 1
+
+    # every request after the first one of a second gets 429 and Retry-After: 1
+    amounts = [10 ** 18, 2 * 10 ** 18, 3 * 10 ** 18]
+    quotes = [helper.get_quote(TOKEN, "eth", amount) for amount in amounts]
+
+    assert [quote["toTokenAmount"] for quote in quotes] == [str(2 * amount) for amount in amounts]
+    assert inch.limited >= 1
+    assert inch.calls["quote"] == len(amounts) + inch.limited
+
+
+def test_session_shared(make_account, inch):
+    first, second = make_account(), make_account()
+    assert first.inch_helper.session is second.inch_helper.session
+
+    first.inch_helper.get_quote(TOKEN, "eth", 10 ** 18)
+    second.inch_helper.get_quote(TOKEN, "eth", 5 * 10 ** 18)
+    first.inch_helper.get_spender()
+
+    # one keep-alive connection serves both accounts, it can be left open by a previous test
+    assert inch.calls["quote"] == 2
+    assert inch.connections <= 1
+
+
+def test_async_sessions_closed(make_account, recwarn):
+    # 1inch sessions left by previous tests warn when they are collected
+    Inch._async_sessions.clear()
+    gc.collect()
+    recwarn.clear()
+    account = make_account(AsyncWeb3Account)
+
+    async def spender():
+        session = account.inch_helper.async_session()
+        await account.inch_helper.get_spender_async()
+        await account.aclose()
+        return session
+
+    sessions = [asyncio.run(spender()) for _ in range(2)]
+
+    # a new loop gets its own session, none of them is left open
+    assert sessions[0] is not sessions[1]
+    assert all(session.closed for session in sessions)
+    assert len(Inch._async_sessions) == 0
+    print([str(w.message)[:200] for w in recwarn])
+    assert not [warning for warning in recwarn if "Unclosed client session" in str(warning.message)]
+
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+from eth_account import Account as EthAccount
+
+from Account import KeyLoader
+
+PASSWORD = "password"
+KEYS     = ["0x%064x" % (0x4B0 + index) for index in range(4)]
+
+
+@pytest.fixture
+def keystores(tmp_path):
+    directory = tmp_path / "keystores"
+    directory.mkdir()
+    for index, key in enumerate(KEYS):
+        keystore = EthAccount.encrypt(key, PASSWORD, kdf="pbkdf2", iterations=2)
+        # the first two keystores have no address
+        if index < 2:
+            del keystore["address"]
+        (directory / f'{index}.json').write_text(json.dumps(keystore))
+    return directory
+
+
+@pytest.fixture
+def collected(monkeypatch):
+    # ids of decrypted keystores, collect runs in this process
+    ids = []
+    collect = KeyLoader.collect
+
+    def counted(self, future, entry):
+        ids.append(entry["id"])
+        return collect(self, future, entry)
+
+    monkeypatch.setattr(KeyLoader, "collect", counted)
+    return ids
+
+
+def test_keys(keystores):
+    entries = sorted(KeyLoader(str(keystores), PASSWORD, workers=2).keys(), key=lambda entry: entry["id"])
+    assert [entry["key"] for entry in entries] == KEYS
+
+
+def test_addresses(keystores, collected, tmp_path):
+    addresses = [EthAccount.from_key(key).address for key in KEYS]
+    cache = str(tmp_path / "addresses.json")
+
+    assert KeyLoader(str(keystores), PASSWORD, workers=2, address_cache=cache).addresses() == addresses
+    # only keystores without an address are decrypted
+    assert sorted(collected) == [str(keystores / "0.json"), str(keystores / "1.json")]
+
+    # one of them is missing from the cache now
+    with open(cache) as file:
+        addresses_cache = json.load(file)
+    del addresses_cache[str(keystores / "1.json")]
+    with open(cache, "w") as file:
+        json.dump(addresses_cache, file)
+
+    collected.clear()
+    assert KeyLoader(str(keystores), PASSWORD, workers=2, address_cache=cache).addresses() == addresses
+    assert collected == [str(keystores / "1.json")]
+
+    collected.clear()
+    KeyLoader(str(keystores), PASSWORD, workers=2, address_cache=cache).addresses()
+    assert collected == []
@@ -0,0 +1,86 @@
+from os import path
+import subprocess
+import sys
+import json
+
+import Account
+from Account import LogSink
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+EXIT_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from Account import LogSink
+
+sink = LogSink(sys.argv[2], flush_interval=5, batch_size=100)
+for index in range(5000):
+    sink.write({"index": index})
+"""
+
+
+def read(sink: LogSink) -> list:
+    with open(sink.path, encoding="utf-8") as file:
+        return [json.loads(line)["index"] for line in file]
+
+
+def test_flush(tmp_path):
+    sink = LogSink(str(tmp_path), batch_size=100)
+    for index in range(5000):
+        sink.write({"index": index})
+        if index == 2500:
+            sink.flush()
+            assert read(sink) == list(range(2501))
+
+    sink.flush()
+    assert read(sink) == list(range(5000))
+    assert [record["index"] for record in sink.records()] == list(range(5000))
+
+
+def test_close(tmp_path):
+    sink = LogSink(str(tmp_path), batch_size=100)
+    for index in range(1000):
+        sink.write({"index": index})
+
+    sink.close()
+    assert read(sink) == list(range(1000))
+
+    # a sink is usable after close
+    sink.write({"index": 1000})
+    sink.flush()
+    assert read(sink)[-1] == 1000
+
+
+def test_bad_records(tmp_path, capsys):
+    sink = LogSink(str(tmp_path))
+    circular = {"index": 1}
+    circular["self"] = circular
+
+    sink.write({"index": 0, "value": object()})
+    sink.write(circular)
+    sink.write({"index": 2})
+    sink.flush()
+
+    # a value json can't dump is written as a string, a circular record is skipped
+    assert read(sink) == [0, 2]
+    assert sink.thread.is_alive()
+    assert "record is skipped" in capsys.readouterr().err
+
+
+def test_failed_rotation(tmp_path, monkeypatch):
+    def rename(*args):
+        raise OSError("file is busy")
+
+    monkeypatch.setattr(Account, "rename", rename)
+    sink = LogSink(str(tmp_path), max_bytes=1)
+    for index in range(3):
+        sink.write({"index": index})
+        sink.flush()
+
+    assert read(sink) == [0, 1, 2]
+    assert sink.thread.is_alive()
+
+
+def test_written_at_exit(tmp_path):
+    subprocess.run([sys.executable, "-c", EXIT_SCRIPT, ROOT, str(tmp_path)], check=True, timeout=60)
+    assert read(LogSink(str(tmp_path))) == list(range(5000))
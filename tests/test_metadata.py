@@ -0,0 +1,49 @@
+from itertools import count
+
+import pytest
+
+from Account import MetadataCache, Web3Account
+
+NET_NAME = "polygon"
+TOKEN    = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+KEYS     = count(0x3E7A)
+
+
+@pytest.fixture
+def make_account(node):
+    def make_account(metadata_cache: MetadataCache) -> Web3Account:
+        return Web3Account("0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url]}, metadata_cache=metadata_cache)
+
+    node.reset_counters()
+    return make_account
+
+
+def test_decimals_cached(make_account, node):
+    cache = MetadataCache()
+    account = make_account(cache)
+    for _ in range(3):
+        assert account.get_balance(TOKEN, get_decimals=True)[2] == 18
+
+    # decimals once, balanceOf every time
+    assert node.calls["eth_call"] == 1 + 3
+    assert cache.stats == {"hits": 2, "misses": 1, "size": 1}
+
+
+def test_chain_id_cached(make_account, node):
+    account = make_account(MetadataCache())
+    for _ in range(3):
+        assert account.get_tx_data()["chainId"] == 137
+
+    assert node.calls["eth_chainId"] <= 1
+
+
+def test_shared_on_disk(make_account, node, tmp_path):
+    path = str(tmp_path / "metadata.sqlite")
+    make_account(MetadataCache(path)).get_decimals(TOKEN)
+    make_account(MetadataCache(path)).get_chain_id()
+    node.reset_counters()
+
+    # a new cache on the same file, like another process, reads both without RPC
+    account = make_account(MetadataCache(path))
+    assert account.get_decimals(TOKEN) == 18 and account.get_chain_id() == 137
+    assert node.http_requests == 0
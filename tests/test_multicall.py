@@ -0,0 +1,60 @@
+from itertools import count
+
+import pytest
+
+from Account import MULTICALL_MAX_CALLDATA, MULTICALL_MAX_GAS, MULTICALL_CALL_GAS, Multicall, Web3, Web3Account
+
+NET_NAME  = "polygon"
+TOKEN     = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+SPENDER   = "0x1111111254EEB25477B68fb85Ed929f73A960582"
+ADDRESSES = [Web3.to_checksum_address("0x%040x" % (0x3C00 + index)) for index in range(10)]
+KEYS      = count(0x3C00)
+
+
+@pytest.fixture
+def account(node):
+    account = Web3Account("0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url]})
+    node.reset_counters()
+    return account
+
+
+def test_get_balances(account, node):
+    balances = account.get_balances(["eth", TOKEN], ADDRESSES)
+
+    assert list(balances) == ADDRESSES
+    assert balances[ADDRESSES[0]] == {"eth": 10 ** 20, TOKEN: 5 * 10 ** 18}
+    # 20 reads in one aggregate3 call
+    assert node.calls["eth_call"] == 1
+
+
+def test_get_allowances(account, node):
+    allowances = account.get_allowances([TOKEN], SPENDER, ADDRESSES)
+
+    assert allowances[ADDRESSES[-1]] == {TOKEN: 0}
+    assert node.calls["eth_call"] == 1
+
+
+def test_own_balances(account):
+    assert account.get_balances(["eth"]) == {account.address: {"eth": 10 ** 20}}
+
+
+def test_chunks(account):
+    multicall = account.get_multicall()
+    addresses = [Web3.to_checksum_address("0x%040x" % index) for index in range(1, 3001)]
+    calls = multicall.balance_calls(["eth", TOKEN], addresses)
+    chunks = Multicall.chunks(calls)
+
+    assert len(chunks) > 1
+    assert [call for chunk in chunks for call in chunk] == calls
+    for chunk in chunks:
+        assert sum(len(call_data) // 2 + 160 for _, _, (_, _, call_data) in chunk) <= MULTICALL_MAX_CALLDATA
+        assert len(chunk) * MULTICALL_CALL_GAS <= MULTICALL_MAX_GAS
+
+
+def test_failed_call(account):
+    multicall = account.get_multicall()
+    calls = multicall.balance_calls(["eth", TOKEN], ADDRESSES[:1])
+    results = [(False, b""), (True, (5).to_bytes(32, "big"))]
+
+    # a failed call is None, the other calls of the chunk are kept
+    assert multicall.collect(calls, results) == {ADDRESSES[0]: {"eth": None, TOKEN: 5}}
@@ -0,0 +1,34 @@
+from itertools import count
+
+from Account import Nodes, Web3Account
+
+NET_NAME = "polygon"
+KEYS     = count(0x0D00)
+
+
+def account(node, **kwargs) -> Web3Account:
+    return Web3Account("0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url], "bsc": [node.url + "/bsc"]}, **kwargs)
+
+
+def test_account_makes_no_requests(node):
+    node.reset_counters()
+    accounts = [account(node) for _ in range(50)]
+
+    assert node.http_requests == 0
+    # only a chain in use is connected
+    assert accounts[0].nodes._chains == {}
+
+
+def test_providers_shared(node):
+    first, second = account(node), account(node)
+
+    assert first.get_provider() is second.get_provider()
+    assert first.get_provider().provider.session is Nodes({}).get_session(node.url)
+    assert "bsc" not in first.nodes._chains
+
+
+def test_proxy_gets_own_provider(node):
+    plain, proxied = Nodes({NET_NAME: [node.url]}), Nodes({NET_NAME: [node.url]}, proxies="127.0.0.1:1")
+
+    assert plain.get(NET_NAME)[0] is not proxied.get(NET_NAME)[0]
+    assert plain.get(NET_NAME)[0] is Nodes({NET_NAME: [node.url]}).get(NET_NAME)[0]
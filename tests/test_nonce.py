@@ -0,0 +1,84 @@
+from itertools import count
+
+import pytest
+
+from Account import NonceManager, Web3Account
+
+NET_NAME = "polygon"
+RECEIVER = "0x54C32309b67e72bD44899e46EC630d14Eb96125f"
+KEYS     = count(0x40CE)
+
+
+@pytest.fixture
+def account(node):
+    account = Web3Account("0x%064x" % next(KEYS), NET_NAME, nodes={NET_NAME: [node.url]}, after_tx_sleeping=False)
+    node.reset_counters()
+    return account
+
+
+def pending_count(node, account) -> int:
+    return node.nonces[account.address.lower()]
+
+
+def test_built_tx_has_no_nonce(account, node):
+    tx = account.get_tx_data(10 ** 15)
+
+    assert "nonce" not in tx
+    assert node.calls["eth_getTransactionCount"] == 0
+
+
+def test_failed_send_money_leaves_no_gap(account, node):
+    with pytest.raises(Exception):
+        account.send_money("not-an-address", 0.01)
+
+    handle = account.submit(dict(account.get_tx_data(10 ** 15), to=RECEIVER))
+    assert handle.tx["nonce"] == 0
+    assert pending_count(node, account) == 1
+
+
+def test_unsent_built_tx_leaves_no_gap(account, node):
+    # a contract call reverting in build_transaction drops its built tx
+    account.get_tx_data()
+
+    handle = account.submit(dict(account.get_tx_data(10 ** 15), to=RECEIVER))
+    assert handle.tx["nonce"] == pending_count(node, account) - 1 == 0
+
+
+def test_release_fills_gap():
+    manager = NonceManager("0x" + "ab" * 20, NET_NAME)
+    manager.sync(5)
+    assert [manager.allocate() for _ in range(3)] == [5, 6, 7]
+
+    # a nonce in the middle is given out again first, the last one moves the counter back
+    manager.release(6)
+    manager.release(7)
+    assert [manager.allocate() for _ in range(3)] == [6, 7, 8]
+
+
+def test_txs_in_flight(account, node):
+    handles = account.send_transactions([dict(account.get_tx_data(10 ** 15), to=RECEIVER) for _ in range(3)])
+
+    assert [handle.tx["nonce"] for handle in handles] == [0, 1, 2]
+    assert node.calls["eth_getTransactionCount"] == 1
+    assert all(handle.result() for handle in handles)
+
+
+def test_nonce_too_low_resyncs(account, node):
+    handle = node.handle
+
+    def nonce_too_low(request):
+        if request["method"] == "eth_sendRawTransaction":
+            return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32000, "message": "nonce too low"}}
+        return handle(request)
+
+    node.handle = nonce_too_low
+    try:
+        assert account.send_transactions([dict(account.get_tx_data(10 ** 15), to=RECEIVER)])[0].error
+    finally:
+        del node.handle
+
+    # the node is asked again instead of trusting the local counter
+    assert not account.nonce_manager.synced
+    account.submit(dict(account.get_tx_data(10 ** 15), to=RECEIVER))
+    assert node.calls["eth_getTransactionCount"] == 2
+
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import threading
+
+from Account import Orchestrator, RateLimiter
+
+NET_NAME = "polygon"
+
+
+def concurrency_task():
+    state = {"running": 0, "peak": 0}
+
+    async def task(account):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.05)
+        state["running"] -= 1
+        return account.address
+
+    return task, state
+
+
+def keys(count: int) -> list:
+    return ["0x%064x" % (0x0C00 + index) for index in range(count)]
+
+
+def test_accounts_without_proxy(node, tmp_path):
+    task, state = concurrency_task()
+    orchestrator = Orchestrator(
+        keys(12), NET_NAME, task=task, nodes={NET_NAME: [node.url]},
+        chain_limit=6, proxy_limit=2, progress_path=str(tmp_path / "progress.json")
+    )
+    progress = orchestrator.run()
+
+    # only chain_limit applies, proxy_limit is a limit of one proxy
+    assert state["peak"] == 6
+    assert all(record["status"] == "done" for record in progress.values())
+
+
+def test_proxy_limit(node, tmp_path):
+    task, state = concurrency_task()
+    orchestrator = Orchestrator(
+        keys(12), NET_NAME, task=task, nodes={NET_NAME: [node.url]},
+        proxies="http://127.0.0.1:1", chain_limit=6, proxy_limit=2,
+        progress_path=str(tmp_path / "progress.json")
+    )
+    orchestrator.run()
+
+    assert state["peak"] == 2
+
+
+def test_endpoint_limits_restored(node, tmp_path):
+    RateLimiter.set_limit(node.url, 1000)
+    before = RateLimiter._limiters[node.url]
+    task, _ = concurrency_task()
+
+    Orchestrator(
+        keys(2), NET_NAME, task=task, nodes={NET_NAME: [node.url], "arbitrum": [node.url + "/arbitrum"]},
+        endpoint_rps={node.url: 5, node.url + "/arbitrum": 5}, progress_path=str(tmp_path / "progress.json")
+    ).run()
+
+    # limits of the run do not outlive it
+    assert RateLimiter._limiters[node.url] is before
+    assert node.url + "/arbitrum" not in RateLimiter._limiters
+    RateLimiter.remove_limit(node.url)
+
+
+def test_account_kwargs(node, tmp_path):
+    async def task(account):
+        return [account.after_tx_sleeping, account.max_gwei]
+
+    progress = Orchestrator(
+        keys(1), NET_NAME, task=task, nodes={NET_NAME: [node.url]}, progress_path=str(tmp_path / "progress.json"),
+        after_tx_sleeping=True, max_gwei=77
+    ).run()
+
+    assert [record["results"] for record in progress.values()] == [[[False, 77]]]
+
+
+def test_progress_saved(node, tmp_path):
+    progress_path = tmp_path / "progress.json"
+    task, _ = concurrency_task()
+    progress = Orchestrator(
+        keys(3), NET_NAME, task=task, nodes={NET_NAME: [node.url]}, progress_path=str(progress_path)
+    ).run()
+
+    assert json.loads(progress_path.read_text()) == progress
+
+
+def test_progress_writes_batched(node, tmp_path, monkeypatch):
+    writes = []
+    write_progress = Orchestrator.write_progress
+
+    def counted(self, data, version):
+        writes.append((threading.current_thread() is threading.main_thread(), version))
+        write_progress(self, data, version)
+
+    monkeypatch.setattr(Orchestrator, "write_progress", counted)
+    task, _ = concurrency_task()
+    orchestrator = Orchestrator(
+        keys(12), NET_NAME, task=task, nodes={NET_NAME: [node.url]}, progress_path=str(tmp_path / "progress.json")
+    )
+    orchestrator.run()
+
+    # 24 changes (a step and the end of every account) in one write off the loop thread
+    assert orchestrator.version == 24
+    assert writes == [(False, 24)]
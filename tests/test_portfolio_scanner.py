@@ -0,0 +1,111 @@
+import csv
+import json
+
+import pytest
+
+from Account import PortfolioScanner, Web3
+
+NET_NAME = "polygon"
+TOKEN    = "0x2297aEbD383787A160DD0d9F71508148769342E3"
+ADDRESSES = [Web3.to_checksum_address("0x%040x" % (0x5CA0 + index)) for index in range(30)]
+
+
+@pytest.fixture
+def failing(monkeypatch):
+    """
+    chunks with one of `failing` addresses fail while it is not empty
+    """
+    failing = set()
+    scan_chunk = PortfolioScanner.scan_chunk
+
+    def scan(self, net_name, chunk):
+        if failing & {address for address, _, _ in chunk}:
+            return None
+        return scan_chunk(self, net_name, chunk)
+
+    monkeypatch.setattr(PortfolioScanner, "scan_chunk", scan)
+    return failing
+
+
+def scanner(node, **kwargs) -> PortfolioScanner:
+    # pages of 10 addresses, 20 calls of a page fit one chunk
+    return PortfolioScanner({NET_NAME: ["eth", TOKEN]}, nodes={NET_NAME: [node.url]}, page_size=10, **kwargs)
+
+
+def test_scan(node):
+    balances = dict(scanner(node).scan(ADDRESSES))
+
+    assert list(balances) == ADDRESSES
+    assert balances[ADDRESSES[0]] == {NET_NAME: {"eth": 10 ** 20, TOKEN: 5 * 10 ** 18}}
+
+
+def test_failed_chunk_without_checkpoint(node, failing):
+    failing.add(ADDRESSES[12])
+    balances = list(scanner(node).scan(ADDRESSES))
+
+    # the failed chunk is retried after the input and yielded with None balances
+    assert [address for address, _ in balances] == ADDRESSES[:10] + ADDRESSES[20:] + ADDRESSES[10:20]
+    assert balances[-1][1] == {NET_NAME: {"eth": None, TOKEN: None}}
+
+
+def test_failed_chunk_checkpoint(node, failing, tmp_path):
+    checkpoint = str(tmp_path / "scan.json")
+    failing.add(ADDRESSES[12])
+
+    first = dict(scanner(node, checkpoint=checkpoint).scan(ADDRESSES))
+    assert list(first) == ADDRESSES[:10] + ADDRESSES[20:]
+
+    with open(checkpoint) as file:
+        assert json.load(file)["done"] == len(ADDRESSES)
+    assert scanner(node, checkpoint=checkpoint).failed == [(address, NET_NAME) for address in ADDRESSES[10:20]]
+
+    # a new scan reads no new addresses and retries the failed ones
+    failing.clear()
+    second = dict(scanner(node, checkpoint=checkpoint).scan(ADDRESSES))
+    assert list(second) == ADDRESSES[10:20]
+    assert second[ADDRESSES[12]][NET_NAME]["eth"] == 10 ** 20
+    assert scanner(node, checkpoint=checkpoint).failed == []
+
+
+def test_failed_chunk_csv(node, failing, tmp_path):
+    checkpoint, file_path = str(tmp_path / "scan.json"), str(tmp_path / "balances.csv")
+    failing.add(ADDRESSES[3])
+    scanner(node, checkpoint=checkpoint).write_csv(ADDRESSES, file_path)
+
+    failing.clear()
+    scanner(node, checkpoint=checkpoint).write_csv(ADDRESSES, file_path)
+
+    with open(file_path, newline="") as file:
+        rows = list(csv.reader(file))[1:]
+    # every address once per token, none with an empty balance
+    assert len(rows) == len(ADDRESSES) * 2
+    assert all(row[3] for row in rows)
+
+
+def test_failed_chain_is_retried_alone(node, monkeypatch, tmp_path):
+    checkpoint = str(tmp_path / "scan.json")
+    scanned, scan_chunk = [], PortfolioScanner.scan_chunk
+
+    def scan(self, net_name, chunk):
+        scanned.append(net_name)
+        if net_name == "arbitrum" and len(scanned) <= 6:
+            return None
+        return scan_chunk(self, net_name, chunk)
+
+    monkeypatch.setattr(PortfolioScanner, "scan_chunk", scan)
+    two_chains = PortfolioScanner(
+        {NET_NAME: ["eth"], "arbitrum": ["eth"]},
+        nodes={NET_NAME: [node.url], "arbitrum": [node.url]}, page_size=10, checkpoint=checkpoint
+    )
+    pages = list(two_chains.pages(ADDRESSES))
+
+    # polygon balances come with their pages, only arbitrum is scanned again
+    assert all(set(chains) == {NET_NAME} for chains in pages[0][0].values())
+    assert scanned[6:] == ["arbitrum"] * 3
+    assert set(pages[3][0][ADDRESSES[0]]) == {"arbitrum"}
+
+    progress = pages[-1][1]
+    assert progress["done"] == len(ADDRESSES) and progress["retried"] == progress["failed"]
+    two_chains.save_checkpoint(progress)
+    assert two_chains.failed == []
+
@@ -0,0 +1,96 @@
+from concurrent.futures import Future
+import time
+
+import pytest
+
+from Account import Nodes, ReceiptWatcher
+from stub_node import StubNode
+
+NET_NAME = "polygon"
+PENDING  = "0x" + "ab" * 32
+
+
+@pytest.fixture
+def node():
+    # blocks are not mined on their own, the test moves the head
+    node = StubNode(block_time=1000).start()
+    yield node
+    node.stop()
+
+
+@pytest.fixture
+def watcher(node):
+    watcher = ReceiptWatcher(Nodes({NET_NAME: [node.url]}), NET_NAME)
+    watcher.pending[PENDING] = [(Future(), time.time() + 60)]
+    return watcher
+
+
+def block_receipts_error(node, error: dict) -> None:
+    handle = node.handle
+
+    def failing(request):
+        if request["method"] == "eth_getBlockReceipts":
+            return {"jsonrpc": "2.0", "id": request["id"], "error": error}
+        return handle(request)
+
+    node.handle = failing
+
+
+def tick(node, watcher) -> None:
+    watcher.last_block = node.block - 1
+    node.reset_counters()
+    watcher._tick()
+
+
+def test_block_receipts(node, watcher):
+    tick(node, watcher)
+
+    assert watcher.block_receipts
+    assert node.calls["eth_getBlockReceipts"] == 1
+    assert node.calls["eth_getTransactionReceipt"] == 0
+
+
+def test_block_gap(node, watcher):
+    # a fast chain makes many blocks between two ticks
+    mined, future = "0x" + "cd" * 32, Future()
+    node.mined_at[mined], node.senders[mined] = node.block - 30, "0x" + "11" * 20
+    watcher.pending[mined] = [(future, time.time() + 60)]
+
+    watcher.last_block = node.block - 45
+    node.reset_counters()
+    watcher._tick()
+
+    # the gap is read in batches of block receipts, not by hash
+    assert future.result(1).status == "success"
+    assert node.calls["eth_getBlockReceipts"] == 45
+    assert node.calls["eth_getTransactionReceipt"] == 0
+    assert node.http_requests == 1 + 45 // watcher.BLOCKS_PER_BATCH + 1
+
+
+def test_transient_error(node, watcher):
+    block_receipts_error(node, {"code": -32000, "message": "header not found"})
+    tick(node, watcher)
+
+    # pending hashes are looked up this tick, block receipts are tried again on the next one
+    assert watcher.block_receipts
+    assert node.calls["eth_getTransactionReceipt"] == 1
+
+    del node.handle
+    tick(node, watcher)
+    assert node.calls["eth_getBlockReceipts"] == 1
+    assert node.calls["eth_getTransactionReceipt"] == 0
+
+
+@pytest.mark.parametrize("error", [
+    {"code": -32601, "message": "the method eth_getBlockReceipts does not exist/is not available"},
+    {"code": -32000, "message": "Method eth_getBlockReceipts does not exist"}
+])
+def test_unsupported(node, watcher, error):
+    block_receipts_error(node, error)
+    tick(node, watcher)
+
+    assert not watcher.block_receipts
+    assert node.calls["eth_getTransactionReceipt"] == 1
+
+    tick(node, watcher)
+    assert node.calls["eth_getBlockReceipts"] == 0
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+import Account
+from Account import Nodes, RetryBudget, retry
+
+NET_NAME = "polygon"
+
+
+class Flaky:
+    """
+    fails `failures` times with `message`, then returns the count of calls
+    """
+    def __init__(self, failures: int, message: str = "nonce too low") -> None:
+        self.failures = failures
+        self.message  = message
+        self.calls    = 0
+
+    def call(self) -> int:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise Exception(self.message)
+        return self.calls
+
+    @retry(infinity=True, timing=1)
+    def forever(self) -> int:
+        return self.call()
+
+    @retry(max_retries=3, timing=1)
+    def three_times(self) -> int:
+        return self.call()
+
+    @retry(max_retries=8, timing=1)
+    def eight_times(self) -> int:
+        return self.call()
+
+
+class Reader:
+    def __init__(self, node) -> None:
+        self.w3 = Nodes({NET_NAME: [node.url]}).pick(NET_NAME)
+
+    @retry(max_retries=4, timing=1)
+    def balance(self) -> int:
+        return self.w3.eth.get_balance("0x54C32309b67e72bD44899e46EC630d14Eb96125f")
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    # only sleeps of the test thread are recorded, threads of the stub node keep sleeping
+    delays, sleep, caller = [], time.sleep, threading.current_thread()
+
+    def record(seconds: float) -> None:
+        if threading.current_thread() is caller:
+            delays.append(seconds)
+        else: sleep(seconds)
+
+    monkeypatch.setattr(Account.time, "sleep", record)
+    return delays
+
+
+def test_long_backoff(delays):
+    # "nonce too low" is retried with backoff, 2 ** 1100 does not fit a float
+    assert Flaky(1100).forever() == 1101
+    assert len(delays) == 1100
+
+    # timing doubles: 1, 2, 4, 8, 16 with jitter in its upper half, then max_timing
+    assert all(2 ** attempt / 2 <= delay <= 2 ** attempt for attempt, delay in enumerate(delays[:5]))
+    assert all(15 <= delay <= 30 for delay in delays[5:])
+
+
+def test_node_error_backoff(delays):
+    Flaky(7, "header not found").eight_times()
+
+    # node errors back off too, with full jitter
+    assert len(delays) == 7
+    assert all(0 <= delay <= min(30, 2 ** attempt) for attempt, delay in enumerate(delays))
+    assert max(delays[3:]) > 1
+
+
+def test_max_retries(delays):
+    with pytest.raises(Exception):
+        Flaky(3).three_times()
+    assert len(delays) == 2
+
+
+def test_no_account_budget(delays):
+    budgets = dict(RetryBudget._budgets)
+    for _ in range(50):
+        Flaky(1).three_times()
+
+    # objects without an account leave no budgets behind and are not limited by one
+    assert RetryBudget._budgets == budgets
+    assert len(delays) == 50
+
+
+def test_endpoint_budget_of_error_reply(node, delays):
+    RetryBudget._budgets.pop(("endpoint", node.url), None)
+    handle = node.handle
+
+    def limited(request):
+        if request["method"] == "eth_getBalance":
+            return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32005, "message": "rate limit exceeded"}}
+        return handle(request)
+
+    node.handle = limited
+    try:
+        with pytest.raises(ValueError) as error:
+            Reader(node).balance()
+    finally:
+        del node.handle
+
+    # the error reply is charged to the node which sent it, its text is the node error as is
+    assert str(error.value) == "{'code': -32005, 'message': 'rate limit exceeded'}"
+    budget = RetryBudget._budgets[("endpoint", node.url)]
+    assert budget.tokens < budget.burst
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from Account import EndpointHealth, Nodes, Web3
+from eth_account import Account as EthAccount
+from stub_node import StubNode
+
+NET_NAME = "polygon"
+ADDRESS  = "0x54C32309b67e72bD44899e46EC630d14Eb96125f"
+
+
+@pytest.fixture
+def slow_fast():
+    slow = StubNode(block_time=1000, latency=0.5).start()
+    fast = StubNode(block_time=1000).start()
+    yield slow, fast
+    slow.stop()
+    fast.stop()
+
+
+def routed(slow: StubNode, fast: StubNode) -> Web3:
+    nodes = Nodes({NET_NAME: [slow.url, fast.url]})
+    # the slow node looks better, so it is the first pick
+    EndpointHealth.get(slow.url).latency = 0.001
+    EndpointHealth.get(fast.url).latency = 0.01
+    return nodes.routed(NET_NAME)
+
+
+def test_circuit_breaker(slow_fast):
+    slow, fast = slow_fast
+    nodes = Nodes({NET_NAME: [slow.url, fast.url]})
+    health = EndpointHealth.get(slow.url)
+    for _ in range(EndpointHealth.FAILURES_TO_OPEN):
+        health.record(1, False)
+
+    # an ejected node gets no traffic
+    assert health.is_open
+    router = nodes.router(NET_NAME)
+    assert all(router.pick().provider.endpoint_uri == fast.url for _ in range(20))
+
+    # after open_time a probe lets it back in
+    health.opened_at = time.time() - health.open_time
+    router.pick()
+    for _ in range(50):
+        if not health.is_open:
+            break
+        time.sleep(0.1)
+    assert not health.is_open and slow.calls["eth_blockNumber"] == 1
+
+
+def test_hedged_read(slow_fast, monkeypatch):
+    slow, fast = slow_fast
+    monkeypatch.setattr(EndpointHealth, "HEDGE_DELAY", 0.05)
+    w3 = routed(slow, fast)
+
+    start = time.time()
+    assert w3.eth.get_balance(ADDRESS) == 10 ** 20
+    # the second node answered before the slow one
+    assert time.time() - start < 0.4
+    assert fast.calls["eth_getBalance"] == 1
+
+
+def test_write_not_hedged(slow_fast, monkeypatch):
+    slow, fast = slow_fast
+    monkeypatch.setattr(EndpointHealth, "HEDGE_DELAY", 0.05)
+    w3 = routed(slow, fast)
+
+    tx = {"to": ADDRESS, "value": 1, "gas": 21000, "gasPrice": 1, "nonce": 0, "chainId": 137}
+    raw_tx = EthAccount.sign_transaction(tx, "0x%064x" % 0x8A7E).rawTransaction
+    w3.eth.send_raw_transaction(raw_tx)
+
+    # a slow write waits for its node, it is never sent twice
+    assert slow.calls["eth_sendRawTransaction"] == 1
+    assert fast.calls["eth_sendRawTransaction"] == 0
@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from eth_account import Account as EthAccount
+
+from Account import Web3Account, sign_transactions
+
+NET_NAME = "polygon"
+RECEIVER = "0x54C32309b67e72bD44899e46EC630d14Eb96125f"
+KEYS     = ["0x%064x" % (0x5160 + index) for index in range(3)]
+
+
+def items(count: int) -> list:
+    return [
+        (KEYS[index % len(KEYS)], {
+            "to": RECEIVER, "value": index, "gas": 21000, "gasPrice": 10 ** 9,
+            "nonce": index // len(KEYS), "chainId": 137
+        })
+        for index in range(count)
+    ]
+
+
+def inline(items: list) -> list:
+    return [bytes(EthAccount.sign_transaction(tx, key).rawTransaction) for key, tx in items]
+
+
+def test_pool_keeps_order():
+    jobs = items(100)
+    raw_txs = sign_transactions(jobs, workers=2, chunk_size=16)
+
+    # signatures are deterministic, so the pool gives the inline bytes in the same order
+    assert raw_txs == inline(jobs)
+    assert [EthAccount.recover_transaction(raw_tx) for raw_tx in raw_txs[:3]] == [
+        EthAccount.from_key(key).address for key in KEYS
+    ]
+
+
+def test_reused_executor():
+    jobs = items(40)
+    with ProcessPoolExecutor(2) as executor:
+        assert sign_transactions(jobs, chunk_size=8, executor=executor) == inline(jobs)
+        assert sign_transactions(jobs[:5], executor=executor) == inline(jobs[:5])
+
+
+def test_accounts_as_owners(node):
+    accounts = [Web3Account(key, NET_NAME, nodes={NET_NAME: [node.url]}) for key in KEYS]
+    jobs = items(6)
+
+    raw_txs = sign_transactions([(accounts[index % 3], tx) for index, (_, tx) in enumerate(jobs)], workers=1)
+    assert raw_txs == inline(jobs)
+    assert accounts[0].sign_transactions([jobs[0][1]]) == inline(jobs[:1])
@@ -0,0 +1,48 @@
+from os import path
+import subprocess
+import json
+import sys
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+SCRIPT = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+HEAVY = ["web3", "eth_account", "requests", "aiohttp", "loguru"]
+
+def loaded():
+    return [name for name in HEAVY if name in sys.modules]
+
+import Account
+imported = loaded()
+account = Account.Web3Account("0x%064x" % 0x24, "polygon", nodes={"polygon": [sys.argv[2]]})
+created = loaded()
+balance = account.get_native_balance()
+print(json.dumps({"imported": imported, "created": created, "called": loaded(), "balance": balance}))
+"""
+
+
+def run(node, cwd) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT, ROOT, node.url], cwd=cwd,
+        check=True, timeout=60, capture_output=True, text=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_lazy_imports(node, tmp_path):
+    node.reset_counters()
+    loaded = run(node, tmp_path)
+
+    assert loaded["imported"] == []
+    # the key is parsed by eth_account, nothing else is loaded and no request is sent
+    assert loaded["created"] == ["eth_account"]
+    assert loaded["balance"] == 10 ** 20 and "web3" in loaded["called"]
+    assert node.calls["eth_getBalance"] == 1 and node.http_requests == 1
+
+
+def test_no_logs_directory(node, tmp_path):
+    run(node, tmp_path)
+
+    # the log file is created on the first write, a balance read writes none
+    assert not path.exists(tmp_path / "logs")
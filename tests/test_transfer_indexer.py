@@ -0,0 +1,68 @@
+import pytest
+
+from Account import ERC20, TransferIndexer
+from stub_node import StubNode
+
+NET_NAME = "polygon"
+FIRST    = "0x" + "a1" * 20
+SECOND   = "0x" + "b2" * 20
+
+
+@pytest.fixture
+def node():
+    # the head only moves when the test sets it
+    node = StubNode(block_time=1000).start()
+    node.requests = []
+    handle = node.handle
+
+    def recorded(request):
+        if request["method"] == "eth_getLogs":
+            log_filter = request["params"][0]
+            words = [word for topic in log_filter["topics"][1:] if topic for word in topic]
+            node.requests.append((int(log_filter["fromBlock"], 16), int(log_filter["toBlock"], 16), words))
+        return handle(request)
+
+    node.handle = recorded
+    yield node
+    node.stop()
+
+
+def indexer(node, tmp_path, addresses: list) -> TransferIndexer:
+    return TransferIndexer(
+        addresses, str(tmp_path / "transfers.db"), nodes={NET_NAME: [node.url]},
+        start_blocks={NET_NAME: 1}, confirmations=0, chunk_size=500, workers=2
+    )
+
+
+def test_update(node, tmp_path):
+    node.block = 1000
+    first = indexer(node, tmp_path, [FIRST])
+    first.update()
+
+    # a transfer from and to the address every 100 blocks
+    assert len(first.transfers(FIRST)) == 20
+    assert first.store.cursor(NET_NAME, [FIRST], "*") == 1000
+
+    node.block, node.requests = 1500, []
+    first.update()
+    assert min(from_block for from_block, _, _ in node.requests) == 1001
+    first.close()
+
+
+def test_new_address(node, tmp_path):
+    node.block = 1000
+    indexer(node, tmp_path, [FIRST]).update()
+
+    node.block, node.requests = 2000, []
+    both = indexer(node, tmp_path, [FIRST, SECOND])
+    both.update()
+
+    # the new address is backfilled alone up to the cursor of the first one
+    word = "0x" + ERC20.address_word(SECOND)
+    backfill = [request for request in node.requests if request[0] <= 1000]
+    assert backfill and all(to_block <= 1000 and words == [word] for _, to_block, words in backfill)
+    assert all(len(words) == 2 for from_block, _, words in node.requests if from_block > 1000)
+
+    assert len(both.transfers(FIRST)) == len(both.transfers(SECOND)) == 40
+    assert both.store.cursors(NET_NAME, [FIRST, SECOND], "*") == {FIRST: 2000, SECOND: 2000}
+    both.close()